@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+设备重连风暴基准：1000台设备同时重新注册，对比逐设备查询数据库与 DeviceRegistry。
+
+数据库用内存假实现模拟：每次往返固定延迟，连接池大小与 aiomysql 默认值一致。
+
+用法: python benchmarks/bench_reconnect_storm.py [--devices 1000] [--rtt-ms 5]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.database.device_registry import DeviceRegistry
+
+
+class FakeDatabase:
+    """模拟远程MySQL：每次调用占用一个连接并等待一个往返延迟"""
+
+    def __init__(self, rtt: float, pool_size: int = 10):
+        self.rtt = rtt
+        self.pool = asyncio.Semaphore(pool_size)
+        self.devices = {}
+        self.round_trips = 0
+
+    async def _round_trip(self):
+        async with self.pool:
+            self.round_trips += 1
+            await asyncio.sleep(self.rtt)
+
+    # 原有的逐设备接口
+    async def get_device(self, mac_addr):
+        await self._round_trip()
+        return self.devices.get(mac_addr)
+
+    async def register_device(self, mac_addr):
+        await self._round_trip()
+        self.devices[mac_addr] = {"mac_addr": mac_addr, "memory": None}
+
+    async def update_device_login(self, mac_addr):
+        await self._round_trip()
+
+    # DeviceRegistry 使用的批量接口
+    async def get_devices(self, mac_addrs):
+        await self._round_trip()
+        return {mac: self.devices[mac] for mac in mac_addrs if mac in self.devices}
+
+    async def upsert_device_logins(self, items):
+        await self._round_trip()
+        for mac, _ in items:
+            self.devices.setdefault(mac, {"mac_addr": mac, "memory": None})
+
+
+async def legacy_register(db, mac_addr):
+    """与原 _handle_registration 相同的调用顺序"""
+    if not await db.get_device(mac_addr):
+        await db.register_device(mac_addr)
+    await db.update_device_login(mac_addr)
+
+
+async def storm(name, register, macs, db):
+    db.round_trips = 0
+    latencies = []
+
+    async def one(mac):
+        start = time.perf_counter()
+        await register(mac)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(mac) for mac in macs))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{name:<28} 总耗时 {elapsed * 1000:8.1f}ms  往返 {db.round_trips:5d}  "
+          f"p50 {statistics.median(latencies) * 1000:7.1f}ms  p99 {p99 * 1000:7.1f}ms")
+
+
+async def main(devices: int, rtt_ms: float):
+    macs = [f"AA:BB:CC:{i >> 8 & 0xFF:02X}:{i & 0xFF:02X}:{i % 7:02X}" for i in range(devices)]
+    rtt = rtt_ms / 1000.0
+    print(f"{devices} 台设备，单次往返 {rtt_ms}ms，连接池 10")
+
+    db = FakeDatabase(rtt)
+    await storm("逐设备查询（首次注册）", lambda mac: legacy_register(db, mac), macs, db)
+    await storm("逐设备查询（重连）", lambda mac: legacy_register(db, mac), macs, db)
+
+    db = FakeDatabase(rtt)
+    registry = DeviceRegistry(db)
+    await storm("DeviceRegistry（首次注册）", registry.register, macs, db)
+    await registry.flush()
+    # 模拟缓存过期后的重连，以及缓存仍有效时的重连
+    registry._cache.clear()
+    await storm("DeviceRegistry（冷缓存重连）", registry.register, macs, db)
+    await storm("DeviceRegistry（热缓存重连）", registry.register, macs, db)
+    db.round_trips = 0
+    await registry.flush()
+    print(f"登录时间写回: {db.round_trips} 次往返")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--rtt-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.devices, args.rtt_ms))
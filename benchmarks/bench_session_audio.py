@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+会话音频路径微基准：对比原实现（整段复制 + 切片复制 + 每块两条INFO日志）与
+ClientSession 现在的实现（换出缓冲区 + memoryview 分块）。
+
+每轮模拟：设备上传 N 秒 16kHz PCM（100ms 一块），取出整段音频，再下发同样长度的回复音频
+（含 start_audio 指令和结束帧）。分两遍测量：
+- 计时：不开 tracemalloc，预热后重复多组取中位数（tracemalloc 会按分配次数拖慢代码，
+  小对象多的实现在开启时显得更慢）；
+- 分配：开启 tracemalloc，统计每轮音频路径复制的字节数、新建的缓冲区/视图对象数，
+  以及每轮临时内存峰值（相对轮次开始时）。
+
+复制字节只计会话代码自己复制的音频；memoryview 帧不复制音频，但每个视图仍是一个新对象，
+换出缓冲区后装上的新 bytearray 同样计为新对象。真实连接上 websockets 组帧时还会再复制一次，
+两种实现相同，不在统计范围内。
+
+用法: python benchmarks/bench_session_audio.py [--seconds 10] [--turns 200] [--repeat 5]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from websockets.protocol import State
+
+from src.network.client_session import ClientSession
+from src.utils.mcp_protocol import create_mcp_event
+
+logger = logging.getLogger("bench")
+
+
+class CountingWebSocket:
+    """假连接：不真正发送，按负载类型统计二进制帧"""
+    state = State.OPEN
+    remote_address = ("127.0.0.1", 0)
+
+    def __init__(self):
+        self.copied_bytes = 0  # bytes/bytearray 帧：切片复制出来的音频
+        self.copies = 0
+        self.views = 0  # memoryview 帧：不复制音频，但每帧一个视图对象
+
+    async def send(self, data):
+        if isinstance(data, str) or not data:
+            return
+        if isinstance(data, memoryview):
+            self.views += 1
+        else:
+            self.copied_bytes += len(data)
+            self.copies += 1
+
+
+class LegacySession:
+    """原 ClientSession 的音频路径"""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.mac_addr = "AA:BB:CC:DD:EE:FF"
+        self.audio_buffer = bytearray()
+
+    def append_audio(self, chunk):
+        self.audio_buffer.extend(chunk)
+
+    def get_full_audio_and_clear(self):
+        full_data = bytes(self.audio_buffer)
+        self.audio_buffer.clear()
+        return full_data
+
+    async def send_json(self, data):
+        logger.info(f"=========发送服务端JSON: {data}")
+        await self.websocket.send(json.dumps(data, ensure_ascii=False))
+
+    async def send_binary(self, data):
+        logger.info(f"发送二进制数据到 [{self.mac_addr}], 大小: {len(data)} 字节")
+        await self.websocket.send(data)
+        logger.info(f"二进制数据发送成功")
+
+    async def send_audio(self, audio_data):
+        logger.info(f"开始发送音频流程，数据大小: {len(audio_data)} 字节")
+        await self.send_json(create_mcp_event("mcp/server/start_audio", None))
+        chunk_size = 64 * 1024
+        total_sent = 0
+        for i in range(0, len(audio_data), chunk_size):
+            chunk = audio_data[i:i + chunk_size]
+            await self.send_binary(chunk)
+            total_sent += len(chunk)
+            logger.info(f"已发送 {total_sent}/{len(audio_data)} 字节")
+        await self.send_binary(b'')
+
+
+class Counts:
+    def __init__(self):
+        self.copied_bytes = 0
+        self.objects = 0
+        self.peaks = []
+
+
+async def run_turns(session, websocket, seconds: float, turns: int, counts: Counts = None):
+    upload_chunk = b'\x01\x00' * 1600  # 100ms
+    reply = b'\x02\x00' * int(16000 * seconds)
+    for _ in range(turns):
+        if counts:
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            copied, copies, views = websocket.copied_bytes, websocket.copies, websocket.views
+        for _ in range(int(seconds * 10)):
+            session.append_audio(upload_chunk)
+        buffer = session.audio_buffer
+        full_audio = session.get_full_audio_and_clear()
+        await session.send_audio(reply)
+        if counts:
+            # 原实现复制出一个 bytes；现实现不复制，但装上了一个新的 bytearray
+            counts.objects += 1
+            if full_audio is not buffer:
+                counts.copied_bytes += len(full_audio)
+            sent_views = websocket.views - views
+            # memoryview 帧之外还有 send_audio 中整段音频的根视图
+            counts.objects += (websocket.copies - copies) + sent_views + (1 if sent_views else 0)
+            counts.copied_bytes += websocket.copied_bytes - copied
+            counts.peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        del full_audio
+
+
+async def time_turns(make_session, seconds: float, turns: int, repeat: int) -> float:
+    """不开 tracemalloc，返回每轮耗时（秒）的中位数"""
+    websocket = CountingWebSocket()
+    session = make_session(websocket)
+    await run_turns(session, websocket, seconds, max(1, turns // 10))
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await run_turns(session, websocket, seconds, turns)
+        samples.append((time.perf_counter() - start) / turns)
+    return statistics.median(samples)
+
+
+async def count_turns(make_session, seconds: float, turns: int) -> Counts:
+    websocket = CountingWebSocket()
+    session = make_session(websocket)
+    counts = Counts()
+    tracemalloc.start()
+    try:
+        await run_turns(session, websocket, seconds, turns, counts)
+    finally:
+        tracemalloc.stop()
+    return counts
+
+
+async def measure(name, make_session, seconds, turns, repeat):
+    per_turn = await time_turns(make_session, seconds, turns, repeat)
+    counts = await count_turns(make_session, seconds, turns)
+    print(f"{name:<10} 每轮复制 {counts.copied_bytes / turns / 1024:9.1f} KB  "
+          f"新建缓冲区/视图 {counts.objects / turns:5.1f} 个  "
+          f"每轮临时峰值 {statistics.median(counts.peaks) / 1024:8.1f} KB  "
+          f"每轮耗时 {per_turn * 1e6:8.1f} µs")
+
+
+async def main(seconds: float, turns: int, repeat: int):
+    # 与线上一致：只输出 WARNING 以上，INFO 日志被过滤但 f-string 仍会先格式化
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("src.network.client_session").setLevel(logging.WARNING)
+    print(f"每轮上传 {seconds}s 音频 + 下发 {seconds}s 回复，共 {turns} 轮 × {repeat} 组")
+    await measure("原实现", LegacySession, seconds, turns, repeat)
+    await measure("现实现", ClientSession, seconds, turns, repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.seconds, args.turns, args.repeat))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+工作流每轮开销微基准：同一个 entry → chat 线性图，分别用 LinearExecutor（快速路径）
+和 LangGraph 编译后的图执行。聊天节点换成不访问LLM的假节点，只测图调度本身的开销。
+
+用法: python benchmarks/bench_workflow.py [--turns 20000]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src.workflow.executor import WorkflowBuilder, END
+from src.workflow.nodes.entry_node import entry_node
+from src.workflow.state import WorkflowState
+
+
+async def fake_chat_node(state: WorkflowState) -> WorkflowState:
+    """代替LLM调用，只写回复"""
+    state.bot_text = "好的"
+    state.current_node = "chat"
+    return state
+
+
+def build(use_langgraph: bool):
+    workflow = WorkflowBuilder(WorkflowState)
+    workflow.add_node("entry", entry_node)
+    workflow.add_node("chat", fake_chat_node)
+    workflow.set_entry_point("entry")
+    workflow.add_edge("entry", "chat")
+    workflow.add_edge("chat", END)
+    return workflow.compile(use_langgraph=use_langgraph)
+
+
+async def run(app, turns: int) -> list:
+    history = [{"role": "user", "content": "你好"}, {"role": "assistant", "content": "你好呀"}]
+    samples = []
+    for i in range(turns):
+        start = time.perf_counter()
+        state = WorkflowState(user_text=f"第{i}句", session_id="bench", device_info={"mac_addr": "00:00"},
+                              history=history, memory_summary=None)
+        result = await app.ainvoke(state)
+        samples.append(time.perf_counter() - start)
+        assert result.bot_text == "好的"
+    return samples
+
+
+def report(name: str, samples: list):
+    samples = sorted(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(f"{name:<10} 平均 {statistics.mean(samples) * 1e6:8.1f}us  "
+          f"p50 {statistics.median(samples) * 1e6:8.1f}us  p99 {p99 * 1e6:8.1f}us")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20000)
+    args = parser.parse_args()
+
+    results = {}
+    for name, use_langgraph in (("langgraph", True), ("linear", False)):
+        app = build(use_langgraph)
+        await run(app, min(500, args.turns))  # 预热
+        results[name] = await run(app, args.turns)
+        report(name, results[name])
+
+    speedup = statistics.mean(results["langgraph"]) / statistics.mean(results["linear"])
+    print(f"快速路径每轮开销约为 LangGraph 的 1/{speedup:.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
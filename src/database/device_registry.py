@@ -0,0 +1,157 @@
+"""
+设备注册表 - 在 DatabaseManager 之上缓存已知设备，合并注册查询并批量写回登录时间
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+
+logger = logging.getLogger("DeviceRegistry")
+
+
+class DeviceRegistry:
+    """
+    设备注册表：
+    - 已知设备在TTL内直接命中内存，注册不访问数据库；
+    - 未命中的设备在一个很短的窗口内合并成一条 IN 查询，同一设备的并发注册共享结果；
+    - 新设备立即批量upsert，已知设备的登录时间按设备合并，定期一条多行upsert写回。
+    """
+
+    def __init__(self, db_manager, ttl: float = 600.0, max_entries: int = 10000,
+                 batch_window: float = 0.01, batch_size: int = 500, flush_interval: float = 5.0):
+        """
+        Args:
+            db_manager: DatabaseManager 实例
+            ttl: 设备信息缓存有效期（秒）
+            max_entries: 最多缓存的设备数
+            batch_window: 合并未命中查询的等待窗口（秒）
+            batch_size: 单条查询/upsert 最多包含的设备数
+            flush_interval: 登录时间写回间隔（秒）
+        """
+        self.db_manager = db_manager
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()  # mac -> (过期时间, 设备信息)
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._loader: Optional[asyncio.Task] = None
+        self._logins: Dict[str, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def register(self, mac_addr: str) -> dict:
+        """
+        设备上线：返回设备信息（含 memory 列），不存在则注册。
+        登录时间只记录在内存中，由后台任务批量写回。
+        """
+        self._logins[mac_addr] = datetime.now()
+        device = self._get_cached(mac_addr)
+        if device is not None:
+            return device
+
+        future = self._pending.get(mac_addr)
+        if future is None:
+            future = self._pending[mac_addr] = asyncio.get_running_loop().create_future()
+            if self._loader is None:
+                self._loader = asyncio.create_task(self._load_pending())
+        return await asyncio.shield(future)
+
+    def update_cached(self, mac_addr: str, **fields):
+        """更新缓存中的设备信息（如写回后的记忆），设备不在缓存中时忽略"""
+        entry = self._cache.get(mac_addr)
+        if entry:
+            entry[1].update(fields)
+
+    def invalidate(self, mac_addr: str):
+        self._cache.pop(mac_addr, None)
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台任务并写回未保存的登录时间"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def flush(self):
+        """把合并后的登录时间批量写回数据库"""
+        if not self._logins:
+            return
+        logins, self._logins = self._logins, {}
+        items = list(logins.items())
+        for i in range(0, len(items), self.batch_size):
+            batch = items[i:i + self.batch_size]
+            try:
+                await self.db_manager.upsert_device_logins(batch)
+            except Exception as e:
+                logger.error(f"批量写回登录时间失败，将在下次重试: {e}")
+                for mac, login_time in batch:
+                    # 期间又有新的登录则保留较新的时间
+                    self._logins.setdefault(mac, login_time)
+
+    def _get_cached(self, mac_addr: str) -> Optional[dict]:
+        entry = self._cache.get(mac_addr)
+        if entry is None:
+            return None
+        expires_at, device = entry
+        if expires_at < time.monotonic():
+            del self._cache[mac_addr]
+            return None
+        self._cache.move_to_end(mac_addr)
+        return device
+
+    def _put_cached(self, mac_addr: str, device: dict):
+        self._cache[mac_addr] = (time.monotonic() + self.ttl, device)
+        self._cache.move_to_end(mac_addr)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    async def _load_pending(self):
+        """等待一个短窗口收集未命中的设备，然后分批查询"""
+        try:
+            await asyncio.sleep(self.batch_window)
+            while self._pending:
+                batch = dict(list(self._pending.items())[:self.batch_size])
+                for mac in batch:
+                    del self._pending[mac]
+                await self._load_batch(batch)
+        finally:
+            self._loader = None
+
+    async def _load_batch(self, batch: Dict[str, asyncio.Future]):
+        macs = list(batch)
+        try:
+            devices = await self.db_manager.get_devices(macs)
+            new_macs = [mac for mac in macs if mac not in devices]
+            if new_macs:
+                # 新设备立即落库，保证之后按 mac_addr 的 UPDATE 能命中
+                now = datetime.now()
+                await self.db_manager.upsert_device_logins(
+                    [(mac, self._logins.pop(mac, now)) for mac in new_macs])
+                logger.info(f"新设备已注册: {len(new_macs)} 台")
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for mac, future in batch.items():
+            device = devices.get(mac) or {"mac_addr": mac, "memory": None}
+            self._put_cached(mac, device)
+            if not future.done():
+                future.set_result(device)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
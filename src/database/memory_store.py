@@ -0,0 +1,171 @@
+"""
+设备对话记忆 - 进程内缓存滚动历史，批量异步回写 device.memory
+"""
+
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+logger = logging.getLogger("MemoryStore")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中日韩字符按1个计，其余按4个字符1个计"""
+    cjk = sum(1 for ch in text if ord(ch) > 0x2E80)
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class ConversationMemory:
+    """单个设备的对话记忆：长期摘要 + 受token预算约束的近期历史"""
+
+    def __init__(self, token_budget: int = 1500, summary_max_chars: int = 500):
+        self.token_budget = token_budget
+        self.summary_max_chars = summary_max_chars
+        self.summary: str = ""
+        self._history: Deque[Dict[str, str]] = deque()
+        self._tokens = 0
+
+    @classmethod
+    def load(cls, stored: Optional[str], **kwargs) -> "ConversationMemory":
+        """从 device.memory 列恢复；兼容旧版本直接存放的纯文本摘要"""
+        memory = cls(**kwargs)
+        if not stored:
+            return memory
+        try:
+            data = json.loads(stored)
+        except (TypeError, ValueError):
+            data = None
+        if isinstance(data, dict):
+            memory.summary = data.get("summary", "")
+            for message in data.get("history", []):
+                memory._append(message)
+            memory._trim()
+        else:
+            memory.summary = stored[-memory.summary_max_chars:]
+        return memory
+
+    def dump(self) -> str:
+        """序列化为写入 device.memory 列的字符串"""
+        return json.dumps({"summary": self.summary, "history": list(self._history)}, ensure_ascii=False)
+
+    def messages(self) -> List[Dict[str, str]]:
+        """近期历史的副本，供工作流构建提示词"""
+        return list(self._history)
+
+    def add_turn(self, user_text: str, bot_text: str):
+        self._append({"role": "user", "content": user_text})
+        self._append({"role": "assistant", "content": bot_text})
+        self._trim()
+
+    def _append(self, message: Dict[str, str]):
+        self._history.append(message)
+        self._tokens += estimate_tokens(message.get("content", ""))
+
+    def _trim(self):
+        # 超出预算的最早轮次（用户+助手两条）压缩进摘要，至少保留最近一轮
+        folded = []
+        while self._tokens > self.token_budget and len(self._history) > 2:
+            for _ in range(2):
+                message = self._history.popleft()
+                content = message.get("content", "")
+                self._tokens -= estimate_tokens(content)
+                prefix = "用户" if message.get("role") == "user" else "助手"
+                folded.append(f"{prefix}: {content}")
+        if folded:
+            summary = "\n".join(filter(None, [self.summary] + folded))
+            if len(summary) > self.summary_max_chars:
+                # 只保留最近的部分，并从完整的一行开始
+                summary = summary[-self.summary_max_chars:]
+                summary = summary.split("\n", 1)[-1]
+            self.summary = summary
+
+
+class MemoryStore:
+    """
+    记忆缓存与写回队列：注册时加载一次，对话过程中只读写内存，
+    变更的设备由后台任务按固定间隔合并成一条UPDATE写回数据库。
+    """
+
+    def __init__(self, db_manager, token_budget: int = 1500, summary_max_chars: int = 500,
+                 flush_interval: float = 5.0, batch_size: int = 200):
+        """
+        Args:
+            db_manager: DatabaseManager 实例
+            token_budget: 每个设备近期历史的token预算
+            summary_max_chars: 摘要最大长度
+            flush_interval: 回写间隔（秒）
+            batch_size: 单条UPDATE最多包含的设备数
+        """
+        self.db_manager = db_manager
+        self.token_budget = token_budget
+        self.summary_max_chars = summary_max_chars
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._memories: Dict[str, ConversationMemory] = {}
+        self._dirty: set = set()
+        self._evict_after_flush: set = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def prime(self, mac_addr: str, stored: Optional[str]):
+        """设备注册时用数据库中的值初始化缓存，已在缓存中则保留内存里较新的版本"""
+        self._evict_after_flush.discard(mac_addr)
+        if mac_addr not in self._memories:
+            self._memories[mac_addr] = ConversationMemory.load(
+                stored, token_budget=self.token_budget, summary_max_chars=self.summary_max_chars)
+
+    def get(self, mac_addr: str) -> ConversationMemory:
+        memory = self._memories.get(mac_addr)
+        if memory is None:
+            memory = self._memories[mac_addr] = ConversationMemory(self.token_budget, self.summary_max_chars)
+        return memory
+
+    def record_turn(self, mac_addr: str, user_text: str, bot_text: str):
+        """记录一轮对话，只修改内存并标记待写回"""
+        self.get(mac_addr).add_turn(user_text, bot_text)
+        self._dirty.add(mac_addr)
+
+    def release(self, mac_addr: str):
+        """设备断开：写回后从缓存移除"""
+        if mac_addr in self._dirty:
+            self._evict_after_flush.add(mac_addr)
+        else:
+            self._memories.pop(mac_addr, None)
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止后台任务并写回所有未保存的记忆"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def flush(self):
+        """把所有变更过的记忆批量写回数据库"""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        items = [(mac, self._memories[mac].dump()) for mac in dirty if mac in self._memories]
+        for i in range(0, len(items), self.batch_size):
+            batch = items[i:i + self.batch_size]
+            try:
+                await self.db_manager.save_memories(batch)
+            except Exception as e:
+                logger.error(f"批量写回记忆失败，将在下次重试: {e}")
+                self._dirty.update(mac for mac, _ in batch)
+        for mac in list(self._evict_after_flush):
+            if mac not in self._dirty:
+                self._evict_after_flush.discard(mac)
+                self._memories.pop(mac, None)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
@@ -1,23 +1,57 @@
-import aiomysql
 import logging
 import asyncio
+import time
+from contextlib import asynccontextmanager
+from ..utils.metrics import metrics
 
 logger = logging.getLogger("DatabaseManager")
 
+pool_wait_seconds = metrics.histogram(
+    "db_pool_wait_seconds", "从连接池获取连接的等待时间",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+query_seconds = metrics.histogram(
+    "db_query_seconds", "数据库操作耗时（不含等待连接）", ["op"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+query_errors = metrics.counter("db_query_errors_total", "数据库操作失败次数", ["op"])
+pool_connections = metrics.gauge("db_pool_connections", "连接池中的连接数", ["state"])
+
+def _dict_cursor():
+    from aiomysql import DictCursor
+    return DictCursor
+
 class DatabaseManager:
     """处理所有与MySQL数据库的异步交互"""
 
-    def __init__(self, host, port, user, password, db):
+    def __init__(self, host, port, user, password, db, minsize: int = 2, maxsize: int = 10,
+                 pool_recycle: int = 3600, connect_timeout: float = 5.0, query_timeout: float = 10.0,
+                 health_check_interval: float = 30.0):
+        """
+        Args:
+            minsize / maxsize: 连接池最小 / 最大连接数
+            pool_recycle: 连接最长复用时间（秒），应小于MySQL的 wait_timeout
+            connect_timeout: 建立连接超时（秒）
+            query_timeout: 单次查询超时（秒），超时的连接直接关闭
+            health_check_interval: 后台健康检查间隔（秒），<=0 时不检查
+        """
         self._host = host
         self._port = port
         self._user = user
         self._password = password
         self._db = db
         self._pool = None
+        self.minsize = minsize
+        self.maxsize = maxsize
+        self.pool_recycle = pool_recycle
+        self.connect_timeout = connect_timeout
+        self.query_timeout = query_timeout
+        self.health_check_interval = health_check_interval
+        self._health_task = None
 
     async def connect(self):
         """创建数据库连接池"""
         try:
+            # aiomysql 在首次连接时才导入，不拖慢服务启动
+            import aiomysql
             self._pool = await aiomysql.create_pool(
                 host=self._host,
                 port=self._port,
@@ -25,9 +59,18 @@ class DatabaseManager:
                 password=self._password,
                 db=self._db,
                 autocommit=True,
-                loop=asyncio.get_event_loop()
+                minsize=self.minsize,
+                maxsize=self.maxsize,
+                pool_recycle=self.pool_recycle,
+                connect_timeout=self.connect_timeout
             )
-            logger.info("数据库连接池创建成功")
+            pool_connections.set_function(lambda: self._pool.size if self._pool else 0, state="total")
+            pool_connections.set_function(lambda: self._pool.freesize if self._pool else 0, state="free")
+            # 启动时先预热一遍，第一批注册不用现建连接
+            await self.health_check()
+            if self.health_check_interval > 0:
+                self._health_task = asyncio.create_task(self._health_check_loop())
+            logger.info(f"数据库连接池创建成功 (min={self.minsize}, max={self.maxsize})")
         except Exception as e:
             logger.error(f"无法创建数据库连接池: {e}", exc_info=True)
             raise
@@ -38,23 +81,77 @@ class DatabaseManager:
 
     async def close(self):
         """关闭数据库连接池"""
+        if self._health_task:
+            self._health_task.cancel()
+            self._health_task = None
         if self._pool:
             self._pool.close()
             await self._pool.wait_closed()
             logger.info("数据库连接池已关闭")
 
+    @asynccontextmanager
+    async def _connection(self, op: str):
+        """获取连接并记录等待时间与操作耗时"""
+        start = time.perf_counter()
+        async with self._pool.acquire() as conn:
+            acquired = time.perf_counter()
+            pool_wait_seconds.observe(acquired - start)
+            try:
+                yield conn
+            except Exception:
+                query_errors.inc(op=op)
+                raise
+            finally:
+                query_seconds.observe(time.perf_counter() - acquired, op=op)
+
+    async def _execute(self, conn, cursor, sql: str, params=None, many: bool = False):
+        """带超时执行SQL；超时后连接状态未知，直接关闭，归还时被连接池丢弃"""
+        execute = cursor.executemany if many else cursor.execute
+        try:
+            return await asyncio.wait_for(execute(sql, params), self.query_timeout)
+        except asyncio.TimeoutError:
+            conn.close()
+            raise
+
+    async def _health_check_loop(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            try:
+                await self.health_check()
+            except Exception as e:
+                logger.warning(f"数据库健康检查失败: {e}")
+
+    async def health_check(self):
+        """并发取出 minsize 个连接逐个 ping，补足并预热空闲连接，断开的连接被丢弃"""
+        async def ping():
+            async with self._connection("ping") as conn:
+                try:
+                    await asyncio.wait_for(conn.ping(reconnect=False), self.query_timeout)
+                except Exception:
+                    conn.close()
+                    raise
+
+        results = await asyncio.gather(*(ping() for _ in range(self.minsize)), return_exceptions=True)
+        failed = sum(1 for r in results if isinstance(r, Exception))
+        wait_p99 = pool_wait_seconds.quantile(0.99)
+        logger.info(
+            f"连接池状态: 总数 {self._pool.size}, 空闲 {self._pool.freesize}, ping失败 {failed}, "
+            f"等待连接p99 {wait_p99 if wait_p99 is not None else '-'}s"
+        )
+
     async def get_device(self, mac_addr: str):
         """根据MAC地址查询设备信息"""
-        async with self._pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
-                await cursor.execute("SELECT * FROM device WHERE mac_addr = %s", (mac_addr,))
+        async with self._connection("get_device") as conn:
+            async with conn.cursor(_dict_cursor()) as cursor:
+                await self._execute(conn, cursor, "SELECT * FROM device WHERE mac_addr = %s", (mac_addr,))
                 return await cursor.fetchone()
 
     async def register_device(self, mac_addr: str):
         """注册新设备"""
-        async with self._pool.acquire() as conn:
+        async with self._connection("register_device") as conn:
             async with conn.cursor() as cursor:
-                await cursor.execute(
+                await self._execute(
+                    conn, cursor,
                     "INSERT INTO device (mac_addr, login_time) VALUES (%s, NOW())",
                     (mac_addr,)
                 )
@@ -62,13 +159,46 @@ class DatabaseManager:
 
     async def update_device_login(self, mac_addr: str):
         """更新设备的最后登录时间"""
-        async with self._pool.acquire() as conn:
+        async with self._connection("update_device_login") as conn:
             async with conn.cursor() as cursor:
-                await cursor.execute(
+                await self._execute(
+                    conn, cursor,
                     "UPDATE device SET login_time = NOW() WHERE mac_addr = %s",
                     (mac_addr,)
                 )
     
+    async def get_devices(self, mac_addrs: list) -> dict:
+        """批量查询设备，一次往返，返回 {mac_addr: {mac_addr, memory}}"""
+        if not mac_addrs:
+            return {}
+        placeholders = ", ".join(["%s"] * len(mac_addrs))
+        async with self._connection("get_devices") as conn:
+            async with conn.cursor(_dict_cursor()) as cursor:
+                await self._execute(
+                    conn, cursor,
+                    f"SELECT mac_addr, memory FROM device WHERE mac_addr IN ({placeholders})",
+                    list(mac_addrs)
+                )
+                return {row["mac_addr"]: row for row in await cursor.fetchall()}
+
+    async def upsert_device_logins(self, items: list):
+        """批量写入设备登录时间，不存在的设备同时完成注册
+
+        Args:
+            items: [(mac_addr, login_time), ...]
+        """
+        if not items:
+            return
+        async with self._connection("upsert_device_logins") as conn:
+            async with conn.cursor() as cursor:
+                # executemany 会把 INSERT 合并成一条多行语句
+                await self._execute(
+                    conn, cursor,
+                    "INSERT INTO device (mac_addr, login_time) VALUES (%s, %s) "
+                    "ON DUPLICATE KEY UPDATE login_time = VALUES(login_time)",
+                    items, many=True
+                )
+
     async def get_memory(self, mac_addr: str) -> str | None:
         """获取设备的长期记忆（摘要）"""
         device = await self.get_device(mac_addr)
@@ -80,14 +210,35 @@ class DatabaseManager:
 
     async def save_memory(self, mac_addr: str, memory: str):
         """保存设备的长期记忆（摘要）"""
-        async with self._pool.acquire() as conn:
+        async with self._connection("save_memory") as conn:
             async with conn.cursor() as cursor:
-                await cursor.execute(
+                await self._execute(
+                    conn, cursor,
                     "UPDATE device SET memory = %s WHERE mac_addr = %s",
                     (memory, mac_addr)
                 )
                 logger.info(f"已为设备 {mac_addr} 保存对话摘要") 
 
+    async def save_memories(self, items: list):
+        """批量保存多个设备的长期记忆，一条UPDATE完成
+
+        Args:
+            items: [(mac_addr, memory), ...]
+        """
+        if not items:
+            return
+        cases = " ".join(["WHEN %s THEN %s"] * len(items))
+        placeholders = ", ".join(["%s"] * len(items))
+        params = [value for item in items for value in item] + [mac for mac, _ in items]
+        async with self._connection("save_memories") as conn:
+            async with conn.cursor() as cursor:
+                await self._execute(
+                    conn, cursor,
+                    f"UPDATE device SET memory = CASE mac_addr {cases} END WHERE mac_addr IN ({placeholders})",
+                    params
+                )
+                logger.info(f"已批量保存 {len(items)} 个设备的对话记忆")
+
 
 
 # 数据库配置
@@ -97,4 +248,20 @@ DB_USER = "root"
 DB_PASS = "wznba778899"
 DB_NAME = "robot-ai"
 
-db_manager = DatabaseManager(DB_HOST, DB_PORT, DB_USER, DB_PASS, DB_NAME)
\ No newline at end of file
+# 连接池配置
+DB_POOL_MIN_SIZE = 2
+DB_POOL_MAX_SIZE = 10
+DB_POOL_RECYCLE = 3600          # 秒，小于MySQL默认的 wait_timeout(8小时)
+DB_CONNECT_TIMEOUT = 5.0
+DB_QUERY_TIMEOUT = 10.0
+DB_HEALTH_CHECK_INTERVAL = 30.0
+
+db_manager = DatabaseManager(
+    DB_HOST, DB_PORT, DB_USER, DB_PASS, DB_NAME,
+    minsize=DB_POOL_MIN_SIZE,
+    maxsize=DB_POOL_MAX_SIZE,
+    pool_recycle=DB_POOL_RECYCLE,
+    connect_timeout=DB_CONNECT_TIMEOUT,
+    query_timeout=DB_QUERY_TIMEOUT,
+    health_check_interval=DB_HEALTH_CHECK_INTERVAL
+)
\ No newline at end of file
@@ -1,46 +1,282 @@
-import aiohttp
+import asyncio
+import json
 import logging
-from typing import Optional
+import time
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+from ..utils.http_clients import http_clients
+from ..utils.backend_scheduler import backend_scheduler, BackendBusyError, backend_errors, backend_fallbacks
+from ..utils.metrics import metrics
+from ..utils import tracing
+from .prompts import LLM_UNAVAILABLE_REPLY
 
 logger = logging.getLogger(__name__)
 
+ollama_duration_seconds = metrics.histogram(
+    "ollama_duration_seconds", "Ollama响应中的分阶段耗时（load/prompt_eval/eval/total）", ["phase"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+ollama_tokens = metrics.counter("ollama_tokens_total", "Ollama处理的token数", ["kind"])
+ollama_context_reuse = metrics.counter(
+    "ollama_context_reuse_total", "对话请求是否复用了会话的context", ["result"])
+
+# Ollama响应中的耗时字段（纳秒）
+_DURATION_FIELDS = (
+    ("load", "load_duration"),
+    ("prompt_eval", "prompt_eval_duration"),
+    ("eval", "eval_duration"),
+    ("total", "total_duration"),
+)
+
+
+def _error_kind(e: Exception) -> str:
+    return "timeout" if isinstance(e, asyncio.TimeoutError) else "exception"
+
+
 class OllamaClient:
     """Ollama本地LLM客户端"""
-    def __init__(self, base_url: str = "http://192.168.1.5:11434", model: str = "qwen2.5:7b"):
+    def __init__(self, base_url: str = "http://192.168.1.5:11434", model: str = "qwen2.5:7b", backend: str = "ollama",
+                 keep_alive: Optional[str] = None, options: Optional[Dict[str, Any]] = None,
+                 profiles: Optional[Dict[str, Dict[str, Any]]] = None, context_limit: int = 3072):
+        """
+        Args:
+            base_url: Ollama服务地址
+            model: 模型名
+            backend: http_clients / backend_scheduler 中的后端名
+            keep_alive: 每次请求后模型在显存中保留的时间（如 "30m"），None 使用服务端默认
+            options: 默认生成参数（num_ctx、num_predict、temperature 等）
+            profiles: 按设备档案覆盖的生成参数 {档案名: options}
+            context_limit: 会话context超过该token数时丢弃，下一轮由记忆重新构建
+        """
         self.base_url = base_url
         self.model = model
-        logger.info(f"初始化Ollama客户端: {base_url}, 模型: {model}")
-    
-    async def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        self.backend = backend  # http_clients 中的后端名，复用长连接
+        self.keep_alive = keep_alive
+        self.options = dict(options or {})
+        self.profiles = dict(profiles or {})
+        self.context_limit = context_limit
+        self._contexts: Dict[str, List[int]] = {}  # session_id -> 上一轮返回的context
+        self._last_request = 0.0
+        self._keepalive_task: Optional[asyncio.Task] = None
+        logger.info("初始化Ollama客户端: %s, 模型: %s", base_url, model)
+
+    def configure(self, **kwargs):
+        """更新客户端参数（keep_alive / options / profiles / context_limit），只更新传入的字段"""
+        for name, value in kwargs.items():
+            if not hasattr(self, name):
+                raise AttributeError(f"OllamaClient 没有参数 {name}")
+            setattr(self, name, value)
+
+    def options_for(self, profile: Optional[str] = None) -> Dict[str, Any]:
+        """默认生成参数叠加设备档案的参数"""
+        options = dict(self.options)
+        if profile:
+            if profile in self.profiles:
+                options.update(self.profiles[profile])
+            else:
+                logger.debug("未知的设备档案 %s，使用默认生成参数", profile)
+        return options
+
+    async def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                       options: Optional[Dict[str, Any]] = None) -> str:
         """调用Ollama生成回复"""
+        text, _ = await self._generate(self._build_payload(prompt, system_prompt, options))
+        return text
+
+    async def generate_stream(self, prompt: str, system_prompt: Optional[str] = None,
+                              options: Optional[Dict[str, Any]] = None) -> AsyncGenerator[str, None]:
+        """流式调用Ollama，逐段产出生成的文本"""
+        async for text in self._generate_stream(self._build_payload(prompt, system_prompt, options)):
+            yield text
+
+    async def _generate(self, payload: dict, session_id: Optional[str] = None) -> Tuple[str, Optional[dict]]:
+        """非流式请求，返回 (回复文本, 原始响应)"""
         url = f"{self.base_url}/api/generate"
-        
+        payload["stream"] = False
+        self._last_request = time.monotonic()
+
+        try:
+            session = http_clients.aiohttp_session(self.backend)
+            with tracing.span("llm.total", stream=False):
+                async with backend_scheduler.slot(self.backend), session.post(url, json=payload) as response:
+                    if response.status == 200:
+                        result = await response.json()
+                        self._on_done(result, session_id)
+                        return result.get("response", ""), result
+                    else:
+                        error_text = await response.text()
+                        backend_errors.inc(backend=self.backend, kind="status")
+                        logger.error("Ollama API调用失败: %s - %s", response.status, error_text)
+        except BackendBusyError:
+            raise
+        except Exception as e:
+            backend_errors.inc(backend=self.backend, kind=_error_kind(e))
+            logger.error("Ollama API调用异常: %s", e)
+        self.reset_context(session_id)
+        backend_fallbacks.inc(backend=self.backend, fallback="apology")
+        return LLM_UNAVAILABLE_REPLY, None
+
+    async def _generate_stream(self, payload: dict, session_id: Optional[str] = None) -> AsyncGenerator[str, None]:
+        url = f"{self.base_url}/api/generate"
+        payload["stream"] = True
+        self._last_request = time.monotonic()
+        start = time.perf_counter()
+
+        produced = False
+        completed = False
+        try:
+            session = http_clients.aiohttp_session(self.backend)
+            # 流式生成期间一直占用槽位
+            async with backend_scheduler.slot(self.backend), session.post(url, json=payload) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    backend_errors.inc(backend=self.backend, kind="status")
+                    logger.error("Ollama API调用失败: %s - %s", response.status, error_text)
+                else:
+                    # 响应为NDJSON，每行一个增量
+                    async for line in response.content:
+                        if not line.strip():
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get("error"):
+                            backend_errors.inc(backend=self.backend, kind="stream")
+                            logger.error("Ollama流式生成出错: %s", chunk['error'])
+                            break
+                        text = chunk.get("response", "")
+                        if text:
+                            if not produced:
+                                tracing.record("llm.ttft", time.perf_counter() - start)
+                            produced = True
+                            yield text
+                        if chunk.get("done"):
+                            # 最后一行带有耗时统计和新的context
+                            self._on_done(chunk, session_id)
+                            completed = True
+                            break
+        except BackendBusyError:
+            raise
+        except Exception as e:
+            backend_errors.inc(backend=self.backend, kind=_error_kind(e))
+            logger.error("Ollama API调用异常: %s", e)
+
+        tracing.record("llm.total", time.perf_counter() - start, stream=True)
+        if not completed:
+            self.reset_context(session_id)
+        if not produced:
+            backend_fallbacks.inc(backend=self.backend, fallback="apology")
+            yield LLM_UNAVAILABLE_REPLY
+
+    def _build_payload(self, prompt: str, system_prompt: Optional[str] = None,
+                       options: Optional[Dict[str, Any]] = None, context: Optional[List[int]] = None) -> dict:
         payload = {
             "model": self.model,
-            "prompt": prompt,
-            "stream": False
+            "prompt": prompt
         }
-        
         if system_prompt:
             payload["system"] = system_prompt
-        
+        if options:
+            payload["options"] = options
+        if context:
+            payload["context"] = context
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        return payload
+
+    def _build_chat_payload(self, messages: list, system_prompt: Optional[str], session_id: Optional[str],
+                            profile: Optional[str]) -> dict:
+        """
+        会话已有context时只发送本轮用户输入，系统提示词和之前的对话都已在context中，
+        Ollama不必再对它们做prompt eval；否则发送完整的历史和系统提示词开始新的context。
+        """
+        options = self.options_for(profile)
+        context = self._contexts.get(session_id) if session_id else None
+        if context:
+            ollama_context_reuse.inc(result="hit")
+            return self._build_payload(self.build_chat_prompt(messages[-1:]), None, options, context)
+        if session_id:
+            ollama_context_reuse.inc(result="miss")
+        return self._build_payload(self.build_chat_prompt(messages), system_prompt, options)
+
+    def _on_done(self, result: dict, session_id: Optional[str]):
+        """记录分阶段耗时，保存会话的新context"""
+        for phase, field in _DURATION_FIELDS:
+            value = result.get(field)
+            if value is not None:
+                ollama_duration_seconds.observe(value / 1e9, phase=phase)
+        if result.get("prompt_eval_count") is not None:
+            ollama_tokens.inc(result["prompt_eval_count"], kind="prompt")
+        if result.get("eval_count") is not None:
+            ollama_tokens.inc(result["eval_count"], kind="eval")
+        logger.debug(
+            "Ollama耗时: load %.3fs, prompt_eval %.3fs (%s tokens), eval %.3fs (%s tokens)",
+            result.get("load_duration", 0) / 1e9, result.get("prompt_eval_duration", 0) / 1e9,
+            result.get("prompt_eval_count"), result.get("eval_duration", 0) / 1e9, result.get("eval_count"))
+
+        if not session_id:
+            return
+        context = result.get("context")
+        if context and len(context) <= self.context_limit:
+            self._contexts[session_id] = context
+        else:
+            # context过长时丢弃，下一轮用记忆中的摘要和近期历史重新开始
+            self._contexts.pop(session_id, None)
+
+    def reset_context(self, session_id: Optional[str]):
+        """丢弃会话的context（会话结束、请求失败时）"""
+        if session_id:
+            self._contexts.pop(session_id, None)
+
+    async def ping(self) -> bool:
+        """发送不带prompt的请求：模型未加载时加载，已加载时刷新 keep_alive 计时"""
+        url = f"{self.base_url}/api/generate"
+        payload = {"model": self.model}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return result.get("response", "")
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Ollama API调用失败: {response.status} - {error_text}")
-                        return "抱歉，我现在无法正常回复。"
+            session = http_clients.aiohttp_session(self.backend)
+            async with session.post(url, json=payload) as response:
+                if response.status != 200:
+                    logger.warning("Ollama保活请求失败: %s - %s", response.status, await response.text())
+                    return False
+                result = await response.json()
+                if result.get("load_duration"):
+                    ollama_duration_seconds.observe(result["load_duration"] / 1e9, phase="load")
+                return True
         except Exception as e:
-            logger.error(f"Ollama API调用异常: {e}")
-            return "抱歉，我现在无法正常回复。"
-    
-    async def chat(self, messages: list) -> str:
-        """对话模式"""
-        # 将消息历史转换为prompt
+            logger.warning("Ollama保活请求异常: %s", e)
+            return False
+
+    async def warmup(self) -> bool:
+        """让Ollama把模型加载进显存，首轮对话不必等待加载"""
+        loaded = await self.ping()
+        if loaded:
+            logger.info("Ollama模型 %s 已加载", self.model)
+        return loaded
+
+    def start_keepalive(self, interval: float):
+        """后台定期保活：距上次请求超过 interval 秒时发送一次空请求，防止模型因空闲被卸载"""
+        if interval > 0 and self._keepalive_task is None:
+            self._keepalive_task = asyncio.create_task(self._keepalive_loop(interval))
+
+    async def stop_keepalive(self):
+        if self._keepalive_task:
+            self._keepalive_task.cancel()
+            try:
+                await self._keepalive_task
+            except asyncio.CancelledError:
+                pass
+            self._keepalive_task = None
+
+    async def _keepalive_loop(self, interval: float):
+        while True:
+            idle = time.monotonic() - self._last_request
+            if idle < interval:
+                await asyncio.sleep(interval - idle)
+                continue
+            self._last_request = time.monotonic()
+            await self.ping()
+
+    @staticmethod
+    def build_chat_prompt(messages: list) -> str:
+        """将消息历史转换为prompt"""
         prompt = ""
         for msg in messages:
             role = msg.get("role", "user")
@@ -49,7 +285,28 @@ class OllamaClient:
                 prompt += f"用户: {content}\n"
             else:
                 prompt += f"助手: {content}\n"
-        
+
         prompt += "助手:"
-        
-        return await self.generate(prompt)
\ No newline at end of file
+        return prompt
+
+    async def chat(self, messages: list, system_prompt: Optional[str] = None,
+                   session_id: Optional[str] = None, profile: Optional[str] = None) -> str:
+        """
+        对话模式
+
+        Args:
+            messages: 近期历史 + 本轮用户输入
+            system_prompt: 系统提示词
+            session_id: 会话ID，给出时复用该会话上一轮返回的context
+            profile: 设备档案名，选择生成参数
+        """
+        text, _ = await self._generate(
+            self._build_chat_payload(messages, system_prompt, session_id, profile), session_id)
+        return text
+
+    async def chat_stream(self, messages: list, system_prompt: Optional[str] = None,
+                          session_id: Optional[str] = None, profile: Optional[str] = None) -> AsyncGenerator[str, None]:
+        """对话模式（流式），参数同 chat"""
+        payload = self._build_chat_payload(messages, system_prompt, session_id, profile)
+        async for text in self._generate_stream(payload, session_id):
+            yield text
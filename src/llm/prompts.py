@@ -12,4 +12,12 @@ TOOL_PROMPT = """用户: {user_text}
 请分析用户的意图，如果需要使用工具，请说明需要什么工具。
 助手:"""
 
-ERROR_PROMPT = """抱歉，我刚才理解错了。请你重新说一遍好吗？"""
\ No newline at end of file
+MEMORY_PROMPT = """以下是你与该用户之前对话的摘要，可作为背景参考：
+{summary}"""
+
+ERROR_PROMPT = """抱歉，我刚才理解错了。请你重新说一遍好吗？"""
+
+# 固定回复文本，启动时会预合成到TTS缓存
+LLM_UNAVAILABLE_REPLY = "抱歉，我现在无法正常回复。"
+PROCESSING_ERROR_REPLY = "抱歉，处理您的请求时出现了问题。"
+BUSY_REPLY = "我现在有点忙，请稍后再和我说一遍。"
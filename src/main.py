@@ -2,8 +2,11 @@
 import sys
 import os
 import asyncio
+import importlib
 import logging
 import json
+import signal
+from typing import Optional
 
 # --- Start of Path Fix ---
 # 将项目根目录（robot-agent-server）添加到sys.path
@@ -13,15 +16,30 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 # --- End of Path Fix ---
 
-# 导入自定义模块
-from src.processors.audio_processor import AudioProcessor
+# 导入自定义模块（只导入启动监听所需的轻量模块，处理链在监听端口后再导入）
 from src.network.websocket_server import WebSocketServer
-from src.processors.asr_processor import SpeechRecognizer
+from src.llm.prompts import ERROR_PROMPT, LLM_UNAVAILABLE_REPLY, PROCESSING_ERROR_REPLY, BUSY_REPLY
 from src.database.operations import db_manager
-from src.network.message_handler import MessageHandler
+from src.utils.http_clients import http_clients
+from src.utils.backend_scheduler import backend_scheduler
+from src.utils.startup import StartupProfile
+from src.utils.loop_monitor import LoopLagMonitor
+from src.network.admin_server import AdminServer
+from src.utils.log_config import setup_logging, set_static_fields
+from src.utils.supervisor import Supervisor, WorkerHandle
 
-# 配置日志
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# 日志配置（运行时可通过环境变量覆盖，如 LOG_FORMAT=json LOG_LEVEL=DEBUG）
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_JSON = os.environ.get("LOG_FORMAT", "text").lower() == "json"
+# 高频日志每个类别每秒最多输出的条数
+LOG_SAMPLE_RATES = {
+    "audio_chunk": 2,      # 逐帧收发音频
+    "closed_send": 1,      # 连接关闭后仍在发送（流式发送中断时每帧一条）
+}
+
+# 配置日志：记录放入队列，由后台线程格式化和输出
+setup_logging(level=getattr(logging, LOG_LEVEL, logging.INFO), json_format=LOG_JSON,
+              sample_rates=LOG_SAMPLE_RATES)
 logger = logging.getLogger("Main")
 
 
@@ -36,38 +54,355 @@ WS_PATH = "/ws"
 script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 AUDIO_DIR = os.path.join(script_dir,"assets","audio_files")
 
-async def main():
-    """服务器主入口函数"""
-    try:
+# 各后端HTTP连接池配置（limit: 最大连接数，timeout: 单次请求总超时秒数）
+HTTP_BACKENDS = {
+    "asr": {"limit": 8, "keepalive_timeout": 60.0, "timeout": 30.0, "connect_timeout": 5.0},
+    "ollama": {"limit": 16, "keepalive_timeout": 300.0, "timeout": 120.0, "connect_timeout": 5.0},
+    "tts": {"limit": 16, "keepalive_timeout": 60.0, "timeout": 30.0, "connect_timeout": 5.0},
+}
+
+# 后端调度配置（concurrency: 同时进行的请求数，max_queue: 排队上限，超过后播放繁忙提示）
+# ASR的并发数由 ASR_MAX_CONCURRENCY 设置
+BACKEND_LIMITS = {
+    "asr": {"max_queue": 32},
+    "ollama": {"concurrency": 2, "max_queue": 16},
+    "tts": {"concurrency": 4, "max_queue": 64},
+}
+
+# ASR配置
+ASR_SERVER_URL = "http://192.168.1.5:50000/api/v1/asr"
+ASR_MAX_CONCURRENCY = 4      # 同时发往ASR服务器的最大请求数
+ASR_STREAMING = True         # 录音过程中分块增量识别
+ASR_CHUNK_SECONDS = 4.0      # 增量识别的分块时长（秒）
+ASR_BATCH_WINDOW_MS = 30     # 跨会话合并识别请求的等待窗口（毫秒），0 表示不合并
+ASR_MAX_BATCH = 8            # 单次ASR请求最多包含的音频段数
+
+# Ollama配置
+OLLAMA_KEEP_ALIVE = "30m"        # 每次请求后模型在显存中保留的时间
+OLLAMA_KEEPALIVE_INTERVAL = 240.0  # 空闲超过该秒数时发送一次保活请求，0 表示不保活
+OLLAMA_OPTIONS = {"num_ctx": 4096, "num_predict": 160}  # 默认生成参数，回复适合语音播放
+# 设备注册时通过 profile 选择的生成参数，覆盖默认值
+OLLAMA_PROFILES = {
+    "brief": {"num_predict": 80},
+    "kids": {"num_predict": 100, "temperature": 0.5},
+    "detailed": {"num_predict": 400},
+}
+OLLAMA_CONTEXT_LIMIT = 3072      # 会话复用的context超过该token数时丢弃，由记忆重新构建
+
+# VAD配置
+VAD_ENABLED = True           # 服务端裁剪静音并丢弃纯静音轮次
+VAD_AUTO_ENDPOINT = True     # 检测到发言结束后不等客户端 end_stream 直接处理
+VAD_HANGOVER_MS = 700        # 说话后持续多长静音判定为发言结束
+VAD_MIN_SPEECH_MS = 200      # 短于该时长的语音视为噪声
+
+# TTS缓存配置
+TTS_CACHE_MAX_BYTES = 32 * 1024 * 1024         # 内存层字节预算
+TTS_CACHE_DISK_DIR = os.path.join(script_dir, "assets", "tts_cache")  # 设为None则只用内存层
+TTS_CACHE_DISK_MAX_BYTES = 256 * 1024 * 1024
+# 启动时预合成的常用短语
+TTS_PREWARM_PHRASES = [
+    PROCESSING_ERROR_REPLY,
+    LLM_UNAVAILABLE_REPLY,
+    BUSY_REPLY,
+    ERROR_PROMPT,
+]
+
+# 下行音频发送配置（设备注册时可通过 audio_chunk_size / audio_pacing_ms 覆盖）
+AUDIO_CHUNK_SIZE = 64 * 1024     # 每个二进制帧的最大字节数
+AUDIO_PACING_MS = 0.0            # 帧间隔（毫秒），0 表示不限速
+
+# 实时节奏发送（设备可用 mcp/audio/buffer_status 上报缓冲水位做流控）
+PLAYBACK_PACED = True
+PLAYBACK_REALTIME_FACTOR = 1.2   # 发送速率为实时播放的倍数
+PLAYBACK_PREBUFFER_MS = 300      # 开头不限速发送的时长
+PLAYBACK_MAX_BUFFER_MS = 2000    # 设备未声明容量时假定的缓冲上限
+
+# 音频编码协商（设备在 registerTools 的 audio_codecs 中声明，opuslib 不可用时只用PCM）
+AUDIO_CODECS = ["opus", "pcm"]   # 服务端偏好顺序
+OPUS_BITRATE = 24000             # bps，原始16kHz PCM为256kbps
+OPUS_FRAME_MS = 20
+
+# 管理端HTTP服务（/metrics /healthz /readyz /stages），ADMIN_PORT 设为None则不启动
+ADMIN_HOST = "0.0.0.0"
+ADMIN_PORT = 9100
+LOOP_LAG_INTERVAL = 0.5          # 事件循环延迟采样间隔（秒）
+LOOP_LAG_WARN = 0.5              # 延迟超过该秒数时输出警告
+# 事件循环阻塞看门狗：阻塞超过该毫秒数时记录事件循环线程的调用栈，0 表示关闭
+# 运行时通过环境变量开启，例如 LOOP_WATCHDOG_MS=100 python -m src.main
+LOOP_WATCHDOG_MS = float(os.environ.get("LOOP_WATCHDOG_MS", "0"))
+
+# 多进程模式：WORKERS > 1 时主进程只负责管理，工作进程以 SO_REUSEPORT 共享监听端口
+# 每个工作进程有自己的数据库连接池和HTTP连接池（总连接数随进程数成倍增加）
+# 向主进程发送 SIGHUP 滚动重启；ADMIN_PORT 上的 /metrics 汇总各工作进程（带 worker 标签）
+WORKERS = int(os.environ.get("WORKERS", "1"))
+WORKER_READY_TIMEOUT = 120.0     # 滚动重启时等待新进程就绪的最长秒数，超时则保留旧进程
+WORKER_DRAIN_SECONDS = 30.0      # 退出前等待进行中的对话结束的最长秒数，之后通知设备重连
+
+# 会话处理队列配置
+TURN_QUEUE_SIZE = 2              # 每个连接排队等待处理的发言数上限
+TURN_QUEUE_OVERFLOW = "drop_oldest"  # 队列满时: drop_oldest / drop_newest / block
+
+# 设备注册表配置
+DEVICE_CACHE_TTL = 600.0         # 已知设备缓存有效期（秒）
+DEVICE_LOGIN_FLUSH_INTERVAL = 5.0  # 登录时间批量写回间隔（秒）
+
+# 对话记忆配置
+MEMORY_TOKEN_BUDGET = 1500       # 每个设备携带的近期历史token预算，超出部分压缩进摘要
+MEMORY_SUMMARY_MAX_CHARS = 500   # 摘要最大长度
+MEMORY_FLUSH_INTERVAL = 5.0      # 记忆批量写回数据库的间隔（秒）
+
+# 音频归档配置（默认关闭，ASR直接上传内存中的WAV）
+ARCHIVE_AUDIO = False
+ARCHIVE_MAX_FILES = 1000
+ARCHIVE_MAX_BYTES = 512 * 1024 * 1024
+
+# 处理链中较重的模块（numpy、VAD、工作流等），开始监听后在线程中导入
+DEFERRED_IMPORTS = ["src.network.message_handler"]
+
+
+class Services:
+    """启动过程中创建的组件，退出时统一清理"""
+
+    def __init__(self):
+        self.audio_archiver = None
+        self.memory_store = None
+        self.device_registry = None
+        self.tts_processor = None
+        self.message_handler = None
+        self.llm_client = None
+        self.asr_batcher = None
+
+
+def _import_deferred():
+    for name in DEFERRED_IMPORTS:
+        importlib.import_module(name)
+
+
+def build_services() -> Services:
+    """创建各处理组件（不做网络IO），依赖的模块已由 _import_deferred 导入"""
+    from src.processors.audio_processor import AudioProcessor, AudioArchiver
+    from src.processors.asr_processor import AsyncSpeechRecognizer
+    from src.processors.asr_batcher import ASRBatcher
+    from src.processors.streaming_asr import StreamingRecognizer
+    from src.processors.vad import VoiceActivityDetector
+    from src.processors.tts_processor import TTSProcessor
+    from src.processors.tts_cache import TTSCache
+    from src.processors.audio_codec import OpusConfig
+    from src.database.memory_store import MemoryStore
+    from src.database.device_registry import DeviceRegistry
+    from src.network.message_handler import MessageHandler
+    from src.network.audio_pacer import PlaybackConfig
+    from src.workflow.nodes.chat_node import llm_client
+
+    services = Services()
+    llm_client.configure(
+        keep_alive=OLLAMA_KEEP_ALIVE,
+        options=OLLAMA_OPTIONS,
+        profiles=OLLAMA_PROFILES,
+        context_limit=OLLAMA_CONTEXT_LIMIT
+    )
+    services.llm_client = llm_client
+    services.memory_store = MemoryStore(
+        db_manager,
+        token_budget=MEMORY_TOKEN_BUDGET,
+        summary_max_chars=MEMORY_SUMMARY_MAX_CHARS,
+        flush_interval=MEMORY_FLUSH_INTERVAL
+    )
+    services.device_registry = DeviceRegistry(
+        db_manager,
+        ttl=DEVICE_CACHE_TTL,
+        flush_interval=DEVICE_LOGIN_FLUSH_INTERVAL
+    )
+
+    audio_processor = AudioProcessor(AUDIO_DIR)
+    speech_recognizer = AsyncSpeechRecognizer(
+        server_url=ASR_SERVER_URL,
+        max_concurrency=ASR_MAX_CONCURRENCY
+    )
+    if ASR_BATCH_WINDOW_MS > 0:
+        # 与识别器接口相同，下游无需区分
+        speech_recognizer = ASRBatcher(speech_recognizer, window_ms=ASR_BATCH_WINDOW_MS, max_batch=ASR_MAX_BATCH)
+        services.asr_batcher = speech_recognizer
+
+    streaming_recognizer = None
+    if ASR_STREAMING:
+        streaming_recognizer = StreamingRecognizer(speech_recognizer, audio_processor, chunk_seconds=ASR_CHUNK_SECONDS)
+
+    if ARCHIVE_AUDIO:
+        services.audio_archiver = AudioArchiver(audio_processor, max_files=ARCHIVE_MAX_FILES, max_bytes=ARCHIVE_MAX_BYTES)
+
+    vad = None
+    if VAD_ENABLED:
+        vad = VoiceActivityDetector(hangover_ms=VAD_HANGOVER_MS, min_speech_ms=VAD_MIN_SPEECH_MS)
+
+    tts_cache = TTSCache(
+        max_bytes=TTS_CACHE_MAX_BYTES,
+        disk_dir=TTS_CACHE_DISK_DIR,
+        disk_max_bytes=TTS_CACHE_DISK_MAX_BYTES
+    )
+    services.tts_processor = TTSProcessor(cache=tts_cache)
+
+    services.message_handler = MessageHandler(
+        db_manager, audio_processor, speech_recognizer, services.audio_archiver,
+        streaming_recognizer=streaming_recognizer,
+        vad=vad,
+        vad_auto_endpoint=VAD_AUTO_ENDPOINT,
+        tts_processor=services.tts_processor,
+        memory_store=services.memory_store,
+        device_registry=services.device_registry,
+        turn_queue_size=TURN_QUEUE_SIZE,
+        turn_queue_overflow=TURN_QUEUE_OVERFLOW,
+        audio_chunk_size=AUDIO_CHUNK_SIZE,
+        audio_pacing_ms=AUDIO_PACING_MS,
+        playback=PlaybackConfig(
+            realtime_factor=PLAYBACK_REALTIME_FACTOR,
+            prebuffer_ms=PLAYBACK_PREBUFFER_MS,
+            max_buffer_ms=PLAYBACK_MAX_BUFFER_MS
+        ) if PLAYBACK_PACED else None,
+        audio_codecs=AUDIO_CODECS,
+        opus_config=OpusConfig(bitrate=OPUS_BITRATE, frame_ms=OPUS_FRAME_MS),
+        # 多进程模式下设备可能重连到其他进程，断开时不保留注册表缓存
+        keep_device_cache=WORKERS <= 1
+    )
+    return services
+
+
+async def connect_database(profile: StartupProfile):
+    """建立数据库连接池；失败时启动中止"""
+    with profile.phase("db_pool"):
         await db_manager.connect()
 
-        # 2. 初始化服务处理器
-        audio_processor = AudioProcessor(AUDIO_DIR)
-        speech_recognizer = SpeechRecognizer()
-        
-        # 3. 初始化消息处理器
-        message_handler = MessageHandler(db_manager, audio_processor, speech_recognizer)
-
-        # 4. 创建并启动WebSocket服务器
-        ws_server = WebSocketServer(
-            host=HOST, 
-            port=PORT, 
-            ws_path=WS_PATH, 
-            on_connect=message_handler.on_connect,
-            on_message=message_handler.handle_message, 
-            on_disconnect=message_handler.on_disconnect
+
+async def warm_backends(profile: StartupProfile, services: Services):
+    """后台并发预热TTS缓存和Ollama模型，不影响服务就绪"""
+    await asyncio.gather(
+        profile.run("warm:tts_cache", services.tts_processor.prewarm(TTS_PREWARM_PHRASES)),
+        profile.run("warm:ollama_model", services.llm_client.warmup()),
+    )
+    profile.report("后台预热完成")
+    # 之后定期保活，模型不会因空闲被卸载
+    services.llm_client.start_keepalive(OLLAMA_KEEPALIVE_INTERVAL)
+
+
+async def main(worker: Optional[WorkerHandle] = None):
+    """
+    服务器主入口函数
+
+    Args:
+        worker: 多进程模式下由主进程传入的句柄，为空时单进程运行
+    """
+    profile = StartupProfile()
+    services = Services()
+    ws_server = None
+    admin_server = None
+    loop_monitor = LoopLagMonitor(LOOP_LAG_INTERVAL, LOOP_LAG_WARN,
+                                  block_threshold=LOOP_WATCHDOG_MS / 1000 if LOOP_WATCHDOG_MS > 0 else None)
+    background = []
+    try:
+        for backend, config in HTTP_BACKENDS.items():
+            http_clients.configure(backend, **config)
+        for backend, limits in BACKEND_LIMITS.items():
+            backend_scheduler.configure(backend, **limits)
+
+        # 1. 先开始监听，设备可以立即连接；就绪前的连接等待，消息由连接缓冲
+        ws_server = WebSocketServer(host=HOST, port=PORT, ws_path=WS_PATH, reuse_port=worker is not None)
+        with profile.phase("listen"):
+            await ws_server.listen()
+        loop_monitor.start()
+        if worker:
+            # 工作进程的管理端只供主进程抓取，端口由系统分配后告知主进程
+            admin_server = AdminServer("127.0.0.1", 0, ready=ws_server.is_ready)
+            await admin_server.start()
+            worker.set_admin_port(admin_server.port)
+        elif ADMIN_PORT:
+            # 启动期间也可抓取指标，/readyz 在服务就绪前返回 503
+            admin_server = AdminServer(ADMIN_HOST, ADMIN_PORT, ready=ws_server.is_ready)
+            # 端口被占用等失败不影响主服务
+            await profile.run("admin", admin_server.start())
+
+        # 2. 数据库连接池和HTTP客户端在后台建立，同时在线程中导入处理链
+        db_task = asyncio.create_task(connect_database(profile))
+        background.append(asyncio.create_task(profile.run("warm:http_clients", http_clients.prewarm())))
+        with profile.phase("import"):
+            await asyncio.to_thread(_import_deferred)
+
+        # 3. 初始化服务处理器
+        with profile.phase("init"):
+            services = build_services()
+
+        # 4. 注册和记忆依赖数据库，等连接池建好后再放行连接（连接失败时启动中止）
+        await db_task
+        with profile.phase("start"):
+            await services.memory_store.start()
+            await services.device_registry.start()
+            if services.audio_archiver:
+                await services.audio_archiver.start()
+
+        handler = services.message_handler
+        ws_server.attach(
+            on_connect=handler.on_connect,
+            on_message=handler.handle_message,
+            on_disconnect=handler.on_disconnect
         )
+        profile.report("服务就绪")
+        if worker:
+            worker.set_ready()
+        # SIGTERM：停止接受新连接，等进行中的对话结束后退出（滚动重启和 systemd stop 都走这里）
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGTERM,
+            lambda: asyncio.ensure_future(ws_server.drain(WORKER_DRAIN_SECONDS, idle=handler.is_idle))
+        )
+
+        # 5. TTS缓存和Ollama模型在后台预热
+        background.append(asyncio.create_task(warm_backends(profile, services)))
         await ws_server.start()
         
     except Exception as e:
         logger.critical(f"服务器启动失败: {e}", exc_info=True)
+        profile.report("启动失败前的耗时")
     finally:
+        for task in background:
+            task.cancel()
+        if ws_server:
+            await ws_server.close()
+        if admin_server:
+            await admin_server.stop()
+        await loop_monitor.stop()
+        if services.asr_batcher:
+            # 在关闭HTTP客户端之前取消合并中的识别请求
+            await services.asr_batcher.close()
+        if services.llm_client:
+            await services.llm_client.stop_keepalive()
+        if services.audio_archiver:
+            await services.audio_archiver.stop()
+        if services.memory_store:
+            # 退出前写回未保存的记忆
+            await services.memory_store.stop()
+        if services.device_registry:
+            await services.device_registry.stop()
+        await http_clients.close_all()
         if db_manager:
             await db_manager.close()
 
+def run_worker(worker: WorkerHandle):
+    """工作进程入口（由主进程以 spawn 方式启动）"""
+    set_static_fields(worker=worker.slot)
+    try:
+        asyncio.run(main(worker))
+    except Exception as e:
+        logger.critical(f"工作进程运行时发生错误: {e}", exc_info=True)
+
+
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        if WORKERS > 1:
+            supervisor = Supervisor(run_worker, WORKERS,
+                                    ready_timeout=WORKER_READY_TIMEOUT,
+                                    stop_timeout=WORKER_DRAIN_SECONDS + 15.0,
+                                    admin_host=ADMIN_HOST, admin_port=ADMIN_PORT)
+            asyncio.run(supervisor.run())
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("服务器被手动中断")
     except Exception as e:
@@ -0,0 +1,81 @@
+"""
+管理端HTTP服务 - 与WebSocket服务分开端口，提供指标抓取和健康检查
+"""
+
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from ..utils.metrics import metrics
+from ..utils import tracing
+
+logger = logging.getLogger("AdminServer")
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class AdminServer:
+    """
+    GET /metrics  Prometheus 文本格式的全部指标
+    GET /healthz  进程存活即返回 200
+    GET /readyz   服务就绪（可接收设备）时返回 200，否则 503
+    GET /stages   对话轮次各阶段耗时的 p50/p95/p99（JSON）
+    """
+
+    def __init__(self, host: str, port: int, ready: Optional[Callable[[], bool]] = None,
+                 metrics_source: Optional[Callable[[], Awaitable[str]]] = None,
+                 stages_source: Optional[Callable[[], Awaitable[Dict[str, Any]]]] = None):
+        """
+        Args:
+            host / port: 监听地址，port 为 0 时由系统分配（启动后写回 self.port）
+            ready: 返回服务是否就绪的函数，为空时总是就绪
+            metrics_source / stages_source: 替代本进程指标的数据来源（多进程模式下由主进程汇总各工作进程）
+        """
+        self.host = host
+        self.port = port
+        self.ready = ready
+        self.metrics_source = metrics_source
+        self.stages_source = stages_source
+        self._runner = None
+
+    async def start(self):
+        # aiohttp.web 只在启用管理端时导入
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get("/metrics", self._metrics)
+        app.router.add_get("/healthz", self._healthz)
+        app.router.add_get("/readyz", self._readyz)
+        app.router.add_get("/stages", self._stages)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self.port = self._runner.addresses[0][1]
+        logger.info(f"管理端HTTP服务于 http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _metrics(self, request):
+        from aiohttp import web
+        text = await self.metrics_source() if self.metrics_source else metrics.render_text()
+        return web.Response(body=text.encode("utf-8"),
+                            headers={"Content-Type": METRICS_CONTENT_TYPE})
+
+    async def _healthz(self, request):
+        from aiohttp import web
+        return web.Response(text="ok")
+
+    async def _readyz(self, request):
+        from aiohttp import web
+        if self.ready is None or self.ready():
+            return web.Response(text="ready")
+        return web.Response(status=503, text="starting")
+
+    async def _stages(self, request):
+        from aiohttp import web
+        stages = await self.stages_source() if self.stages_source else tracing.stage_summary()
+        return web.Response(text=json.dumps(stages, ensure_ascii=False),
+                            content_type="application/json")
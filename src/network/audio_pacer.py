@@ -0,0 +1,124 @@
+"""
+下行音频节奏控制 - 按实时速率的倍数发送PCM，并根据设备上报的缓冲水位做流控
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Optional
+
+logger = logging.getLogger("AudioPacer")
+
+
+@dataclass
+class PlaybackConfig:
+    """节奏发送参数"""
+    realtime_factor: float = 1.2          # 发送速率为实时播放速率的倍数
+    prebuffer_ms: float = 300.0           # 开头不限速发送的时长，先填满设备的抖动缓冲
+    chunk_ms: float = 100.0               # 每帧音频时长
+    max_buffer_ms: Optional[float] = 2000.0  # 设备未上报容量时假定的缓冲上限，None 表示不做流控
+    high_watermark: float = 0.8           # 设备缓冲超过容量的该比例时暂停发送
+
+
+class AudioPacer:
+    """
+    单个会话的发送节奏：第 X 字节的最早发送时间为
+    起点 + max(0, X对应时长 - 预缓冲) / realtime_factor。
+    同时估算设备缓冲水位（最近一次上报 + 之后发送的 - 之后播放的），超过高水位时暂停，
+    直到设备再次上报或按估算已播放到高水位以下，暂停后以当前时刻为新的起点继续。
+    """
+
+    def __init__(self, sample_rate: int, sample_width: int, channels: int = 1,
+                 config: Optional[PlaybackConfig] = None):
+        self.config = config or PlaybackConfig()
+        self.bytes_per_second = sample_rate * sample_width * channels
+        frame_bytes = sample_width * channels
+        chunk_bytes = int(self.bytes_per_second * self.config.chunk_ms / 1000.0)
+        self.chunk_bytes = max(frame_bytes, chunk_bytes - chunk_bytes % frame_bytes)
+        self._updated = asyncio.Event()
+        self._report = None  # (设备缓冲ms, 上报时刻, 上报时已发送字节)
+        self._capacity_ms: Optional[float] = None  # 设备上报的缓冲容量，跨音频流保留
+        self.sent = 0
+        self._origin = 0.0
+        self._base = 0
+        self._prebuffer = 0.0
+        self._stream_start = 0.0
+
+    def start(self):
+        """开始一段新的音频流"""
+        self._origin = self._stream_start = asyncio.get_running_loop().time()
+        self._base = 0
+        self._prebuffer = self.config.prebuffer_ms / 1000.0
+        self.sent = 0
+        self._report = None
+
+    def update(self, buffered_ms: float, capacity_ms: Optional[float] = None):
+        """设备上报当前缓冲水位"""
+        now = asyncio.get_running_loop().time()
+        self._report = (float(buffered_ms), now, self.sent)
+        self.set_capacity(capacity_ms)
+        self._updated.set()
+
+    def set_capacity(self, capacity_ms: Optional[float]):
+        """设置设备的缓冲容量（注册时声明）"""
+        if capacity_ms:
+            self._capacity_ms = float(capacity_ms)
+
+    def estimated_buffer_ms(self) -> Optional[float]:
+        """按最近一次上报推算的设备缓冲时长，没有上报时返回 None"""
+        if self._report is None:
+            return None
+        buffered_ms, at, sent_at = self._report
+        now = asyncio.get_running_loop().time()
+        sent_ms = (self.sent - sent_at) * 1000.0 / self.bytes_per_second
+        return max(0.0, buffered_ms + sent_ms - (now - at) * 1000.0)
+
+    async def wait(self, nbytes: int):
+        """发送 nbytes 之前调用，必要时等待"""
+        loop = asyncio.get_running_loop()
+        await self._flow_control(nbytes)
+
+        # 实时倍速节奏
+        offset = (self.sent - self._base) / self.bytes_per_second
+        deadline = self._origin + max(0.0, offset - self._prebuffer) / self.config.realtime_factor
+        delay = deadline - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def sent_bytes(self, nbytes: int):
+        self.sent += nbytes
+
+    async def _flow_control(self, nbytes: int):
+        chunk_ms = nbytes * 1000.0 / self.bytes_per_second
+        paused = False
+        while True:
+            high = self._high_watermark_ms()
+            if high is None:
+                break
+            buffered = self.estimated_buffer_ms()
+            if buffered is None:
+                # 设备没有上报过，假定收到即开始播放，按总发送量和流逝时间估算
+                loop = asyncio.get_running_loop()
+                sent_ms = self.sent * 1000.0 / self.bytes_per_second
+                buffered = max(0.0, sent_ms - (loop.time() - self._stream_start) * 1000.0)
+            excess = buffered + chunk_ms - high
+            if excess <= 0 or buffered <= 0:
+                break
+            paused = True
+            self._updated.clear()
+            try:
+                # 等设备新的上报，最多等到按估算播放到高水位以下
+                await asyncio.wait_for(self._updated.wait(), excess / 1000.0)
+            except asyncio.TimeoutError:
+                pass
+        if paused:
+            # 从当前时刻重新计节奏，避免暂停结束后突发补发
+            self._origin = asyncio.get_running_loop().time()
+            self._base = self.sent
+            self._prebuffer = 0.0
+
+    def _high_watermark_ms(self) -> Optional[float]:
+        capacity = self._capacity_ms or self.config.max_buffer_ms
+        if capacity is None:
+            return None
+        return capacity * self.config.high_watermark
@@ -1,10 +1,14 @@
 import asyncio
 import json
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, AsyncIterator, Optional
 from websockets.protocol import State
 from websockets.server import WebSocketServerProtocol
 import logging
 from ..utils.mcp_protocol import create_mcp_event
+from ..utils import tracing
+from .audio_pacer import AudioPacer, PlaybackConfig
+from ..processors.audio_codec import CODEC_PCM, OpusConfig, PCMEncoder, PCMDecoder, create_codec, describe
 
 
 logger = logging.getLogger(__name__)
@@ -12,20 +16,44 @@ logger = logging.getLogger(__name__)
 class ClientSession:
     """封装单个客户端连接的所有状态信息"""
 
-    def __init__(self, websocket: WebSocketServerProtocol):
+    def __init__(self, websocket: WebSocketServerProtocol, audio_chunk_size: int = 64 * 1024,
+                 audio_pacing_ms: float = 0.0):
+        """
+        Args:
+            websocket: 客户端连接
+            audio_chunk_size: 下行音频每个二进制帧的最大字节数
+            audio_pacing_ms: 下行音频帧之间的间隔（毫秒），0 表示不限速
+        """
         self.websocket = websocket
         self.remote_address = websocket.remote_address
         self.mac_addr: str | None = None
         self.tools: List[Dict[str, Any]] = []
+        self.profile: Optional[str] = None  # 设备档案，决定LLM生成参数
         self.audio_buffer: bytearray = bytearray()
+        self.asr_stream = None  # 当前发言的增量识别状态（StreamingASRSession）
+        self.vad_stream = None  # 服务端VAD状态（VADStream）
+        self.turn_worker = None  # 本连接的对话处理队列（TurnWorker）
         self.session_id: str = f"session_{id(self)}"
         self._is_registered = False
+        self.audio_chunk_size = audio_chunk_size
+        self.audio_pacing = audio_pacing_ms / 1000.0
+        self.pcm_format = (16000, 2, 1)  # 下行PCM的 (采样率, 采样宽度, 声道数)
+        self.encoder = PCMEncoder()  # 下行编码器，注册时按协商结果替换
+        self.decoder = PCMDecoder()  # 上行解码器
+        self.audio_format: Dict[str, Any] = describe(self.encoder, *self.pcm_format)
+        self.pacer: Optional[AudioPacer] = None  # 为空时不按实时节奏发送
+        self._audio_seq = 0  # 下行音频流序号
 
-    def register(self, mac_addr: str, tools: List[Dict[str, Any]]):
+    def register(self, mac_addr: str, tools: List[Dict[str, Any]], profile: Optional[str] = None):
         self.mac_addr = mac_addr
         self.tools = tools
+        self.profile = profile
         self._is_registered = True
 
+    def device_info(self) -> Dict[str, Any]:
+        """传给工作流的设备信息"""
+        return {"mac_addr": self.mac_addr, "profile": self.profile}
+
     def is_registered(self) -> bool:
         return self._is_registered
 
@@ -33,6 +61,38 @@ class ClientSession:
         """获取客户端工具列表"""
         return self.tools
 
+    def configure_audio(self, chunk_size: Optional[int] = None, pacing_ms: Optional[float] = None,
+                        buffer_ms: Optional[float] = None):
+        """按设备能力调整下行音频的分块大小、发送节奏和缓冲容量，参数为空时保持不变"""
+        if chunk_size:
+            self.audio_chunk_size = max(1024, int(chunk_size))
+        if pacing_ms is not None:
+            self.audio_pacing = max(0.0, float(pacing_ms)) / 1000.0
+        if buffer_ms and self.pacer:
+            self.pacer.set_capacity(buffer_ms)
+
+    def configure_playback(self, sample_rate: int, sample_width: int, channels: int = 1,
+                           playback: Optional[PlaybackConfig] = None):
+        """设置下行PCM格式；给出 playback 时按实时倍速节奏发送"""
+        self.pcm_format = (sample_rate, sample_width, channels)
+        self.audio_format = describe(self.encoder, *self.pcm_format)
+        self.pacer = AudioPacer(sample_rate, sample_width, channels, playback) if playback else None
+
+    def set_codec(self, codec: str = CODEC_PCM, opus_config: Optional[OpusConfig] = None) -> Dict[str, Any]:
+        """按协商结果创建本会话的编解码器（上下行相同），返回实际使用的音频格式"""
+        self.encoder, self.decoder = create_codec(codec, *self.pcm_format, config=opus_config)
+        self.audio_format = describe(self.encoder, *self.pcm_format)
+        return self.audio_format
+
+    def decode_audio(self, message: bytes) -> bytes:
+        """上行二进制消息解码为PCM；PCM会话原样返回"""
+        return self.decoder.decode(message)
+
+    def update_buffer_status(self, params: Dict[str, Any]):
+        """处理设备上报的播放缓冲水位（mcp/audio/buffer_status）"""
+        if self.pacer and params.get("buffered_ms") is not None:
+            self.pacer.update(params["buffered_ms"], params.get("capacity_ms"))
+
     def append_audio(self, chunk: bytes):
         self.audio_buffer.extend(chunk)
 
@@ -40,33 +100,43 @@ class ClientSession:
         """清空音频缓冲区。"""
         self.audio_buffer.clear()
 
-    def get_full_audio_and_clear(self) -> bytes:
-        full_data = bytes(self.audio_buffer)
-        self.audio_buffer.clear()
+    def take_asr_stream(self):
+        """取出当前发言的增量识别状态，之后的音频属于新的发言"""
+        asr_stream, self.asr_stream = self.asr_stream, None
+        return asr_stream
+
+    def get_full_audio_and_clear(self) -> bytearray:
+        """取走当前缓冲区并换上新的空缓冲区，不复制音频数据。
+        返回的 bytearray 之后不再被会话修改，可以安全地创建 memoryview。"""
+        full_data, self.audio_buffer = self.audio_buffer, bytearray()
         return full_data
 
     async def send_json(self, data: Dict[str, Any]):
         """异步发送JSON文本数据到客户端"""
         if self.websocket.state == State.OPEN:
             try:
-                logger.info(f"=========发送服务端JSON: {data}")
-                await self.websocket.send(json.dumps(data, ensure_ascii=False))
+                payload = json.dumps(data, ensure_ascii=False)
+                logger.debug("发送服务端JSON: %.500s", payload)
+                await self.websocket.send(payload)
             except Exception as e:
-                logger.error(f"发送JSON到 {self.mac_addr or self.remote_address} 失败: {e}")
+                logger.error("发送JSON到 %s 失败: %s", self.mac_addr or self.remote_address, e)
         else:
-            logger.warning(f"尝试向已关闭的连接 ({self.mac_addr or self.remote_address}) 发送JSON，已忽略。")
+            logger.warning("尝试向已关闭的连接 (%s) 发送JSON，已忽略。", self.mac_addr or self.remote_address,
+                           extra={"category": "closed_send"})
             
-    async def send_binary(self, data: bytes):
-        """异步发送二进制数据到客户端"""
+    async def send_binary(self, data):
+        """异步发送二进制数据（bytes/bytearray/memoryview）到客户端"""
         if self.websocket.state == State.OPEN:
             try:
-                logger.info(f"发送二进制数据到 [{self.mac_addr}], 大小: {len(data)} 字节")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("发送二进制数据到 [%s], 大小: %d 字节", self.mac_addr, len(data),
+                                 extra={"category": "audio_chunk"})
                 await self.websocket.send(data)
-                logger.info(f"二进制数据发送成功")
             except Exception as e:
-                logger.error(f"发送二进制数据到 {self.mac_addr or self.remote_address} 失败: {e}")
+                logger.error("发送二进制数据到 %s 失败: %s", self.mac_addr or self.remote_address, e)
         else:
-            logger.warning(f"尝试向已关闭的连接 ({self.mac_addr or self.remote_address}) 发送二进制数据，已忽略。")
+            logger.warning("尝试向已关闭的连接 (%s) 发送二进制数据，已忽略。", self.mac_addr or self.remote_address,
+                           extra={"category": "closed_send"})
 
     async def send_mcp_event(self, method: str, params: Dict[str, Any] = None):
         await self.send_json(create_mcp_event(method, params))
@@ -76,28 +146,83 @@ class ClientSession:
         if not audio_data:
             return
             
-        logger.info(f"开始发送音频流程，数据大小: {len(audio_data)} 字节")
+        logger.debug("开始发送音频，数据大小: %d 字节", len(audio_data))
         
         # 1. 发送控制指令
-        logger.info("发送 start_audio 指令...")
-        await self.send_mcp_event(method="mcp/server/start_audio")
-        logger.info("start_audio 指令发送完成")
-        
-        # 2. 发送音频数据（分块发送）
-        logger.info("发送音频数据...")
-        chunk_size = 64 * 1024  # 64KB chunks
-        total_sent = 0
-        
-        for i in range(0, len(audio_data), chunk_size):
-            chunk = audio_data[i:i + chunk_size]
-            await self.send_binary(chunk)
-            total_sent += len(chunk)
-            logger.info(f"已发送 {total_sent}/{len(audio_data)} 字节")
+        await self._start_audio()
         
-        logger.info("音频数据发送完成")
-            
-        # 3. 发送结束信号
-        logger.info("发送结束信号...")
+        # 2. 按设备的分块大小和节奏发送音频数据，分块是原数据的视图，不复制
+        try:
+            with tracing.span("send", paced=self.pacer is not None):
+                await self._send_chunks(memoryview(audio_data))
+        finally:
+            # 3. 发送结束信号（本轮被取消时同样发送，让设备停止播放）
+            await self._end_audio()
+            logger.debug("音频发送完成")
+
+    async def _start_audio(self):
+        """发送 start_audio 指令，带上流序号、服务端时间戳和音频格式"""
+        self._audio_seq += 1
+        params = {
+            "seq": self._audio_seq,
+            "timestamp": int(time.time() * 1000),
+            "format": self.audio_format,
+            "paced": self.pacer is not None,
+        }
+        if self.pacer:
+            params["frame_ms"] = self.pacer.config.chunk_ms
+            self.pacer.start()
+        # 从发言结束到开始播放回复，用户实际感受到的延迟
+        tracing.mark("first_audio")
+        await self.send_mcp_event(method="mcp/server/start_audio", params=params)
+
+    async def _send_chunks(self, view: memoryview) -> int:
+        """把一段音频按 audio_chunk_size 切成视图，编码后逐帧发送，返回发送的PCM字节数"""
+        pacer = self.pacer
+        chunk_size = min(self.audio_chunk_size, pacer.chunk_bytes) if pacer else self.audio_chunk_size
+        for i in range(0, len(view), chunk_size):
+            chunk = view[i:i + chunk_size]
+            if pacer:
+                await pacer.wait(len(chunk))
+            elif i and self.audio_pacing:
+                await asyncio.sleep(self.audio_pacing)
+            for packet in self.encoder.encode(chunk):
+                await self.send_binary(packet)
+            if pacer:
+                pacer.sent_bytes(len(chunk))
+        return len(view)
+
+    async def _end_audio(self):
+        """发出编码器中剩余的音频和结束信号（空二进制帧）"""
+        for packet in self.encoder.flush():
+            await self.send_binary(packet)
         await self.send_binary(b'')
-        logger.info("结束信号发送完成")
-        logger.info("音频流程发送完成") 
\ No newline at end of file
+
+    async def send_audio_stream(self, audio_chunks: AsyncIterator[bytes]) -> int:
+        """边生成边发送音频流，首个音频块到达时才发送 start_audio 指令
+
+        Returns:
+            实际发送的音频字节数
+        """
+        total_sent = 0
+        started = False
+        send_time = 0.0  # 只统计发送本身，不含等待上游音频块的时间
+        try:
+            async for chunk in audio_chunks:
+                if not chunk:
+                    continue
+                if not started:
+                    await self._start_audio()
+                    started = True
+                elif self.audio_pacing and not self.pacer:
+                    await asyncio.sleep(self.audio_pacing)
+                start = time.perf_counter()
+                total_sent += await self._send_chunks(memoryview(chunk))
+                send_time += time.perf_counter() - start
+        finally:
+            if started:
+                tracing.record("send", send_time, paced=self.pacer is not None, bytes=total_sent)
+                # 发送结束信号
+                await self._end_audio()
+                logger.debug("流式音频发送完成，共 %d 字节", total_sent)
+        return total_sent
@@ -1,32 +1,127 @@
 import json
 import logging
 import asyncio
+from contextlib import aclosing
+from typing import Optional, Sequence, Union
 from .client_session import ClientSession
+from .audio_pacer import PlaybackConfig
+from .turn_worker import TurnWorker, Turn, OVERFLOW_DROP_OLDEST, CANCEL_BARGE_IN, CANCEL_CLIENT
 from ..database.operations import DatabaseManager
-from ..processors.audio_processor import AudioProcessor
-from ..processors.asr_processor import SpeechRecognizer
+from ..database.memory_store import MemoryStore
+from ..database.device_registry import DeviceRegistry
+from ..processors.audio_processor import AudioProcessor, AudioArchiver
+from ..processors.asr_processor import AsyncSpeechRecognizer
+from ..processors.asr_batcher import ASRBatcher
+from ..processors.streaming_asr import StreamingRecognizer
+from ..processors.vad import VoiceActivityDetector, VAD_ENDPOINT
 from ..processors.tts_processor import TTSProcessor
-from ..workflow.graph import run_workflow
+from ..processors.speech_pipeline import SpeechPipeline
+from ..processors.audio_codec import CODEC_PCM, OpusConfig, supported_codecs, negotiate_codec
+from ..workflow.graph import run_workflow, run_workflow_stream, end_session
+from ..utils.http_clients import http_clients
+from ..utils import tracing
+from ..utils.metrics import metrics
+from ..utils.log_config import bind_context, update_context
+from ..utils.backend_scheduler import backend_scheduler, BackendBusyError
+from ..llm.prompts import PROCESSING_ERROR_REPLY, LLM_UNAVAILABLE_REPLY, BUSY_REPLY
 
 logger = logging.getLogger("MessageHandler")
+
+sessions_active = metrics.gauge("ws_sessions_active", "当前会话数")
+audio_buffered_bytes = metrics.gauge("session_audio_buffered_bytes", "各会话尚未处理的上行音频字节数合计")
+turns_in_flight = metrics.gauge("turns_in_flight", "正在处理的对话轮次数")
+turns_queued = metrics.gauge("turns_queued", "排队等待处理的对话轮次数")
+
+
 class MessageHandler:
-    def __init__(self, db_manager: DatabaseManager, audio_processor: AudioProcessor, speech_recognizer: SpeechRecognizer):
+    def __init__(self, db_manager: DatabaseManager, audio_processor: AudioProcessor, speech_recognizer: Union[AsyncSpeechRecognizer, ASRBatcher],
+                 audio_archiver: Optional[AudioArchiver] = None, stream_reply: bool = True,
+                 streaming_recognizer: Optional[StreamingRecognizer] = None,
+                 vad: Optional[VoiceActivityDetector] = None, vad_auto_endpoint: bool = True,
+                 tts_processor: Optional[TTSProcessor] = None,
+                 memory_store: Optional[MemoryStore] = None,
+                 device_registry: Optional[DeviceRegistry] = None,
+                 turn_queue_size: int = 2, turn_queue_overflow: str = OVERFLOW_DROP_OLDEST,
+                 audio_chunk_size: int = 64 * 1024, audio_pacing_ms: float = 0.0,
+                 playback: Optional[PlaybackConfig] = None,
+                 audio_codecs: Sequence[str] = (CODEC_PCM,), opus_config: Optional[OpusConfig] = None,
+                 keep_device_cache: bool = True):
         self.db_manager = db_manager
         self.audio_processor = audio_processor
         self.speech_recognizer = speech_recognizer
+        self.audio_archiver = audio_archiver
+        self.stream_reply = stream_reply  # 是否边生成边合成边发送回复
+        self.streaming_recognizer = streaming_recognizer  # 为空时在录音结束后整段识别
+        self.vad = vad  # 为空时不裁剪静音，完全依赖客户端的 end_stream
+        self.vad_auto_endpoint = vad_auto_endpoint  # VAD检测到发言结束时是否直接开始处理
         self.sessions: dict = {}
-        self.tts_processor = TTSProcessor()
+        self.tts_processor = tts_processor or TTSProcessor()
+        self.memory_store = memory_store  # 为空时不携带对话上下文
+        self.device_registry = device_registry  # 为空时每次注册直接查询数据库
+        self.turn_queue_size = turn_queue_size  # 每个会话排队等待处理的发言数上限
+        self.turn_queue_overflow = turn_queue_overflow
+        self.audio_chunk_size = audio_chunk_size  # 下行音频默认分块大小，设备注册时可覆盖
+        self.audio_pacing_ms = audio_pacing_ms
+        self.playback = playback  # 为空时回复音频尽快发送，否则按实时倍速节奏发送
+        # 服务端可用的音频编码（按偏好顺序），设备注册时协商
+        self.audio_codecs = supported_codecs(audio_codecs, self.tts_processor.sample_rate)
+        self.opus_config = opus_config
+        # 设备断开后是否保留注册表中的缓存；多进程模式下设备可能重连到其他进程，缓存会过期，应关闭
+        self.keep_device_cache = keep_device_cache
+
+        sessions_active.set_function(lambda: len(self.sessions))
+        audio_buffered_bytes.set_function(
+            lambda: sum(len(s.audio_buffer) for s in list(self.sessions.values())))
+        turns_in_flight.set_function(
+            lambda: sum(1 for s in list(self.sessions.values()) if s.turn_worker and s.turn_worker.busy))
+        turns_queued.set_function(
+            lambda: sum(s.turn_worker.pending for s in list(self.sessions.values()) if s.turn_worker))
         
         logger.info("MessageHandler初始化完成")
 
     async def on_connect(self, websocket):
-        logger.info(f"新客户端连接: {websocket.remote_address}")
-        self.sessions[websocket] = ClientSession(websocket)
+        session = ClientSession(websocket, audio_chunk_size=self.audio_chunk_size, audio_pacing_ms=self.audio_pacing_ms)
+        # 本连接之后的日志（包括处理任务中的）都带上会话字段，注册后补上 mac
+        bind_context(session=session.session_id, remote=str(session.remote_address))
+        logger.debug("新客户端连接: %s", websocket.remote_address)
+        session.configure_playback(
+            self.tts_processor.sample_rate, self.tts_processor.sample_width, self.tts_processor.channels,
+            playback=self.playback
+        )
+        # 本连接发起的后端请求按会话公平排队（处理任务和增量识别任务继承该标记）
+        backend_scheduler.set_owner(session.session_id)
+        # 每个连接一个处理任务，接收循环只负责缓冲音频和入队，不等待推理
+        session.turn_worker = TurnWorker(
+            lambda turn: self._process_turn(session, turn),
+            maxsize=self.turn_queue_size,
+            overflow=self.turn_queue_overflow,
+            name=str(session.remote_address)
+        )
+        session.turn_worker.start()
+        self.sessions[websocket] = session
 
     async def on_disconnect(self, websocket):
         session = self.sessions.pop(websocket, None)
         if session:
-            logger.info(f"客户端 {session.mac_addr or session.remote_address} 已断开")
+            await session.turn_worker.stop()
+            asr_stream = session.take_asr_stream()
+            if asr_stream:
+                asr_stream.cancel()
+            end_session(session.session_id)
+            if self.memory_store and session.mac_addr:
+                if self.device_registry and self.keep_device_cache:
+                    # 让注册表缓存的记忆与内存一致，设备重连时不会拿到旧值
+                    memory = self.memory_store.get(session.mac_addr)
+                    self.device_registry.update_cached(session.mac_addr, memory=memory.dump())
+                elif self.device_registry:
+                    self.device_registry.invalidate(session.mac_addr)
+                self.memory_store.release(session.mac_addr)
+            logger.info("客户端 %s 已断开", session.mac_addr or session.remote_address)
+
+    def is_idle(self) -> bool:
+        """没有正在处理或排队的对话轮次（进程退出前据此等待回复播完）"""
+        return not any(s.turn_worker and (s.turn_worker.busy or s.turn_worker.pending)
+                       for s in list(self.sessions.values()))
 
     async def handle_message(self, websocket, message):
         session = self.sessions.get(websocket)
@@ -42,18 +137,41 @@ class MessageHandler:
 
                 if method == "mcp/registerTools":
                     await self._handle_registration(session, data)
+                elif method == "mcp/audio/start_stream":
+                    self._handle_start_stream(session)
+                elif method == "mcp/audio/buffer_status":
+                    # 设备上报播放缓冲水位，用于下行流控
+                    session.update_buffer_status(data.get("params", {}))
+                elif method == "mcp/audio/cancel":
+                    # 客户端要求停止当前回复
+                    session.turn_worker.cancel(CANCEL_CLIENT)
                 elif method == "mcp/audio/end_stream":
                     # 客户端结束录音
                     await self._handle_end_stream(session)
                 else:
-                    logger.debug(f"收到其他消息: {method}")
+                    logger.debug("收到其他消息: %s", method)
                 
             except (json.JSONDecodeError, KeyError):
-                logger.warning(f"收到非JSON或无效MCP消息: {message}")
+                logger.warning("收到非JSON或无效MCP消息: %.200s", message)
+
+    def _handle_start_stream(self, session: ClientSession):
+        """处理音频流开始：用户插话，打断正在进行的回复并丢弃上一段未结束发言的残留"""
+        session.turn_worker.cancel(CANCEL_BARGE_IN)
+        asr_stream = session.take_asr_stream()
+        if asr_stream:
+            asr_stream.cancel()
+        session.vad_stream = None
+        session.clear_audio_buffer()
 
     async def _handle_end_stream(self, session: ClientSession):
         """处理音频流结束"""
-        logger.info(f"[{session.mac_addr}] 收到结束音频流信号，处理已录制音频。")
+        logger.debug("[%s] 收到结束音频流信号，处理已录制音频。", session.mac_addr)
+        if session.vad_stream:
+            tail = session.vad_stream.flush()
+            if tail:
+                self._append_speech(session, tail)
+            if not session.audio_buffer:
+                logger.debug("[%s] 本轮未检测到语音，已丢弃", session.mac_addr)
         await self._process_completed_audio(session)
 
     async def _handle_registration(self, session: ClientSession, rpc_request: dict):
@@ -64,63 +182,206 @@ class MessageHandler:
                 await session.websocket.close()
                 return
 
-            session.register(mac_addr, params.get("tools", []))
-            if not await self.db_manager.get_device(mac_addr):
-                await self.db_manager.register_device(mac_addr)
-            
-            await self.db_manager.update_device_login(mac_addr)
+            session.register(mac_addr, params.get("tools", []), profile=params.get("profile"))
+            update_context(mac=mac_addr)
+            # 设备可在注册时声明自己的下行音频分块大小和发送间隔
+            session.configure_audio(params.get("audio_chunk_size"), params.get("audio_pacing_ms"),
+                                    params.get("audio_buffer_ms"))
+            if self.device_registry:
+                # 已知设备不访问数据库，登录时间批量写回
+                device = await self.device_registry.register(mac_addr)
+            else:
+                device = await self.db_manager.get_device(mac_addr)
+                if not device:
+                    await self.db_manager.register_device(mac_addr)
+                await self.db_manager.update_device_login(mac_addr)
+            if self.memory_store:
+                # 记忆只在注册时从数据库加载一次，之后的轮次都走内存
+                self.memory_store.prime(mac_addr, device.get("memory") if device else None)
+            # 设备在 audio_codecs 中按偏好声明支持的编码，未声明时使用PCM
+            codec = negotiate_codec(params.get("audio_codecs"), self.audio_codecs)
+            audio_format = session.set_codec(codec, self.opus_config)
             
-            response_data = {"id": rpc_request.get("id"), "result": {"status": "success"}}
+            response_data = {"id": rpc_request.get("id"), "result": {"status": "success", "audio": audio_format}}
             await session.send_json(response_data)
-            logger.info(f"设备 {mac_addr} 注册成功")
+            logger.info("设备 %s 注册成功，音频格式: %s", mac_addr, audio_format.get("codec"))
         except Exception as e:
-            logger.error(f"注册时出错: {e}", exc_info=True)
+            logger.error("注册时出错: %s", e, exc_info=True)
 
     async def _handle_audio_data(self, session: ClientSession, message: bytes):
         """处理音频数据"""
-        session.append_audio(message)
+        message = session.decode_audio(message)
+        if not message:
+            return
+        if not self.vad:
+            self._append_speech(session, message)
+            return
 
-    async def _process_completed_audio(self, session: ClientSession):       
-        full_audio_data = session.get_full_audio_and_clear()
-        if not full_audio_data: return
+        if session.vad_stream is None:
+            session.vad_stream = self.vad.create_stream()
+        chunk = message
+        while True:
+            speech, event = session.vad_stream.process(chunk)
+            chunk = b''
+            if speech:
+                self._append_speech(session, speech)
+            if event != VAD_ENDPOINT:
+                break
+            if self.vad_auto_endpoint:
+                logger.debug("[%s] VAD检测到发言结束，开始处理", session.mac_addr)
+                await self._process_completed_audio(session)
 
-        file_path = self.audio_processor.save_as_wav(full_audio_data, session.remote_address)
-        if not file_path: return
-        
-        text = self.speech_recognizer.recognize(file_path)
-        logger.info(f"[{session.mac_addr}] ASR识别结果: {text}")
+    def _append_speech(self, session: ClientSession, audio: bytes):
+        """把（裁剪后的）语音追加到会话缓冲区，并交给增量识别"""
+        session.append_audio(audio)
+        if self.streaming_recognizer:
+            if session.asr_stream is None:
+                session.asr_stream = self.streaming_recognizer.create_session(session.session_id)
+            session.asr_stream.feed(session.audio_buffer)
+
+    async def _process_completed_audio(self, session: ClientSession):
+        """一段发言结束：取出音频和增量识别状态交给会话的处理队列，立即返回"""
+        turn = Turn(session.get_full_audio_and_clear(), session.take_asr_stream())
+        if not turn.audio:
+            turn.discard()
+            return
+        # 从发言结束开始追踪本轮各阶段的耗时
+        turn.trace = tracing.start_trace(session.mac_addr or session.session_id)
+        await session.turn_worker.submit(turn)
+
+    async def _process_turn(self, session: ClientSession, turn: Turn):
+        # 统计本轮对话的HTTP连接复用情况
+        token = http_clients.begin_turn()
+        trace_token = tracing.activate(turn.trace)
+        tracing.mark("queue_wait")
+        status = tracing.STATUS_ERROR
+        try:
+            await self._run_turn(session, turn)
+            status = tracing.STATUS_OK
+        except BackendBusyError as e:
+            status = tracing.STATUS_BUSY
+            logger.warning("[%s] %s，本轮不再处理", session.mac_addr, e)
+            await self._play_busy_prompt(session)
+        except asyncio.CancelledError:
+            status = tracing.STATUS_CANCELLED
+            raise
+        finally:
+            stats = http_clients.end_turn(token)
+            if stats.requests:
+                logger.debug("[%s] 本轮HTTP请求 %d 次，复用连接 %d 次", session.mac_addr, stats.requests, stats.reused)
+            if turn.trace:
+                turn.trace.finish(status)
+            tracing.deactivate(trace_token)
+
+    async def _run_turn(self, session: ClientSession, turn: Turn):
+        asr_stream = turn.asr_stream
+        full_audio_data = turn.audio
+
+        # 可选的异步归档，不阻塞本轮处理
+        if self.audio_archiver:
+            self.audio_archiver.submit(full_audio_data, session.remote_address)
+
+        with tracing.span("asr", streaming=asr_stream is not None):
+            if asr_stream:
+                # 大部分音频已在录音过程中识别，这里只剩尾巴
+                text = await asr_stream.finalize(full_audio_data)
+            else:
+                # 在内存中构建WAV并直接上传，不经过磁盘
+                with tracing.span("wav_build"):
+                    wav_data = self.audio_processor.build_wav(full_audio_data)
+                text = await self.speech_recognizer.recognize_audio(wav_data, key=f"{session.session_id}.wav")
+        logger.info("[%s] ASR识别结果: %s", session.mac_addr, text)
+        if not text.strip():
+            return
         
         # 统一入口，调用新的总控制器
         await self._agent_controller(text, session)
 
     async def _agent_controller(self, text: str, session: ClientSession):
         """简化的LLM控制器"""
+        if self.stream_reply:
+            await self._stream_agent_controller(text, session)
+            return
         try:
             # 使用新的工作流
             result = await run_workflow(
                 user_text=text,
                 session_id=session.session_id,
-                device_info={"mac_addr": session.mac_addr}
+                device_info=session.device_info(),
+                **self._memory_context(session)
             )
             
             if result.bot_text:
-                logger.info(f"LLM回复: {result.bot_text[:100]}...")
+                logger.info("[%s] LLM回复: %.100s", session.mac_addr, result.bot_text)
+                self._remember_turn(session, text, result.bot_text)
                 
                 # 使用TTS生成音频
                 audio_data = await self.tts_processor.text_to_speech(result.bot_text)
                 if audio_data:
-                    logger.info(f"准备发送音频数据到客户端 [{session.mac_addr}], 大小: {len(audio_data)} 字节")
                     await session.send_audio(audio_data)
-                    logger.info(f"音频数据发送完成")
                 else:
-                    logger.warning(f"TTS返回空音频数据，文本: {result.bot_text}")
+                    logger.warning("TTS返回空音频数据，文本: %s", result.bot_text)
                     
+        except BackendBusyError:
+            raise
         except Exception as e:
-            logger.error(f"LLM处理失败: {e}", exc_info=True)
-            error_text = "抱歉，处理您的请求时出现了问题。"
-            audio_data = await self.tts_processor.text_to_speech(error_text)
+            logger.error("LLM处理失败: %s", e, exc_info=True)
+            audio_data = await self.tts_processor.text_to_speech(PROCESSING_ERROR_REPLY)
             if audio_data:
                 await session.send_audio(audio_data)
+
+    async def _stream_agent_controller(self, text: str, session: ClientSession):
+        """流式控制器：LLM逐token输出，按句切分后逐句合成，音频块到达即发送"""
+        pipeline = SpeechPipeline(self.tts_processor)
+        try:
+            text_stream = run_workflow_stream(
+                user_text=text,
+                session_id=session.session_id,
+                device_info=session.device_info(),
+                **self._memory_context(session)
+            )
+            # 发送中途被打断时按顺序关闭音频流水线和工作流生成器
+            async with aclosing(pipeline.stream(text_stream)) as audio_chunks:
+                sent = await session.send_audio_stream(audio_chunks)
+            logger.info("[%s] LLM回复: %.100s", session.mac_addr, pipeline.reply_text)
+            self._remember_turn(session, text, pipeline.reply_text)
+            if not sent:
+                logger.warning("流式TTS未产生音频，文本: %s", pipeline.reply_text)
+        except Exception as e:
+            if isinstance(e, BackendBusyError) and not pipeline.chunks_emitted:
+                # 还没开始播放，交给上层播放繁忙提示
+                raise
+            logger.error("流式LLM处理失败: %s", e, exc_info=True)
+            if pipeline.chunks_emitted:
+                # 已经开始播放，不再插入错误提示
+                return
+            audio_data = await self.tts_processor.text_to_speech(PROCESSING_ERROR_REPLY)
+            if audio_data:
+                await session.send_audio(audio_data)
+
+    def _memory_context(self, session: ClientSession) -> dict:
+        """当前设备的近期历史和摘要，作为工作流参数"""
+        if not self.memory_store or not session.mac_addr:
+            return {}
+        memory = self.memory_store.get(session.mac_addr)
+        return {"history": memory.messages(), "memory_summary": memory.summary or None}
+
+    def _remember_turn(self, session: ClientSession, user_text: str, bot_text: str):
+        """记录一轮对话；兜底回复不计入记忆"""
+        if not self.memory_store or not session.mac_addr:
+            return
+        if not bot_text.strip() or bot_text == LLM_UNAVAILABLE_REPLY:
+            return
+        self.memory_store.record_turn(session.mac_addr, user_text, bot_text)
+
+    async def _play_busy_prompt(self, session: ClientSession):
+        """后端过载时播放繁忙提示；只用缓存中的音频，不再给TTS增加负担"""
+        audio_data = await self.tts_processor.get_cached(BUSY_REPLY)
+        if audio_data:
+            await session.send_audio(audio_data)
+        else:
+            logger.warning("繁忙提示未缓存，跳过播放")
+
     async def on_timeout(self, websocket):
-        logger.warning(f"客户端 {websocket.remote_address} 连接超时，准备关闭。")
+        logger.warning("客户端 %s 连接超时，准备关闭。", websocket.remote_address)
         await websocket.close(code=1000, reason="Timeout")
@@ -0,0 +1,150 @@
+"""
+会话级对话轮次队列 - 接收与处理解耦，每个连接一个有界队列和一个处理任务
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+
+from ..utils.metrics import metrics
+from ..utils.tracing import STATUS_CANCELLED, STATUS_DROPPED, STATUS_ERROR
+
+logger = logging.getLogger("TurnWorker")
+
+# 队列满时的处理策略
+OVERFLOW_DROP_OLDEST = "drop_oldest"  # 丢弃最早排队的轮次，保留用户最新的发言
+OVERFLOW_DROP_NEWEST = "drop_newest"  # 丢弃新到的轮次
+OVERFLOW_BLOCK = "block"              # 等待队列有空位，会反压到该连接的接收
+
+turns_dropped = metrics.counter("turn_queue_dropped_total", "队列满被丢弃的对话轮次", ["policy"])
+turn_queue_wait = metrics.histogram("turn_queue_wait_seconds", "对话轮次在队列中的等待时间")
+turns_cancelled = metrics.counter("turns_cancelled_total", "被取消的对话轮次（处理中或排队中）", ["reason", "stage"])
+
+# 取消原因
+CANCEL_BARGE_IN = "barge_in"        # 用户开始了新的发言
+CANCEL_CLIENT = "client_cancel"     # 客户端显式取消
+CANCEL_DISCONNECT = "disconnect"    # 连接断开
+
+
+@dataclass
+class Turn:
+    """一轮待处理的发言：入队时的音频快照和对应的增量识别状态"""
+    audio: bytearray  # 从会话中换出的缓冲区，之后不再修改
+    asr_stream: Any = None
+    enqueued_at: float = field(default_factory=time.monotonic)
+    trace: Any = None  # 本轮的 TurnTrace
+
+    def discard(self, status: str = STATUS_DROPPED):
+        """丢弃本轮，释放仍在进行的增量识别"""
+        if self.asr_stream:
+            self.asr_stream.cancel()
+            self.asr_stream = None
+        if self.trace:
+            self.trace.finish(status)
+
+
+class TurnWorker:
+    """单个会话的轮次队列，按顺序逐个交给处理函数，处理期间接收照常进行"""
+
+    def __init__(self, process: Callable[[Turn], Awaitable[None]], maxsize: int = 2,
+                 overflow: str = OVERFLOW_DROP_OLDEST, name: str = ""):
+        """
+        Args:
+            process: 处理单个轮次的协程函数
+            maxsize: 排队轮次上限（不含正在处理的轮次）
+            overflow: 队列满时的策略，见 OVERFLOW_* 常量
+            name: 日志中显示的会话名
+        """
+        if overflow not in (OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST, OVERFLOW_BLOCK):
+            raise ValueError(f"未知的队列溢出策略: {overflow}")
+        self.process = process
+        self.overflow = overflow
+        self.name = name
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._task: Optional[asyncio.Task] = None
+        self._current: Optional[asyncio.Task] = None  # 正在处理的轮次
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def busy(self) -> bool:
+        return self._current is not None and not self._current.done()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def submit(self, turn: Turn) -> bool:
+        """提交一轮发言，返回是否入队"""
+        if self.overflow == OVERFLOW_BLOCK:
+            await self._queue.put(turn)
+            return True
+
+        if self._queue.full():
+            turns_dropped.inc(policy=self.overflow)
+            if self.overflow == OVERFLOW_DROP_NEWEST:
+                logger.warning("[%s] 对话队列已满，丢弃新的发言", self.name)
+                turn.discard()
+                return False
+            self._queue.get_nowait().discard()
+            logger.warning("[%s] 对话队列已满，丢弃最早排队的发言", self.name)
+        self._queue.put_nowait(turn)
+        return True
+
+    def cancel(self, reason: str) -> int:
+        """
+        取消正在处理的轮次并丢弃排队中的轮次，处理任务继续等待新的发言。
+        取消会沿调用链传播：关闭发往 Ollama/TTS 的流式请求并中断音频发送。
+
+        Returns:
+            被取消的轮次数
+        """
+        cancelled = 0
+        while not self._queue.empty():
+            self._queue.get_nowait().discard(STATUS_CANCELLED)
+            turns_cancelled.inc(reason=reason, stage="queued")
+            cancelled += 1
+        if self.busy:
+            self._current.cancel()
+            turns_cancelled.inc(reason=reason, stage="in_flight")
+            cancelled += 1
+        if cancelled:
+            logger.info("[%s] 已取消 %d 个对话轮次，原因: %s", self.name, cancelled, reason)
+        return cancelled
+
+    async def stop(self, reason: str = CANCEL_DISCONNECT):
+        """取消所有轮次并停止处理任务"""
+        self.cancel(reason)
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            turn = await self._queue.get()
+            turn_queue_wait.observe(time.monotonic() - turn.enqueued_at)
+            # 每轮在独立的任务中处理，可以单独取消而不影响队列
+            task = self._current = asyncio.create_task(self.process(turn))
+            try:
+                await asyncio.wait({task})
+            except asyncio.CancelledError:
+                task.cancel()
+                await asyncio.wait({task})
+                turn.discard(STATUS_CANCELLED)
+                raise
+            finally:
+                self._current = None
+            if task.cancelled():
+                turn.discard(STATUS_CANCELLED)
+            elif task.exception():
+                e = task.exception()
+                logger.error(f"[{self.name}] 处理对话轮次失败: {e}", exc_info=e)
+                turn.discard(STATUS_ERROR)
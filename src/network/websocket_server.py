@@ -3,12 +3,17 @@ import websockets
 import logging
 import os
 
+from ..utils.metrics import metrics
+
 logger = logging.getLogger("WebSocketServer")
 
+ws_connections = metrics.gauge("ws_connections", "当前WebSocket连接数（含就绪前等待的连接）")
+
 class WebSocketServer:
     """WebSocket服务器类，处理客户端连接和通信"""
     
-    def __init__(self, host, port, ws_path, on_connect=None, on_message=None, on_disconnect=None, on_timeout=None, timeout=6000):
+    def __init__(self, host, port, ws_path, on_connect=None, on_message=None, on_disconnect=None, on_timeout=None, timeout=6000,
+                 reuse_port=False):
         """
         初始化WebSocket服务器
         
@@ -25,6 +30,7 @@ class WebSocketServer:
             on_timeout: 客户端闲置超时回调函数
                         函数签名: async def handler(websocket)
             timeout: 闲置超时秒数
+            reuse_port: 以 SO_REUSEPORT 监听，多个进程可同时监听同一端口，由内核分配连接
         """
         self.host = host
         self.port = port
@@ -34,7 +40,27 @@ class WebSocketServer:
         self.on_disconnect = on_disconnect
         self.on_timeout = on_timeout
         self.timeout = timeout
+        self.reuse_port = reuse_port
         self.connected_clients = set()
+        self._server = None
+        self._stopped = asyncio.Event()  # drain() 完成后 start() 返回
+        # 就绪前接受的连接先等待（消息由连接缓冲），attach() 设置回调后放行
+        self.ready = asyncio.Event()
+        if on_message:
+            self.ready.set()
+        ws_connections.set_function(self.get_client_count)
+
+    def attach(self, on_connect=None, on_message=None, on_disconnect=None, on_timeout=None):
+        """服务已在监听后再设置回调，并标记就绪"""
+        self.on_connect = on_connect
+        self.on_message = on_message
+        self.on_disconnect = on_disconnect
+        self.on_timeout = on_timeout
+        self.ready.set()
+        logger.info("WebSocket服务器已就绪")
+
+    def is_ready(self) -> bool:
+        return self.ready.is_set()
         
     async def handler(self, websocket):
         """
@@ -45,8 +71,10 @@ class WebSocketServer:
         """
         # 处理新连接
         remote_address = websocket.remote_address
-        logger.info(f"客户端 {remote_address} 已连接. 当前连接数: {len(self.connected_clients) + 1}")
+        logger.info("客户端 %s 已连接. 当前连接数: %d", remote_address, len(self.connected_clients) + 1)
         self.connected_clients.add(websocket)
+        if not self.ready.is_set():
+            await self.ready.wait()
         if self.on_connect:
             await self.on_connect(websocket)
 
@@ -59,7 +87,7 @@ class WebSocketServer:
                     else:
                         logger.warning("未设置消息处理函数 (on_message)，消息将被忽略")
                 except asyncio.TimeoutError:
-                    logger.info(f"客户端 {websocket.remote_address} 闲置超时")
+                    logger.info("客户端 %s 闲置超时", websocket.remote_address)
                     if self.on_timeout:
                         await self.on_timeout(websocket)
                     # on_timeout 处理器负责关闭连接，这里直接退出循环
@@ -67,25 +95,62 @@ class WebSocketServer:
         except websockets.exceptions.ConnectionClosed as e:
             # 区分是正常关闭还是异常关闭
             if e.code == 1000 or e.code == 1001:
-                logger.warning(f"客户端 {remote_address} 主动断开连接: {e}")
+                logger.warning("客户端 %s 主动断开连接: %s", remote_address, e)
             else:
-                logger.error(f"与客户端 {remote_address} 的连接异常关闭: {e}")
+                logger.error("与客户端 %s 的连接异常关闭: %s", remote_address, e)
         except Exception as e:
-            logger.error(f"处理客户端 {remote_address} 时发生错误: {e}", exc_info=True)
+            logger.error("处理客户端 %s 时发生错误: %s", remote_address, e, exc_info=True)
         finally:
             # 处理断开连接
             self.connected_clients.remove(websocket)
             if self.on_disconnect:
                 await self.on_disconnect(websocket)
-            logger.info(f"客户端 {remote_address} 已断开连接, 当前客户端数量: {len(self.connected_clients)}")
+            logger.info("客户端 %s 已断开连接, 当前客户端数量: %d", remote_address, len(self.connected_clients))
     
     def get_client_count(self):
         """获取当前连接的客户端数量"""
         return len(self.connected_clients)
             
-    async def start(self):
-        """启动WebSocket服务器"""
+    async def listen(self):
+        """开始监听端口，立即返回"""
         logger.info(f"启动WebSocket服务器于 ws://{self.host}:{self.port}{self.ws_path}")
         # 通过设置 ping_interval=None 禁用自动心跳检测，防止客户端因不支持ping/pong而超时断开
-        async with websockets.serve(self.handler, self.host, self.port, ping_interval=None):
-            await asyncio.Future()  # run forever 
\ No newline at end of file
+        kwargs = {"reuse_port": True} if self.reuse_port else {}
+        self._server = await websockets.serve(self.handler, self.host, self.port, ping_interval=None, **kwargs)
+
+    async def start(self):
+        """启动WebSocket服务器（已调用 listen 时直接进入服务），一直运行直到被取消或 drain() 完成"""
+        if self._server is None:
+            await self.listen()
+        try:
+            await self._stopped.wait()
+        finally:
+            await self.close()
+
+    async def drain(self, timeout: float, idle=None):
+        """
+        优雅退出：停止接受新连接，等待进行中的处理结束后通知剩余客户端重连，然后让 start() 返回
+
+        Args:
+            timeout: 最长等待秒数，超时后直接关闭剩余连接
+            idle: 返回是否没有进行中处理的函数，为空时等待所有连接自行断开
+        """
+        if self._server is not None:
+            loop = asyncio.get_running_loop()
+            logger.info("停止接受新连接，当前连接数: %d", len(self.connected_clients))
+            self._server.close(close_connections=False)
+            deadline = loop.time() + timeout
+            while self.connected_clients and not (idle and idle()) and loop.time() < deadline:
+                await asyncio.sleep(0.2)
+            if self.connected_clients:
+                logger.info("关闭剩余的 %d 个连接，客户端将重连", len(self.connected_clients))
+                await asyncio.gather(*(ws.close(1001, "server restarting") for ws in list(self.connected_clients)),
+                                     return_exceptions=True)
+        self._stopped.set()
+
+    async def close(self):
+        """停止监听并关闭所有连接"""
+        if self._server is not None:
+            server, self._server = self._server, None
+            server.close()
+            await server.wait_closed() 
\ No newline at end of file
@@ -0,0 +1,128 @@
+"""
+ASR微批处理 - 把不同会话在短时间窗口内结束的识别请求合并成一次多文件请求
+"""
+
+import asyncio
+import contextvars
+import itertools
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .asr_processor import AsyncSpeechRecognizer
+from ..utils.metrics import metrics
+from ..utils import tracing
+
+logger = logging.getLogger("ASRBatcher")
+
+asr_batch_size = metrics.histogram(
+    "asr_batch_size", "每次ASR请求包含的音频段数", buckets=(1, 2, 4, 8, 16, 32))
+
+
+class ASRBatcher:
+    """
+    对外提供与 AsyncSpeechRecognizer 相同的 recognize_audio / recognize_audio_multiple 接口。
+    第一段音频到达后等待 window_ms，期间到达的其他音频（不论来自哪个会话）合并成一次请求，
+    满 max_batch 段时立即发送；结果按key分发回各自的调用方。
+    """
+
+    def __init__(self, speech_recognizer: AsyncSpeechRecognizer, window_ms: float = 30.0, max_batch: int = 8):
+        """
+        Args:
+            speech_recognizer: 实际发送请求的异步识别器
+            window_ms: 合并等待窗口（毫秒）
+            max_batch: 单次请求最多包含的音频段数
+        """
+        self.speech_recognizer = speech_recognizer
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._seq = itertools.count()
+        # language -> [(内部key, wav数据, future, 调用方的trace, 调用方的上下文)]
+        self._pending: Dict[str, List[Tuple[str, bytes, asyncio.Future, Any, contextvars.Context]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._inflight: Set[asyncio.Task] = set()
+
+    async def recognize_audio(self, wav_data: bytes, key: str = "audio.wav", language: str = "auto") -> str:
+        """识别一段WAV，未识别出文本或请求失败时返回空字符串"""
+        text, response_data = await self._submit(wav_data, key, language)
+        if text is None:
+            # 合并响应里是其他会话的识别结果，只记录失败时的错误描述
+            if isinstance(response_data, dict):
+                logger.warning("ASR响应中没有 %s 的识别结果", key)
+            else:
+                logger.warning("ASR识别失败: %.200s", response_data)
+        return text or ""
+
+    async def recognize_audio_multiple(self, items: List[Tuple[str, bytes]], language: str = "auto") -> List[Dict[str, str]]:
+        """识别多段WAV，只返回识别成功的结果"""
+        replies = await asyncio.gather(*(self._submit(wav_data, key, language) for key, wav_data in items))
+        return [{'key': key, 'text': text} for (key, _), (text, _) in zip(items, replies) if text is not None]
+
+    async def _submit(self, wav_data: bytes, key: str, language: str) -> Tuple[Optional[str], Any]:
+        # 内部key加序号，保证同一批次内唯一；逗号是 keys 字段的分隔符
+        batch_key = f"{next(self._seq)}_{key.replace(',', '_')}"
+        future = asyncio.get_running_loop().create_future()
+        batch = self._pending.setdefault(language, [])
+        batch.append((batch_key, wav_data, future, tracing.current(), contextvars.copy_context()))
+        if len(batch) >= self.max_batch:
+            self._flush(language)
+        elif len(batch) == 1:
+            self._timers[language] = asyncio.get_running_loop().call_later(self.window, self._flush, language)
+        return await future
+
+    async def close(self):
+        """取消等待合并的窗口和进行中的请求，仍在等待的调用方收到 CancelledError"""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        for batch in self._pending.values():
+            for _, _, future, *_ in batch:
+                future.cancel()
+        self._pending.clear()
+        tasks = list(self._inflight)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _flush(self, language: str):
+        timer = self._timers.pop(language, None)
+        if timer:
+            timer.cancel()
+        # 调用方已取消的不再发送
+        batch = [entry for entry in self._pending.pop(language, []) if not entry[2].done()]
+        if not batch:
+            return
+        # 合并请求沿用第一个调用方的上下文，在 backend_scheduler 中按该设备排队（保持按设备公平）；
+        # 只清掉trace，耗时按批次分别记到各调用方的trace
+        context = batch[0][4].copy()
+        context.run(tracing.activate, None)
+        task = asyncio.create_task(self._send(language, batch), context=context)
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _send(self, language: str, batch: List[Tuple[str, bytes, asyncio.Future, Any, contextvars.Context]]):
+        asr_batch_size.observe(len(batch))
+        if len(batch) > 1:
+            logger.debug("合并 %d 段音频为一次ASR请求", len(batch))
+        start = time.perf_counter()
+        try:
+            texts, response_data = await self.speech_recognizer.recognize_audio_batch(
+                [(key, wav_data) for key, wav_data, *_ in batch], language)
+        except asyncio.CancelledError:
+            # 请求被取消（如退出时），批次内的调用方不能一直等下去
+            for _, _, future, *_ in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, _, future, *_ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            elapsed = time.perf_counter() - start
+            for _, _, _, trace, _ in batch:
+                if trace:
+                    trace.record("asr.request", elapsed, batch=len(batch))
+        for key, _, future, *_ in batch:
+            if not future.done():
+                future.set_result((texts.get(key), response_data))
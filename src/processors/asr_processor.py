@@ -1,8 +1,13 @@
-import requests
+import asyncio
 import os
 import time
 import logging
-from typing import Union, List, Dict, Any
+from typing import Union, List, Dict, Any, Tuple
+from ..utils.http_clients import http_clients
+from ..utils.backend_scheduler import backend_scheduler, BackendBusyError, backend_errors
+from ..utils import tracing
+
+logger = logging.getLogger("SpeechRecognizer")
 
 # 添加性能日志记录器
 # perf_logger = logging.getLogger("PerformanceLog")
@@ -48,11 +53,8 @@ class SpeechRecognizer:
         # end_time = time.time()
         # request_duration = end_time - start_time
         
-        # 处理返回结果，提取文本
-        result_text = ""
-        if isinstance(response_data, dict) and 'result' in response_data:
-            if response_data['result'] and len(response_data['result']) > 0:
-                result_text = response_data['result'][0]['text']
+        # 处理返回结果，提取文本（未识别出文本或请求失败时为空字符串）
+        result_text = _recognized_text(response_data)
         
         # # 记录识别结果信息
         # perf_logger.info(f"[性能] [ASR详情] 请求完成 | 耗时: {request_duration:.2f}秒 | 识别文本长度: {len(result_text)}")
@@ -61,7 +63,7 @@ class SpeechRecognizer:
         # if request_duration > 2.0:
         #     perf_logger.warning(f"[性能] [ASR警告] ASR处理耗时较长 | 耗时: {request_duration:.2f}秒")
         
-        return result_text if result_text else str(response_data)
+        return result_text
     
     def recognize_multiple(self, audio_path: Union[str, List[str]], language: str = "auto") -> List[Dict[str, str]]:
         """
@@ -75,13 +77,7 @@ class SpeechRecognizer:
         识别结果列表，包含文件名和识别文本
         """
         response_data = self._send_request(audio_path, language)
-        
-        # 处理返回结果
-        if isinstance(response_data, dict) and 'result' in response_data:
-            return response_data['result']
-        
-        # 如果无法提取结果，则返回空列表
-        return []
+        return _extract_results(response_data)
     
     def _send_request(self, audio_path: Union[str, List[str]], language: str) -> Any:
         """
@@ -137,6 +133,9 @@ class SpeechRecognizer:
         # perf_logger.info(f"[性能] [ASR详情] 文件准备完成 | 文件数: {len(files)} | 耗时: {prep_duration:.2f}秒")
         
         try:
+            # 同步接口只在脚本中使用，服务端不为它导入 requests
+            import requests
+
             # 发送请求
             response = requests.post(self.server_url, files=files, data=data)
             
@@ -163,6 +162,204 @@ class SpeechRecognizer:
                 file_obj.close()
 
 
+def _extract_text(response_data: Any) -> str:
+    """从ASR响应中提取第一条识别文本"""
+    if isinstance(response_data, dict) and 'result' in response_data:
+        if response_data['result'] and len(response_data['result']) > 0:
+            return response_data['result'][0]['text']
+    return ""
+
+
+def _recognized_text(response_data: Any) -> str:
+    """提取识别文本；请求失败时记录错误描述并返回空字符串，调用方据此跳过本轮"""
+    if not isinstance(response_data, dict):
+        logger.warning("ASR识别失败: %.200s", response_data)
+        return ""
+    return _extract_text(response_data)
+
+
+def _extract_results(response_data: Any) -> List[Dict[str, str]]:
+    """从ASR响应中提取完整结果列表，无法提取时返回空列表"""
+    if isinstance(response_data, dict) and 'result' in response_data:
+        return response_data['result']
+    return []
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+class AsyncSpeechRecognizer:
+    """
+    异步语音识别器，复用 http_clients 中的持久连接池，不会阻塞事件循环。
+    接口与 SpeechRecognizer 保持一致，只是方法均为协程。
+    """
+
+    def __init__(self,
+                 server_url: str = "http://192.168.1.5:50000/api/v1/asr",
+                 max_concurrency: int = 4,
+                 backend: str = "asr"):
+        """
+        初始化异步语音识别器
+        
+        参数:
+        server_url: ASR服务器URL
+        max_concurrency: 同时进行的最大识别请求数（由 backend_scheduler 按后端限制）
+        backend: 在 http_clients / backend_scheduler 中的后端名，连接池、超时和排队上限在那里配置
+        """
+        self.server_url = server_url
+        self.max_concurrency = max_concurrency
+        self.backend = backend
+        backend_scheduler.configure(backend, concurrency=max_concurrency)
+
+    async def recognize(self, audio_path: Union[str, List[str]], language: str = "auto") -> str:
+        """
+        将音频文件转换为文本
+        
+        参数:
+        audio_path: 音频文件路径，可以是单个文件路径或文件路径列表
+        language: 语言选项 "auto", "zh", "en", "yue", "ja", "ko", "nospeech"
+        
+        返回:
+        识别出的文本
+        """
+        response_data = await self._send_request(audio_path, language)
+        return _recognized_text(response_data)
+
+    async def recognize_multiple(self, audio_path: Union[str, List[str]], language: str = "auto") -> List[Dict[str, str]]:
+        """
+        将音频文件转换为文本，返回完整的结果列表
+        
+        参数:
+        audio_path: 音频文件路径，可以是单个文件路径或文件路径列表
+        language: 语言选项 "auto", "zh", "en", "yue", "ja", "ko", "nospeech"
+        
+        返回:
+        识别结果列表，包含文件名和识别文本
+        """
+        response_data = await self._send_request(audio_path, language)
+        return _extract_results(response_data)
+
+    async def recognize_audio(self, wav_data: bytes, key: str = "audio.wav", language: str = "auto") -> str:
+        """
+        直接识别内存中的WAV数据，不经过磁盘
+        
+        参数:
+        wav_data: 完整的WAV字节（含文件头）
+        key: 上传时使用的文件名，同时作为结果中的key
+        language: 语言选项
+        
+        返回:
+        识别出的文本，未识别出文本或请求失败时为空字符串
+        """
+        response_data = await self._post_files([(key, wav_data)], language)
+        return _recognized_text(response_data)
+
+    async def recognize_audio_multiple(self, items: List[Tuple[str, bytes]], language: str = "auto") -> List[Dict[str, str]]:
+        """
+        一次请求识别多段内存中的WAV数据
+        
+        参数:
+        items: (key, wav_data) 列表
+        language: 语言选项
+        
+        返回:
+        识别结果列表，包含key和识别文本
+        """
+        response_data = await self._post_files(items, language)
+        return _extract_results(response_data)
+
+    async def recognize_audio_batch(self, items: List[Tuple[str, bytes]], language: str = "auto") -> Tuple[Dict[str, str], Any]:
+        """
+        一次请求识别多段内存中的WAV数据，按key拆分结果
+        
+        参数:
+        items: (key, wav_data) 列表，key 在本次请求内必须唯一
+        language: 语言选项
+        
+        返回:
+        ({key: 识别文本}, 服务器原始响应)；识别失败的key不在字典中，原始响应用于错误信息
+        """
+        response_data = await self._post_files(items, language)
+        results = _extract_results(response_data)
+        keys = [key for key, _ in items]
+        texts = {r.get('key'): r.get('text', '') for r in results if r.get('key') in keys}
+        if not texts and len(results) == len(items):
+            # 服务端未按上传的key返回时按顺序对应
+            texts = {key: r.get('text', '') for key, r in zip(keys, results)}
+        return texts, response_data
+
+    async def _send_request(self, audio_path: Union[str, List[str]], language: str) -> Any:
+        """
+        读取音频文件并发送请求到ASR服务器
+        
+        参数:
+        audio_path: 音频文件路径，可以是单个文件路径或文件路径列表
+        language: 语言选项
+        
+        返回:
+        服务器响应的JSON数据
+        """
+        if isinstance(audio_path, str):
+            audio_paths = [audio_path]
+        else:
+            audio_paths = audio_path
+
+        try:
+            # 在线程池中读取文件，避免磁盘IO阻塞事件循环
+            contents = await asyncio.gather(*(asyncio.to_thread(_read_file, path) for path in audio_paths))
+        except Exception as e:
+            return f"异常: {str(e)}"
+
+        return await self._post_files(
+            [(os.path.basename(path), content) for path, content in zip(audio_paths, contents)],
+            language
+        )
+
+    async def _post_files(self, items: List[Tuple[str, bytes]], language: str) -> Any:
+        """
+        以multipart形式上传内存中的音频数据
+        
+        参数:
+        items: (key, wav_data) 列表
+        language: 语言选项
+        
+        返回:
+        服务器响应的JSON数据
+        """
+        import aiohttp
+
+        form = aiohttp.FormData()
+        for key, content in items:
+            form.add_field('files', content, filename=key, content_type='audio/wav')
+        form.add_field('keys', ','.join(key for key, _ in items))
+        form.add_field('lang', language)
+
+        try:
+            with tracing.span("asr.request", files=len(items)):
+                async with backend_scheduler.slot(self.backend):
+                    async with http_clients.aiohttp_session(self.backend).post(self.server_url, data=form) as response:
+                        if response.status == 200:
+                            return await response.json(content_type=None)
+                        else:
+                            backend_errors.inc(backend=self.backend, kind="status")
+                            return f"错误: {response.status}, {await response.text()}"
+        except BackendBusyError:
+            # 排队已满，交给调用方决定如何提示用户
+            raise
+        except asyncio.TimeoutError:
+            backend_errors.inc(backend=self.backend, kind="timeout")
+            return "异常: ASR请求超时"
+        except Exception as e:
+            backend_errors.inc(backend=self.backend, kind="exception")
+            return f"异常: {str(e)}"
+
+    async def close(self):
+        """关闭连接池"""
+        await http_clients.close(self.backend)
+
+
 # 使用示例
 if __name__ == "__main__":
     # 创建语音识别器实例
@@ -0,0 +1,167 @@
+"""
+音频编解码 - 上下行音频的Opus压缩，opuslib（libopus）不可用时回退为原始PCM
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+logger = logging.getLogger("AudioCodec")
+
+try:
+    import opuslib
+except Exception as e:  # 未安装 opuslib 或系统缺少 libopus 时 import 会抛出普通 Exception
+    opuslib = None
+    logger.info(f"Opus不可用，音频只使用PCM: {e}")
+
+CODEC_PCM = "pcm"
+CODEC_OPUS = "opus"
+
+# Opus 支持的采样率
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+# 单个Opus包最长 120ms，解码缓冲按此分配
+OPUS_MAX_PACKET_MS = 120
+
+
+@dataclass
+class OpusConfig:
+    """Opus编码参数"""
+    bitrate: int = 24000         # 目标码率（bps），16kHz PCM 为 256kbps
+    frame_ms: int = 20           # 每个Opus包的时长，只能是 2.5/5/10/20/40/60
+    complexity: int = 5          # 编码复杂度 0-10，越高音质越好、CPU越高
+    application: str = "voip"    # voip / audio / restricted_lowdelay
+
+
+def opus_available() -> bool:
+    return opuslib is not None
+
+
+def supported_codecs(preferred: Iterable[str], sample_rate: int) -> List[str]:
+    """服务端按偏好顺序可用的编码，去掉当前环境或采样率不支持的"""
+    codecs = []
+    for codec in preferred:
+        if codec == CODEC_OPUS and (not opus_available() or sample_rate not in OPUS_SAMPLE_RATES):
+            continue
+        if codec in (CODEC_PCM, CODEC_OPUS) and codec not in codecs:
+            codecs.append(codec)
+    return codecs
+
+
+def negotiate_codec(offered: Union[None, str, Sequence[str]], supported: Sequence[str]) -> str:
+    """
+    按设备的偏好顺序选第一个服务端支持的编码
+
+    Args:
+        offered: 设备在 mcp/registerTools 中声明的 audio_codecs，为空时视为只支持PCM（旧设备）
+        supported: supported_codecs() 的结果
+    """
+    if isinstance(offered, str):
+        offered = [offered]
+    for codec in offered or ():
+        codec = str(codec).lower()
+        if codec in supported:
+            return codec
+    return CODEC_PCM
+
+
+class PCMEncoder:
+    """直通编码器：原样返回PCM（可以是 memoryview，不复制）"""
+    codec = CODEC_PCM
+    frame_ms = None
+
+    def encode(self, pcm) -> List[Any]:
+        return [pcm] if len(pcm) else []
+
+    def flush(self) -> List[Any]:
+        return []
+
+
+class PCMDecoder:
+    codec = CODEC_PCM
+
+    def decode(self, packet: bytes) -> bytes:
+        return packet
+
+
+class OpusEncoder:
+    """
+    会话级Opus编码器。PCM按固定帧长编码，不足一帧的尾巴留到下一次 encode，
+    编码器状态（以及尾巴）在同一会话的各个音频块之间复用。
+    """
+    codec = CODEC_OPUS
+
+    def __init__(self, sample_rate: int, sample_width: int, channels: int, config: OpusConfig):
+        self.frame_ms = config.frame_ms
+        self.frame_size = sample_rate * config.frame_ms // 1000  # 每帧每声道采样数
+        self.frame_bytes = self.frame_size * sample_width * channels
+        self._encoder = opuslib.Encoder(sample_rate, channels, config.application)
+        self._encoder.bitrate = config.bitrate
+        self._encoder.complexity = config.complexity
+        self._pending = bytearray()
+
+    def encode(self, pcm) -> List[bytes]:
+        """编码一段PCM，返回完整帧对应的Opus包"""
+        packets = []
+        view = memoryview(pcm)
+        offset = 0
+        if self._pending:
+            # 先补齐上次剩下的半帧
+            offset = min(len(view), self.frame_bytes - len(self._pending))
+            self._pending.extend(view[:offset])
+            if len(self._pending) < self.frame_bytes:
+                return packets
+            packets.append(self._encoder.encode(bytes(self._pending), self.frame_size))
+            self._pending.clear()
+        end = offset + (len(view) - offset) // self.frame_bytes * self.frame_bytes
+        for i in range(offset, end, self.frame_bytes):
+            packets.append(self._encoder.encode(bytes(view[i:i + self.frame_bytes]), self.frame_size))
+        self._pending.extend(view[end:])
+        return packets
+
+    def flush(self) -> List[bytes]:
+        """一段音频结束：剩余不足一帧的部分补静音后编码"""
+        if not self._pending:
+            return []
+        self._pending.extend(bytes(self.frame_bytes - len(self._pending)))
+        packet = self._encoder.encode(bytes(self._pending), self.frame_size)
+        self._pending.clear()
+        return [packet]
+
+
+class OpusDecoder:
+    """会话级Opus解码器，每个上行二进制消息是一个Opus包"""
+    codec = CODEC_OPUS
+
+    def __init__(self, sample_rate: int, channels: int):
+        self._decoder = opuslib.Decoder(sample_rate, channels)
+        self._max_frame_size = sample_rate * OPUS_MAX_PACKET_MS // 1000
+
+    def decode(self, packet: bytes) -> bytes:
+        try:
+            return self._decoder.decode(bytes(packet), self._max_frame_size)
+        except Exception as e:
+            # 单个损坏的包丢弃即可，不影响后续解码
+            logger.warning("Opus解码失败，丢弃 %d 字节: %s", len(packet), e, extra={"category": "audio_chunk"})
+            return b''
+
+
+def create_codec(codec: str, sample_rate: int, sample_width: int, channels: int = 1,
+                 config: Optional[OpusConfig] = None):
+    """创建会话的 (编码器, 解码器)；Opus创建失败时回退为PCM"""
+    if codec == CODEC_OPUS and opus_available():
+        try:
+            config = config or OpusConfig()
+            return (OpusEncoder(sample_rate, sample_width, channels, config),
+                    OpusDecoder(sample_rate, channels))
+        except Exception as e:
+            logger.error(f"创建Opus编解码器失败，回退为PCM: {e}")
+    return PCMEncoder(), PCMDecoder()
+
+
+def describe(encoder, sample_rate: int, sample_width: int, channels: int) -> Dict[str, Any]:
+    """start_audio / 注册响应中携带的音频格式"""
+    audio_format = {"codec": encoder.codec, "sample_rate": sample_rate,
+                    "sample_width": sample_width, "channels": channels}
+    if encoder.frame_ms:
+        audio_format["frame_ms"] = encoder.frame_ms
+    return audio_format
@@ -1,6 +1,9 @@
 import wave
+import struct
+import asyncio
 import logging
 import os
+from collections import deque
 from datetime import datetime
 
 logger = logging.getLogger("AudioProcessor")
@@ -48,4 +51,144 @@ class AudioProcessor:
             
         except Exception as e:
             logger.error(f"保存WAV文件失败: {e}", exc_info=True)
-            return None 
\ No newline at end of file
+            return None
+
+    @staticmethod
+    def wav_header(data_size, channels=1, sample_width=2, sample_rate=16000) -> bytes:
+        """
+        生成44字节的标准PCM WAV文件头
+
+        Args:
+            data_size: PCM数据字节数
+            channels: 音频通道数
+            sample_width: 采样宽度（字节）
+            sample_rate: 采样率
+        """
+        byte_rate = sample_rate * channels * sample_width
+        block_align = channels * sample_width
+        return struct.pack(
+            '<4sI4s4sIHHIIHH4sI',
+            b'RIFF', 36 + data_size, b'WAVE',
+            b'fmt ', 16, 1, channels, sample_rate, byte_rate, block_align, sample_width * 8,
+            b'data', data_size
+        )
+
+    def build_wav(self, audio_data, channels=1, sample_width=2, sample_rate=16000) -> bytes:
+        """
+        在内存中为原始PCM数据加上WAV文件头，不写磁盘
+
+        Args:
+            audio_data: 原始音频数据（bytes/bytearray/memoryview）
+
+        Returns:
+            完整的WAV字节
+        """
+        header = self.wav_header(len(audio_data), channels, sample_width, sample_rate)
+        return b''.join((header, audio_data))
+
+
+class AudioArchiver:
+    """
+    后台音频归档器：在线程池中异步写WAV文件，并按文件数/总大小淘汰最旧的归档，
+    避免热路径上的磁盘IO以及目录无限增长。
+    """
+
+    def __init__(self, audio_processor: AudioProcessor, max_files=1000, max_bytes=512 * 1024 * 1024, queue_size=64):
+        """
+        初始化归档器
+
+        Args:
+            audio_processor: 负责实际写文件的音频处理器
+            max_files: 最多保留的归档文件数
+            max_bytes: 归档目录最多占用的字节数
+            queue_size: 待写队列长度，队列满时丢弃新的归档请求
+        """
+        self.audio_processor = audio_processor
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._files = deque()  # (path, size)，按写入时间排序
+        self._total_bytes = 0
+        self._task: asyncio.Task | None = None
+
+    async def start(self):
+        """扫描已有归档并启动后台写入任务"""
+        await asyncio.to_thread(self._scan_existing)
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"音频归档器已启动，现有文件: {len(self._files)}，占用: {self._total_bytes} 字节")
+
+    async def stop(self):
+        """写完队列中剩余的归档后停止"""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    def submit(self, audio_data, remote_address) -> bool:
+        """
+        提交一段PCM数据等待归档，不会阻塞调用方
+
+        Returns:
+            是否成功入队
+        """
+        try:
+            self._queue.put_nowait((audio_data, remote_address))
+            return True
+        except asyncio.QueueFull:
+            logger.warning("音频归档队列已满，丢弃本次归档")
+            return False
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                break
+            audio_data, remote_address = item
+            try:
+                await asyncio.to_thread(self._write_and_prune, audio_data, remote_address)
+            except Exception as e:
+                logger.error(f"归档音频失败: {e}", exc_info=True)
+
+    def _scan_existing(self):
+        entries = []
+        for name in os.listdir(self.audio_processor.audio_dir):
+            if not name.endswith('.wav'):
+                continue
+            path = os.path.join(self.audio_processor.audio_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, path, stat.st_size))
+        entries.sort()
+        for _, path, size in entries:
+            self._files.append((path, size))
+            self._total_bytes += size
+        self._prune()
+
+    def _write_and_prune(self, audio_data, remote_address):
+        file_path = self.audio_processor.save_as_wav(audio_data, remote_address)
+        if not file_path:
+            return
+        size = os.path.getsize(file_path)
+        # 同一秒内同一地址的文件名相同，会覆盖旧文件，此处避免重复计数
+        for i, (path, old_size) in enumerate(self._files):
+            if path == file_path:
+                del self._files[i]
+                self._total_bytes -= old_size
+                break
+        self._files.append((file_path, size))
+        self._total_bytes += size
+        self._prune()
+
+    def _prune(self):
+        while self._files and (len(self._files) > self.max_files or self._total_bytes > self.max_bytes):
+            path, size = self._files.popleft()
+            self._total_bytes -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"删除旧归档文件失败 {path}: {e}")
@@ -0,0 +1,108 @@
+"""
+流式语音回复管线：LLM文本增量 -> 分句 -> 逐句TTS -> PCM音频块
+"""
+
+import asyncio
+import logging
+from contextlib import aclosing
+from typing import AsyncGenerator, AsyncIterator, Optional
+
+from .tts_processor import TTSProcessor
+from ..utils.text_segmenter import SentenceSegmenter
+
+logger = logging.getLogger("SpeechPipeline")
+
+# 队列结束标记
+_DONE = object()
+
+
+class SpeechPipeline:
+    """
+    三个阶段并发运行：分句阶段持续消费LLM输出，TTS阶段逐句合成，
+    调用方则在首个音频块到达时就开始发送，不必等待完整回复。
+    """
+
+    def __init__(self, tts_processor: TTSProcessor, segmenter: Optional[SentenceSegmenter] = None,
+                 max_pending_segments: int = 8, max_pending_chunks: int = 32):
+        """
+        Args:
+            tts_processor: TTS处理器
+            segmenter: 分句器，默认使用 SentenceSegmenter
+            max_pending_segments: 等待合成的句子上限
+            max_pending_chunks: 等待发送的音频块上限，发送端慢时对TTS形成反压
+        """
+        self.tts_processor = tts_processor
+        self.segmenter = segmenter or SentenceSegmenter()
+        self._segments: asyncio.Queue = asyncio.Queue(maxsize=max_pending_segments)
+        self._chunks: asyncio.Queue = asyncio.Queue(maxsize=max_pending_chunks)
+        self._text_parts = []
+        self.chunks_emitted = 0  # 已交给调用方的音频块数
+
+    @property
+    def reply_text(self) -> str:
+        """目前为止LLM产出的完整回复文本"""
+        return "".join(self._text_parts)
+
+    async def stream(self, text_stream: AsyncIterator[str]) -> AsyncGenerator[bytes, None]:
+        """消费文本增量流，产出按采样宽度对齐的PCM音频块"""
+        segment_task = asyncio.create_task(self._segment_stage(text_stream))
+        tts_task = asyncio.create_task(self._tts_stage())
+        try:
+            while True:
+                chunk = await self._chunks.get()
+                if chunk is _DONE:
+                    break
+                self.chunks_emitted += 1
+                yield chunk
+            # 让阶段内的异常在这里抛出（TTS阶段先结束，才能保证分句阶段不会卡在满队列上）
+            await tts_task
+            await segment_task
+        finally:
+            for task in (segment_task, tts_task):
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(segment_task, tts_task, return_exceptions=True)
+
+    async def _segment_stage(self, text_stream: AsyncIterator[str]):
+        # 出错时也要发送结束标记，让下游阶段和调用方退出；被取消时则无需通知
+        try:
+            async for delta in text_stream:
+                self._text_parts.append(delta)
+                for segment in self.segmenter.feed(delta):
+                    await self._segments.put(segment)
+            rest = self.segmenter.flush()
+            if rest:
+                await self._segments.put(rest)
+        except Exception:
+            await self._segments.put(_DONE)
+            raise
+        finally:
+            # 及时关闭上游生成器，释放LLM的HTTP连接
+            aclose = getattr(text_stream, "aclose", None)
+            if aclose:
+                await aclose()
+        await self._segments.put(_DONE)
+
+    async def _tts_stage(self):
+        sample_width = self.tts_processor.sample_width
+        remainder = b''
+        try:
+            while True:
+                segment = await self._segments.get()
+                if segment is _DONE:
+                    break
+                logger.debug("合成片段: %s", segment)
+                # 被取消时立即关闭合成生成器，释放TTS的流式响应
+                async with aclosing(self.tts_processor.text_to_speech_generator(segment)) as chunks:
+                    async for chunk in chunks:
+                        if remainder:
+                            chunk = remainder + chunk
+                        # 保证每个块都是完整采样点，半个采样留到下一块
+                        cut = len(chunk) - len(chunk) % sample_width
+                        remainder = chunk[cut:]
+                        if cut:
+                            await self._chunks.put(chunk[:cut])
+        except Exception:
+            await self._chunks.put(_DONE)
+            raise
+        await self._chunks.put(_DONE)
@@ -0,0 +1,150 @@
+"""
+增量语音识别 - 在设备仍在说话时，把已经录到的音频分块提前送去识别
+"""
+
+import asyncio
+import logging
+from typing import List, Optional
+
+import numpy as np
+
+from .asr_processor import AsyncSpeechRecognizer
+from .audio_processor import AudioProcessor
+
+logger = logging.getLogger("StreamingASR")
+
+
+def join_transcripts(parts: List[str]) -> str:
+    """拼接分块识别结果，英文单词之间补空格，中文直接相连"""
+    result = ""
+    for part in parts:
+        part = part.strip()
+        if not part:
+            continue
+        if result and result[-1].isascii() and result[-1].isalnum() and part[0].isascii() and part[0].isalnum():
+            result += " "
+        result += part
+    return result
+
+
+class StreamingRecognizer:
+    """
+    分块增量识别器。FunASR 的HTTP接口只支持整段识别，这里用分块请求模拟流式识别：
+    缓冲区累计满 chunk_seconds 后，在末尾 search_seconds 内能量最低的位置切开，
+    前半段立即在后台识别，结束录音时只需识别最后剩下的尾巴。
+    """
+
+    def __init__(self, speech_recognizer: AsyncSpeechRecognizer, audio_processor: AudioProcessor,
+                 chunk_seconds: float = 4.0, search_seconds: float = 1.0, min_tail_seconds: float = 0.1,
+                 sample_rate: int = 16000, sample_width: int = 2):
+        """
+        Args:
+            speech_recognizer: 异步语音识别器（或 ASRBatcher）
+            audio_processor: 用于在内存中构建WAV
+            chunk_seconds: 每个识别块的目标时长
+            search_seconds: 在块末尾多长范围内寻找静音切点
+            min_tail_seconds: 尾巴短于该时长且已有分块结果时，不再单独识别
+            sample_rate: 采样率
+            sample_width: 采样宽度（字节）
+        """
+        self.speech_recognizer = speech_recognizer
+        self.audio_processor = audio_processor
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        bytes_per_second = sample_rate * sample_width
+        self.chunk_bytes = int(chunk_seconds * bytes_per_second)
+        self.search_bytes = int(search_seconds * bytes_per_second)
+        self.min_tail_bytes = int(min_tail_seconds * bytes_per_second)
+        self.frame_bytes = sample_rate // 50 * sample_width  # 20ms
+
+    def create_session(self, key_prefix: str) -> "StreamingASRSession":
+        """为一次发言创建增量识别状态"""
+        return StreamingASRSession(self, key_prefix)
+
+    def find_cut(self, audio, start: int, end: int) -> int:
+        """在 [end - search_bytes, end) 内找能量最低的20ms帧，返回切点的字节偏移"""
+        search_start = max(start, end - self.search_bytes)
+        frame_bytes = self.frame_bytes
+        n_frames = (end - search_start) // frame_bytes
+        if n_frames <= 1:
+            return end
+        # 先复制出搜索窗口，避免numpy视图锁住仍在增长的bytearray
+        raw = bytes(memoryview(audio)[search_start:search_start + n_frames * frame_bytes])
+        window = np.frombuffer(raw, dtype=np.int16).reshape(n_frames, -1).astype(np.float32)
+        energy = np.mean(window * window, axis=1)
+        return search_start + int(np.argmin(energy)) * frame_bytes
+
+    async def recognize_chunk(self, audio, key: str) -> Optional[str]:
+        """识别一段PCM，失败时返回None"""
+        wav_data = self.audio_processor.build_wav(audio, sample_width=self.sample_width, sample_rate=self.sample_rate)
+        results = await self.speech_recognizer.recognize_audio_multiple([(key, wav_data)])
+        if not results:
+            return None
+        return results[0].get('text', '')
+
+
+class StreamingASRSession:
+    """单次发言的增量识别状态：已提交的偏移、各块的后台任务和部分结果"""
+
+    def __init__(self, recognizer: StreamingRecognizer, key_prefix: str):
+        self.recognizer = recognizer
+        self.key_prefix = key_prefix
+        self.committed = 0  # 已送去识别的字节偏移
+        self._chunks: List[tuple] = []  # (start, end, task)
+
+    @property
+    def partial_text(self) -> str:
+        """已完成分块的识别结果（部分假设）"""
+        parts = []
+        for _, _, task in self._chunks:
+            if not task.done() or task.cancelled() or task.exception() or task.result() is None:
+                break
+            parts.append(task.result())
+        return join_transcripts(parts)
+
+    def feed(self, buffer: bytearray):
+        """缓冲区追加数据后调用，满一块时提交后台识别"""
+        recognizer = self.recognizer
+        while len(buffer) - self.committed >= recognizer.chunk_bytes:
+            end = self.committed + recognizer.chunk_bytes
+            cut = recognizer.find_cut(buffer, self.committed, end)
+            start = self.committed
+            chunk = bytes(memoryview(buffer)[start:cut])
+            key = f"{self.key_prefix}_{len(self._chunks)}.wav"
+            task = asyncio.create_task(recognizer.recognize_chunk(chunk, key))
+            self._chunks.append((start, cut, task))
+            self.committed = cut
+            logger.debug("[%s] 提交识别块 %s: %d-%d", self.key_prefix, key, start, cut)
+
+    async def finalize(self, full_audio) -> str:
+        """录音结束：等待已提交的块，识别剩余尾巴，返回完整文本"""
+        recognizer = self.recognizer
+        parts = []
+        tail_start = self.committed
+        for start, _, task in self._chunks:
+            try:
+                text = await task
+            except Exception as e:
+                logger.warning("[%s] 分块识别异常: %s", self.key_prefix, e)
+                text = None
+            if text is None:
+                # 该块识别失败，从这里开始整体重识别
+                tail_start = start
+                break
+            parts.append(text)
+
+        # full_audio 已从会话中取走不再增长，直接用视图，不复制
+        tail = memoryview(full_audio)[tail_start:]
+        if len(tail) >= recognizer.min_tail_bytes or not parts:
+            text = await recognizer.recognize_chunk(tail, f"{self.key_prefix}_tail.wav")
+            if text:
+                parts.append(text)
+        self.cancel()
+        return join_transcripts(parts)
+
+    def cancel(self):
+        """取消尚未完成的分块识别"""
+        for _, _, task in self._chunks:
+            if not task.done():
+                task.cancel()
+        self._chunks.clear()
@@ -0,0 +1,176 @@
+"""
+TTS音频缓存 - 按 (文本, 音色, 采样率) 内容寻址，内存LRU + 可选的磁盘层
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from ..utils.metrics import metrics
+
+logger = logging.getLogger("TTSCache")
+
+cache_lookups = metrics.counter("tts_cache_lookups_total", "TTS缓存查询次数", ["result"])
+
+
+class TTSCache:
+    """
+    两级缓存：内存层按字节预算做LRU淘汰；磁盘层（可选）每条音频一个文件，
+    在线程池中读取，命中后提升到内存层。磁盘层的索引在 load() 中建立（TTSProcessor.prewarm 会调用），
+    之前只使用内存层。
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, disk_dir: Optional[str] = None,
+                 disk_max_bytes: int = 256 * 1024 * 1024, max_text_chars: int = 64):
+        """
+        Args:
+            max_bytes: 内存层字节预算
+            disk_dir: 磁盘层目录，为空时只使用内存层
+            disk_max_bytes: 磁盘层字节上限
+            max_text_chars: 只缓存不超过该长度的文本，长回复几乎不会重复
+        """
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.max_text_chars = max_text_chars
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()  # key -> 文件大小，按写入时间排序
+        self._disk_bytes = 0
+        self._loaded = False
+
+    @staticmethod
+    def make_key(text: str, voice: Optional[str], sample_rate: int) -> str:
+        """内容寻址的缓存键"""
+        raw = f"{voice or ''}\x00{sample_rate}\x00{text}".encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    def cacheable(self, text: str) -> bool:
+        return bool(text) and len(text) <= self.max_text_chars
+
+    async def load(self):
+        """在线程池中扫描磁盘层目录建立索引，重复调用无效"""
+        if self._loaded or not self.disk_dir:
+            return
+        self._loaded = True
+        entries = await asyncio.to_thread(self._scan_disk)
+        # 索引只在事件循环线程中修改；扫描到的旧文件排在扫描期间新写入的条目之前
+        for key, size in reversed(entries):
+            if key not in self._disk:
+                self._disk[key] = size
+                self._disk_bytes += size
+                self._disk.move_to_end(key, last=False)
+        evicted = self._evict_disk()
+        if evicted:
+            await asyncio.to_thread(self._remove_files, evicted)
+        logger.info(f"TTS磁盘缓存已加载 {len(self._disk)} 条，共 {self._disk_bytes} 字节")
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """查询缓存，未命中返回 None；内存层命中时不切换线程"""
+        audio = self._memory.get(key)
+        if audio is not None:
+            self._memory.move_to_end(key)
+            cache_lookups.inc(result="memory")
+            return audio
+
+        if key in self._disk:
+            audio = await asyncio.to_thread(self._read_file, key)
+            if audio:
+                self._put_memory(key, audio)
+                cache_lookups.inc(result="disk")
+                return audio
+            # 文件被删除或为空
+            self._disk_bytes -= self._disk.pop(key, 0)
+
+        cache_lookups.inc(result="miss")
+        return None
+
+    async def put(self, key: str, audio: bytes):
+        """写入缓存；磁盘层在线程池中写文件，不阻塞事件循环"""
+        if not audio:
+            return
+        audio = bytes(audio)
+        self._put_memory(key, audio)
+        if self.disk_dir and key not in self._disk:
+            try:
+                await asyncio.to_thread(self._write_file, key, audio)
+            except OSError as e:
+                logger.warning(f"写入TTS磁盘缓存失败: {e}")
+                return
+            # 索引只在事件循环线程中修改
+            self._disk[key] = len(audio)
+            self._disk_bytes += len(audio)
+            evicted = self._evict_disk()
+            if evicted:
+                await asyncio.to_thread(self._remove_files, evicted)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_entries": len(self._disk),
+            "disk_bytes": self._disk_bytes,
+        }
+
+    def _put_memory(self, key: str, audio: bytes):
+        if len(audio) > self.max_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.pcm")
+
+    def _scan_disk(self) -> list:
+        """（线程池中）列出磁盘层文件，返回按修改时间从旧到新排列的 (key, 大小)"""
+        os.makedirs(self.disk_dir, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(".pcm"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.disk_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        return [(key, size) for _, key, size in sorted(entries)]
+
+    def _read_file(self, key: str) -> Optional[bytes]:
+        """（线程池中）读取一条音频，文件不存在时返回 None"""
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_file(self, key: str, audio: bytes):
+        os.makedirs(self.disk_dir, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, path)
+
+    def _evict_disk(self) -> list:
+        evicted = []
+        while self._disk and self._disk_bytes > self.disk_max_bytes:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            evicted.append(key)
+        return evicted
+
+    def _remove_files(self, keys: list):
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
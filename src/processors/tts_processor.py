@@ -2,23 +2,41 @@
 简化的TTS处理器 - 移除pygame依赖
 """
 
+import asyncio
 import logging
+import time
+from typing import AsyncGenerator, Iterable, Optional
 import httpx
-from typing import AsyncGenerator, Optional
+from ..utils.http_clients import http_clients
+from ..utils.backend_scheduler import backend_scheduler, BackendBusyError, backend_errors, backend_fallbacks
+from ..utils import tracing
+from .tts_cache import TTSCache
 
 logger = logging.getLogger(__name__)
 
+
+def _error_kind(e: Exception) -> str:
+    return "timeout" if isinstance(e, (asyncio.TimeoutError, httpx.TimeoutException)) else "exception"
+
+
 class TTSProcessor:
-    def __init__(self, api_url: str = "192.168.1.5:5001", api_key: Optional[str] = None):
+    def __init__(self, api_url: str = "192.168.1.5:5001", api_key: Optional[str] = None, backend: str = "tts",
+                 voice: Optional[str] = None, cache: Optional[TTSCache] = None):
         """
         初始化TTS处理器
         
         Args:
             api_url: 本地TTS API地址
             api_key: API密钥（如果需要）
+            backend: http_clients 中的后端名，复用长连接
+            voice: 音色（TTS服务支持时传给服务端，同时作为缓存键的一部分）
+            cache: TTS音频缓存，为空时不缓存
         """
         self.api_url = api_url
         self.api_key = api_key
+        self.backend = backend
+        self.voice = voice
+        self.cache = cache
         self.logger = logging.getLogger("TTSProcessor")
         
         # 音频参数
@@ -35,6 +53,14 @@ class TTSProcessor:
             self.logger.warning("TTS generator收到了空文本，直接返回。")
             return
 
+        cache_key = self._cache_key(text)
+        if cache_key:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+        parts = [] if cache_key else None
+
         # 构建请求
         headers = {
             'Content-Type': 'application/json'
@@ -42,35 +68,51 @@ class TTSProcessor:
         if self.api_key:
             headers['Authorization'] = f'Bearer {self.api_key}'
             
-        data = {
-            "text": text
-        }
+        data = self._build_payload(text)
+        start = time.perf_counter()
+        first_byte = False
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                async with client.stream(
-                    "POST", 
-                    f"http://{self.api_url}", 
-                    json=data, 
-                    headers=headers
-                ) as response:
+            client = http_clients.httpx_client(self.backend)
+            async with backend_scheduler.slot(self.backend), client.stream(
+                "POST", 
+                f"http://{self.api_url}", 
+                json=data, 
+                headers=headers,
+                extensions=http_clients.httpx_extensions(self.backend)
+            ) as response:
+            
+                if response.status_code != 200:
+                    error_content = await response.aread()
+                    self.logger.error("TTS API 请求失败: %s, %s", response.status_code, error_content.decode())
+                    self._record_failure("status")
+                    # 产生一小段静音以避免下游音频流中断
+                    yield b'\x00' * 3200 
+                    return
                 
-                    if response.status_code != 200:
-                        error_content = await response.aread()
-                        self.logger.error(f"TTS API 请求失败: {response.status_code}, {error_content.decode()}")
-                        # 产生一小段静音以避免下游音频流中断
-                        yield b'\x00' * 3200 
-                        return
-                    
-                    # 流式接收音频数据
-                    async for chunk in response.aiter_bytes():
-                        if chunk:
-                            yield chunk
-                            
+                # 流式接收音频数据
+                async for chunk in response.aiter_bytes():
+                    if chunk:
+                        if not first_byte:
+                            first_byte = True
+                            tracing.record("tts.ttfb", time.perf_counter() - start)
+                        if parts is not None:
+                            parts.append(chunk)
+                        yield chunk
+                        
+        except BackendBusyError:
+            raise
         except Exception as e:
-            self.logger.error(f"TTS请求异常: {e}")
+            self.logger.error("TTS请求异常: %s", e)
+            self._record_failure(_error_kind(e))
             # 产生静音以避免中断
             yield b'\x00' * 3200
+            return
+
+        # 包含调用方消费音频块的时间（发送端反压时会偏大）
+        tracing.record("tts.total", time.perf_counter() - start, chars=len(text))
+        if parts:
+            await self.cache.put(cache_key, b''.join(parts))
 
     async def text_to_speech(self, text: str) -> bytes:
         """
@@ -79,36 +121,87 @@ class TTSProcessor:
         if not text:
             return b'\x00' * 3200
 
+        cache_key = self._cache_key(text)
+        if cache_key:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
         headers = {
             'Content-Type': 'application/json'
         }
         if self.api_key:
             headers['Authorization'] = f'Bearer {self.api_key}'
             
-        data = {
-            "text": text
-        }
+        data = self._build_payload(text)
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"http://{self.api_url}", 
-                    json=data, 
-                    headers=headers
-                )
+            client = http_clients.httpx_client(self.backend)
+            with tracing.span("tts.total", chars=len(text)):
+                async with backend_scheduler.slot(self.backend):
+                    response = await client.post(
+                        f"http://{self.api_url}", 
+                        json=data, 
+                        headers=headers,
+                        extensions=http_clients.httpx_extensions(self.backend)
+                    )
+            
+            if response.status_code == 200:
+                audio_data = await response.aread()
+                self.logger.debug("TTS返回音频数据大小: %d 字节", len(audio_data))
+                if cache_key and audio_data:
+                    await self.cache.put(cache_key, audio_data)
+                return audio_data
+            else:
+                self.logger.error("TTS API 请求失败: %s", response.status_code)
+                self._record_failure("status")
+                return b'\x00' * 3200
                 
-                if response.status_code == 200:
-                    audio_data = await response.aread()
-                    self.logger.info(f"TTS返回音频数据大小: {len(audio_data)} 字节")
-                    return audio_data
-                else:
-                    self.logger.error(f"TTS API 请求失败: {response.status_code}")
-                    return b'\x00' * 3200
-                    
+        except BackendBusyError:
+            raise
         except Exception as e:
-            self.logger.error(f"TTS请求异常: {e}")
+            self.logger.error("TTS请求异常: %s", e)
+            self._record_failure(_error_kind(e))
             return b'\x00' * 3200
 
+    def _record_failure(self, kind: str):
+        """记录一次失败，调用方随后返回静音"""
+        backend_errors.inc(backend=self.backend, kind=kind)
+        backend_fallbacks.inc(backend=self.backend, fallback="silence")
+
+    async def get_cached(self, text: str) -> Optional[bytes]:
+        """只查缓存，不请求TTS服务；未缓存时返回 None"""
+        cache_key = self._cache_key(text)
+        return await self.cache.get(cache_key) if cache_key else None
+
+    async def prewarm(self, phrases: Iterable[str], concurrency: int = 2):
+        """加载磁盘缓存索引并预先合成常用短语写入缓存，启动时在后台调用"""
+        if not self.cache:
+            return
+        await self.cache.load()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def warm(phrase: str):
+            async with semaphore:
+                await self.text_to_speech(phrase)
+
+        pending = [p for p in phrases if self._cache_key(p) and await self.get_cached(p) is None]
+        await asyncio.gather(*(warm(p) for p in pending))
+        self.logger.info("TTS缓存预热完成，新合成 %d 条，缓存状态: %s", len(pending), self.cache.stats())
+
+    def _cache_key(self, text: str) -> Optional[str]:
+        if not self.cache or not self.cache.cacheable(text):
+            return None
+        return self.cache.make_key(text, self.voice, self.sample_rate)
+
+    def _build_payload(self, text: str) -> dict:
+        data = {
+            "text": text
+        }
+        if self.voice:
+            data["voice"] = self.voice
+        return data
+
     def is_ready(self) -> bool:
         """检查TTS服务是否可用"""
         return True
\ No newline at end of file
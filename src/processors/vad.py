@@ -0,0 +1,208 @@
+"""
+语音活动检测(VAD) - 在服务端对 16kHz int16 PCM 流做静音裁剪和自动断句
+"""
+
+import logging
+from collections import deque
+from typing import Callable, Optional, Protocol, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("VAD")
+
+# process() 返回的事件：检测到一段完整发言结束
+VAD_ENDPOINT = "endpoint"
+
+
+class FrameClassifier(Protocol):
+    """帧分类器接口：输入 (帧数, 每帧采样数) 的 int16 数组，返回每帧是否为语音"""
+
+    def classify(self, frames: np.ndarray) -> np.ndarray:
+        ...
+
+
+class EnergyVAD:
+    """基于短时能量和过零率的向量化分类器，带自适应噪声底"""
+
+    def __init__(self, min_threshold_db: float = -50.0, noise_margin_db: float = 12.0,
+                 zcr_max: float = 0.35, loud_margin_db: float = 10.0,
+                 initial_noise_db: float = -65.0, adapt_rate: float = 0.05):
+        """
+        Args:
+            min_threshold_db: 语音能量阈值下限（dBFS）
+            noise_margin_db: 高出噪声底多少dB才认为是语音
+            zcr_max: 过零率上限，过零率更高且能量不够大的帧视为噪声（如风声、嘶嘶声）
+            loud_margin_db: 能量超过阈值这么多时忽略过零率判断（清辅音）
+            initial_noise_db: 初始噪声底估计
+            adapt_rate: 噪声底的平滑更新系数（每帧）
+        """
+        self.min_threshold_db = min_threshold_db
+        self.noise_margin_db = noise_margin_db
+        self.zcr_max = zcr_max
+        self.loud_margin_db = loud_margin_db
+        self.adapt_rate = adapt_rate
+        self.noise_floor_db = initial_noise_db
+
+    def classify(self, frames: np.ndarray) -> np.ndarray:
+        x = frames.astype(np.float32)
+        rms = np.sqrt(np.mean(x * x, axis=1)) + 1e-9
+        db = 20.0 * np.log10(rms / 32768.0)
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+        threshold = max(self.min_threshold_db, self.noise_floor_db + self.noise_margin_db)
+        speech = (db > threshold) & ((zcr < self.zcr_max) | (db > threshold + self.loud_margin_db))
+
+        # 用非语音帧更新噪声底（按帧数折算平滑系数，与分块大小无关）；
+        # 全是语音时按批内最小能量极缓慢地跟上，防止环境噪声抬高后一直判为语音
+        quiet = db[~speech]
+        if quiet.size:
+            rate = 1.0 - (1.0 - self.adapt_rate) ** quiet.size
+            target = float(np.mean(quiet))
+        else:
+            rate = 1.0 - (1.0 - self.adapt_rate * 0.01) ** len(db)
+            target = float(np.min(db))
+        self.noise_floor_db += rate * (target - self.noise_floor_db)
+        return speech
+
+
+class VoiceActivityDetector:
+    """VAD配置，为每个会话创建独立的 VADStream"""
+
+    def __init__(self, classifier_factory: Callable[[], FrameClassifier] = EnergyVAD,
+                 sample_rate: int = 16000, frame_ms: int = 20, start_ms: int = 60,
+                 hangover_ms: int = 700, pre_roll_ms: int = 200, tail_ms: int = 150,
+                 min_speech_ms: int = 200):
+        """
+        Args:
+            classifier_factory: 帧分类器工厂，可替换为模型实现
+            sample_rate: 采样率
+            frame_ms: 帧长
+            start_ms: 连续多长语音才认为开始说话
+            hangover_ms: 说话后连续多长静音判定为发言结束
+            pre_roll_ms: 开始说话前保留的音频长度，避免截掉首字
+            tail_ms: 发言结束后保留的静音长度
+            min_speech_ms: 有效发言的最短语音时长，更短的视为噪声
+        """
+        self.classifier_factory = classifier_factory
+        self.sample_rate = sample_rate
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.frame_bytes = self.frame_samples * 2
+        self.frame_ms = frame_ms
+        self.start_frames = max(1, start_ms // frame_ms)
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.pre_roll_frames = max(self.start_frames, pre_roll_ms // frame_ms)
+        self.tail_frames = tail_ms // frame_ms
+        self.min_speech_frames = min_speech_ms // frame_ms
+
+    def create_stream(self) -> "VADStream":
+        return VADStream(self)
+
+
+class VADStream:
+    """单个会话的VAD状态机：静音 -> 说话 -> (挂起静音超时) -> 断句"""
+
+    def __init__(self, detector: VoiceActivityDetector):
+        self.detector = detector
+        self.classifier = detector.classifier_factory()
+        self._remainder = b''
+        self._pre_roll = deque(maxlen=detector.pre_roll_frames)
+        self._speech_run = 0       # 静音状态下连续语音帧数
+        self._pending_silence = [] # 说话状态下尚未确认的静音帧
+        self._held = []            # 语音累计不足 min_speech_ms 前暂存的帧
+        self.in_speech = False
+        self.speech_frames = 0     # 当前发言累计的语音帧数
+
+    @property
+    def speech_ms(self) -> int:
+        return self.speech_frames * self.detector.frame_ms
+
+    def process(self, chunk: bytes) -> Tuple[bytes, Optional[str]]:
+        """
+        处理一段PCM，返回 (应保留的语音音频, 事件)。
+        出现事件时立即返回，剩余帧留到下一次调用（可传入空字节继续处理）。
+        """
+        data = self._remainder + chunk if self._remainder else chunk
+        frame_bytes = self.detector.frame_bytes
+        n_frames = len(data) // frame_bytes
+        if n_frames == 0:
+            self._remainder = bytes(data)
+            return b'', None
+
+        frames = np.frombuffer(data, dtype=np.int16, count=n_frames * self.detector.frame_samples)
+        decisions = self.classifier.classify(frames.reshape(n_frames, -1))
+
+        out = []
+        for i in range(n_frames):
+            frame = data[i * frame_bytes:(i + 1) * frame_bytes]
+            event = self._step(frame, bool(decisions[i]), out)
+            if event:
+                self._remainder = bytes(data[(i + 1) * frame_bytes:])
+                return b''.join(out), event
+        self._remainder = bytes(data[n_frames * frame_bytes:])
+        return b''.join(out), None
+
+    def flush(self) -> bytes:
+        """
+        客户端结束录音时调用，返回仍需保留的尾部音频并重置状态。
+        语音不足 min_speech_ms 的片段视为噪声，不会返回。
+        """
+        tail = b''
+        if self.in_speech and self._confirmed:
+            tail = b''.join(self._pending_silence[:self.detector.tail_frames])
+        self._reset()
+        self._remainder = b''
+        return tail
+
+    @property
+    def _confirmed(self) -> bool:
+        return self.speech_frames >= self.detector.min_speech_frames
+
+    def _step(self, frame: bytes, is_speech: bool, out: list) -> Optional[str]:
+        detector = self.detector
+        if not self.in_speech:
+            self._pre_roll.append(frame)
+            self._speech_run = self._speech_run + 1 if is_speech else 0
+            if self._speech_run >= detector.start_frames:
+                self.in_speech = True
+                self.speech_frames = self._speech_run
+                self._held = list(self._pre_roll)
+                self._pre_roll.clear()
+                self._release_if_confirmed(out)
+            return None
+
+        if is_speech:
+            sink = out if self._confirmed else self._held
+            sink.extend(self._pending_silence)
+            self._pending_silence.clear()
+            sink.append(frame)
+            self.speech_frames += 1
+            self._release_if_confirmed(out)
+            return None
+
+        self._pending_silence.append(frame)
+        if len(self._pending_silence) < detector.hangover_frames:
+            return None
+
+        # 静音超过挂起时间，本段发言结束；语音太短则整体丢弃
+        event = None
+        if self._confirmed:
+            out.extend(self._pending_silence[:detector.tail_frames])
+            event = VAD_ENDPOINT
+        else:
+            logger.debug("丢弃过短的语音片段: %dms", self.speech_ms)
+        self._reset()
+        return event
+
+    def _release_if_confirmed(self, out: list):
+        if self._held and self._confirmed:
+            out.extend(self._held)
+            self._held = []
+
+    def _reset(self):
+        self._pre_roll.clear()
+        self._speech_run = 0
+        self._pending_silence = []
+        self._held = []
+        self.in_speech = False
+        self.speech_frames = 0
@@ -0,0 +1,161 @@
+"""
+后端调度器 - 限制发往ASR/Ollama/TTS的并发数，多设备之间公平排队，队列过长时拒绝新请求
+"""
+
+import asyncio
+import contextvars
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional
+
+from .metrics import metrics
+
+logger = logging.getLogger("BackendScheduler")
+
+backend_queue_depth = metrics.gauge("backend_queue_depth", "等待后端空闲槽位的请求数", ["backend"])
+backend_in_flight = metrics.gauge("backend_in_flight", "正在占用后端槽位的请求数", ["backend"])
+backend_wait_seconds = metrics.histogram(
+    "backend_wait_seconds", "等待后端空闲槽位的时间", ["backend"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+backend_shed = metrics.counter("backend_shed_total", "因排队过长被拒绝的请求数", ["backend"])
+# 由各后端客户端记录：请求失败（kind: status/timeout/exception/stream）和用兜底结果代替（fallback: silence/apology）
+backend_errors = metrics.counter("backend_errors_total", "后端请求失败次数", ["backend", "kind"])
+backend_fallbacks = metrics.counter("backend_fallbacks_total", "后端失败后返回兜底结果的次数", ["backend", "fallback"])
+
+# 当前请求所属的设备/会话，用于公平排队；在连接的处理任务中设置，子任务自动继承
+_owner: contextvars.ContextVar[str] = contextvars.ContextVar("backend_owner", default="")
+
+
+class BackendBusyError(Exception):
+    """后端排队已满，本次请求被拒绝"""
+
+    def __init__(self, backend: str):
+        super().__init__(f"后端 {backend} 繁忙，排队已满")
+        self.backend = backend
+
+
+@dataclass
+class SchedulerConfig:
+    """单个后端的调度参数"""
+    concurrency: int = 4             # 同时进行的最大请求数
+    max_queue: Optional[int] = None  # 最多排队的请求数，None 表示不限制
+
+
+class _BackendState:
+    def __init__(self, config: SchedulerConfig):
+        self.config = config
+        self.in_flight = 0
+        self.depth = 0
+        # owner -> 该设备排队中的请求；按轮转顺序排列
+        self.waiters: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+
+
+class BackendScheduler:
+    """
+    每个后端一个并发槽位池。槽位不足时请求按设备分组排队，
+    释放槽位时在有排队请求的设备间轮转分配，避免单个设备的连续请求占满后端。
+    """
+
+    def __init__(self):
+        self._configs: Dict[str, SchedulerConfig] = {}
+        self._states: Dict[str, _BackendState] = {}
+
+    def configure(self, backend: str, **kwargs):
+        """设置后端的调度参数，只更新传入的字段"""
+        config = self._configs.setdefault(backend, SchedulerConfig())
+        for name, value in kwargs.items():
+            setattr(config, name, value)
+        state = self._states.get(backend)
+        if state:
+            self._grant_next(backend, state)
+
+    @staticmethod
+    def set_owner(owner: str):
+        """标记当前上下文（及之后创建的子任务）的请求归属"""
+        _owner.set(owner)
+
+    @asynccontextmanager
+    async def slot(self, backend: str):
+        """占用后端的一个槽位；排队已满时抛出 BackendBusyError"""
+        await self.acquire(backend)
+        try:
+            yield
+        finally:
+            self.release(backend)
+
+    async def acquire(self, backend: str):
+        state = self._state(backend)
+        config = state.config
+        if state.in_flight < config.concurrency and not state.depth:
+            state.in_flight += 1
+            backend_wait_seconds.observe(0.0, backend=backend)
+            return
+
+        if config.max_queue is not None and state.depth >= config.max_queue:
+            backend_shed.inc(backend=backend)
+            raise BackendBusyError(backend)
+
+        owner = _owner.get()
+        future = asyncio.get_running_loop().create_future()
+        state.waiters.setdefault(owner, deque()).append(future)
+        state.depth += 1
+        start = time.monotonic()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                self._remove_waiter(state, owner, future)
+            else:
+                # 槽位已分配但调用方被取消，直接归还
+                self.release(backend)
+            raise
+        backend_wait_seconds.observe(time.monotonic() - start, backend=backend)
+
+    def release(self, backend: str):
+        state = self._states[backend]
+        state.in_flight -= 1
+        self._grant_next(backend, state)
+
+    def queue_depth(self, backend: str) -> int:
+        state = self._states.get(backend)
+        return state.depth if state else 0
+
+    def _state(self, backend: str) -> _BackendState:
+        state = self._states.get(backend)
+        if state is None:
+            config = self._configs.setdefault(backend, SchedulerConfig())
+            state = self._states[backend] = _BackendState(config)
+            backend_queue_depth.set_function(lambda: state.depth, backend=backend)
+            backend_in_flight.set_function(lambda: state.in_flight, backend=backend)
+        return state
+
+    def _grant_next(self, backend: str, state: _BackendState):
+        while state.depth and state.in_flight < state.config.concurrency:
+            owner, queue = next(iter(state.waiters.items()))
+            future = queue.popleft()
+            state.depth -= 1
+            if queue:
+                # 该设备还有请求，排到其他设备之后
+                state.waiters.move_to_end(owner)
+            else:
+                del state.waiters[owner]
+            if future.done():
+                continue
+            future.set_result(None)
+            state.in_flight += 1
+
+    @staticmethod
+    def _remove_waiter(state: _BackendState, owner: str, future: asyncio.Future):
+        queue = state.waiters.get(owner)
+        if queue and future in queue:
+            queue.remove(future)
+            state.depth -= 1
+            if not queue:
+                del state.waiters[owner]
+
+
+# 进程级默认调度器
+backend_scheduler = BackendScheduler()
@@ -0,0 +1,174 @@
+"""
+进程级HTTP客户端注册表 - 各后端（ASR/Ollama/TTS）共享长连接池
+"""
+
+import asyncio
+import contextvars
+import importlib
+import logging
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Optional
+
+from .metrics import metrics
+
+if TYPE_CHECKING:
+    import aiohttp
+    import httpx
+
+logger = logging.getLogger("HTTPClients")
+
+http_requests = metrics.counter(
+    "http_client_requests_total", "发往后端的HTTP请求数", ["backend"])
+http_connections_created = metrics.counter(
+    "http_client_connections_created_total", "新建的后端TCP连接数", ["backend"])
+turn_connection_reuse = metrics.histogram(
+    "turn_http_connection_reuse_ratio", "每轮对话中复用已有连接的请求占比",
+    buckets=(0.0, 0.25, 0.5, 0.75, 0.9, 1.0))
+
+
+@dataclass
+class BackendConfig:
+    """单个后端的连接池配置"""
+    limit: int = 16                 # 最大连接数
+    keepalive_timeout: float = 60.0 # 空闲连接保活时间（秒）
+    timeout: float = 30.0           # 单次请求总超时（秒）
+    connect_timeout: float = 5.0    # 建立连接超时（秒）
+
+
+@dataclass
+class TurnConnectionStats:
+    """单轮对话内的HTTP连接统计"""
+    requests: int = 0
+    connections_created: int = 0
+
+    @property
+    def reused(self) -> int:
+        return max(0, self.requests - self.connections_created)
+
+
+_turn_stats: contextvars.ContextVar[Optional[TurnConnectionStats]] = contextvars.ContextVar(
+    "turn_connection_stats", default=None)
+
+
+def _record_request(backend: str):
+    http_requests.inc(backend=backend)
+    stats = _turn_stats.get()
+    if stats:
+        stats.requests += 1
+
+
+def _record_connection(backend: str):
+    http_connections_created.inc(backend=backend)
+    stats = _turn_stats.get()
+    if stats:
+        stats.connections_created += 1
+
+
+class HTTPClientRegistry:
+    """按后端名惰性创建并缓存 aiohttp / httpx 客户端，统一在退出时关闭"""
+
+    def __init__(self):
+        self._configs: Dict[str, BackendConfig] = {}
+        self._aiohttp: Dict[str, "aiohttp.ClientSession"] = {}
+        self._httpx: Dict[str, "httpx.AsyncClient"] = {}
+
+    def configure(self, backend: str, **kwargs):
+        """设置后端的连接池参数，需在首次使用前调用"""
+        self._configs[backend] = BackendConfig(**kwargs)
+
+    def get_config(self, backend: str) -> BackendConfig:
+        return self._configs.setdefault(backend, BackendConfig())
+
+    def aiohttp_session(self, backend: str) -> "aiohttp.ClientSession":
+        """获取后端共享的 aiohttp 会话，必须在事件循环中调用"""
+        session = self._aiohttp.get(backend)
+        if session is None or session.closed:
+            import aiohttp
+            config = self.get_config(backend)
+            trace_config = aiohttp.TraceConfig()
+
+            async def on_request_start(session, ctx, params):
+                _record_request(backend)
+
+            async def on_connection_create_end(session, ctx, params):
+                _record_connection(backend)
+
+            trace_config.on_request_start.append(on_request_start)
+            trace_config.on_connection_create_end.append(on_connection_create_end)
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=config.limit, keepalive_timeout=config.keepalive_timeout),
+                timeout=aiohttp.ClientTimeout(total=config.timeout, connect=config.connect_timeout),
+                trace_configs=[trace_config]
+            )
+            self._aiohttp[backend] = session
+        return session
+
+    def httpx_client(self, backend: str) -> "httpx.AsyncClient":
+        """获取后端共享的 httpx 客户端"""
+        client = self._httpx.get(backend)
+        if client is None or client.is_closed:
+            import httpx
+            config = self.get_config(backend)
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=config.limit,
+                    max_keepalive_connections=config.limit,
+                    keepalive_expiry=config.keepalive_timeout
+                ),
+                timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout)
+            )
+            self._httpx[backend] = client
+        return client
+
+    async def prewarm(self):
+        """在线程中预先导入 aiohttp / httpx（首次导入约数百毫秒），避免第一个请求时阻塞事件循环"""
+        await asyncio.gather(
+            asyncio.to_thread(importlib.import_module, "aiohttp"),
+            asyncio.to_thread(importlib.import_module, "httpx"),
+        )
+
+    def httpx_extensions(self, backend: str) -> dict:
+        """httpx 请求的 trace 扩展，用于统计请求数与新建连接数"""
+        _record_request(backend)
+
+        async def trace(event_name: str, info: dict):
+            if event_name == "connection.connect_tcp.complete":
+                _record_connection(backend)
+
+        return {"trace": trace}
+
+    async def close(self, backend: str):
+        """关闭单个后端的客户端"""
+        session = self._aiohttp.pop(backend, None)
+        if session and not session.closed:
+            await session.close()
+        client = self._httpx.pop(backend, None)
+        if client and not client.is_closed:
+            await client.aclose()
+
+    async def close_all(self):
+        """关闭全部客户端，服务退出时调用"""
+        for backend in set(self._aiohttp) | set(self._httpx):
+            try:
+                await self.close(backend)
+            except Exception as e:
+                logger.warning(f"关闭 {backend} 的HTTP客户端失败: {e}")
+        logger.info("HTTP客户端已全部关闭")
+
+    @staticmethod
+    def begin_turn() -> contextvars.Token:
+        """在当前上下文开始统计一轮对话的连接复用情况"""
+        return _turn_stats.set(TurnConnectionStats())
+
+    @staticmethod
+    def end_turn(token: contextvars.Token) -> TurnConnectionStats:
+        """结束本轮统计，记录复用率并返回统计结果"""
+        stats = _turn_stats.get() or TurnConnectionStats()
+        _turn_stats.reset(token)
+        if stats.requests:
+            turn_connection_reuse.observe(stats.reused / stats.requests)
+        return stats
+
+
+# 进程级默认注册表
+http_clients = HTTPClientRegistry()
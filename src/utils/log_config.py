@@ -0,0 +1,198 @@
+"""
+日志配置 - 日志记录先放入内存队列，由后台线程格式化和写出，事件循环线程不做格式化和I/O。
+支持结构化JSON输出（带会话/设备字段）和按类别限频的高频日志（如逐帧发送）
+"""
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .metrics import metrics
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+log_records_dropped = metrics.counter("log_records_dropped_total", "日志队列已满时丢弃的记录数")
+log_records_sampled_out = metrics.counter("log_records_sampled_out_total", "因限频未输出的日志数", ["category"])
+
+# 当前连接的日志字段（session、mac 等），由连接处理任务设置，子任务继承同一个字典
+_context: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("log_context", default=None)
+
+# 整个进程共用的日志字段（如多进程模式下的 worker 序号）
+_static: Dict[str, Any] = {}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.Handler] = None
+
+
+def set_static_fields(**fields):
+    """设置本进程所有日志记录都带上的字段"""
+    _static.update(fields)
+
+
+def bind_context(**fields) -> Dict[str, Any]:
+    """为当前任务（及之后创建的子任务）设置新的日志字段"""
+    context = dict(fields)
+    _context.set(context)
+    return context
+
+
+def update_context(**fields):
+    """更新当前日志字段；已继承同一字典的子任务也能看到（如注册后补上 mac）"""
+    context = _context.get()
+    if context is not None:
+        context.update(fields)
+
+
+class ContextFilter(logging.Filter):
+    """在调用线程中把当前日志字段复制到记录上（放入队列后就拿不到调用方的上下文了）"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _context.get()
+        if context or _static:
+            record.context = {**_static, **(context or {})}
+        else:
+            record.context = None
+        return True
+
+
+class RateSampler(logging.Filter):
+    """
+    按类别限频：带 extra={"category": ...} 且该类别配置了速率的记录，每秒最多输出 rate 条，
+    其余丢弃并计数，下一条输出的记录带上 suppressed（期间被丢弃的条数）
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = dict(rates)
+        self._buckets: Dict[str, list] = {}  # 类别 -> [令牌数, 上次补充时刻, 被丢弃数]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        category = getattr(record, "category", None)
+        rate = self.rates.get(category) if category else None
+        if not rate:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(category)
+            if bucket is None:
+                bucket = self._buckets[category] = [rate, now, 0]
+            bucket[0] = min(rate, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if bucket[0] < 1.0:
+                bucket[2] += 1
+                log_records_sampled_out.inc(category=category)
+                return False
+            bucket[0] -= 1.0
+            record.suppressed, bucket[2] = bucket[2], 0
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    放入有界队列，队列满时丢弃而不是阻塞事件循环。
+    不在调用线程格式化：消息的 % 参数和异常堆栈留给后台线程处理
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return copy.copy(record)
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_dropped.inc()
+
+
+class TextFormatter(logging.Formatter):
+    """文本格式，有日志字段时追加在消息后"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        extras = dict(getattr(record, "context", None) or {})
+        if getattr(record, "suppressed", 0):
+            extras["suppressed"] = record.suppressed
+        if extras:
+            text += " [" + " ".join(f"{k}={v}" for k, v in extras.items()) + "]"
+        return text
+
+
+class JsonFormatter(logging.Formatter):
+    """每条记录一行JSON：ts、level、logger、msg，加上日志字段和异常堆栈"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        context = getattr(record, "context", None)
+        if context:
+            entry.update(context)
+        category = getattr(record, "category", None)
+        if category:
+            entry["category"] = category
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(level: int = logging.INFO, json_format: bool = False,
+                  sample_rates: Optional[Dict[str, float]] = None, queue_size: int = 10000):
+    """
+    替换根日志的处理器：调用方只把记录放入队列，格式化和写出在后台线程完成
+
+    Args:
+        level: 根日志级别
+        json_format: True 时每条记录输出一行JSON，否则为文本格式
+        sample_rates: 各类别每秒最多输出的条数，如 {"audio_chunk": 2}
+        queue_size: 队列上限，超出时丢弃并计入 log_records_dropped_total
+    """
+    global _listener, _queue_handler
+    stop_logging()
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if json_format else TextFormatter(TEXT_FORMAT))
+
+    handler = NonBlockingQueueHandler(queue.Queue(queue_size))
+    handler.addFilter(ContextFilter())
+    if sample_rates:
+        handler.addFilter(RateSampler(sample_rates))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _queue_handler = handler
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """写出队列中剩余的记录并停止后台线程，之后的日志直接同步输出（如解释器退出时的日志）"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        root = logging.getLogger()
+        root.removeHandler(_queue_handler)
+        _listener.stop()
+        for output in _listener.handlers:
+            root.addHandler(output)
+        _listener = None
+        _queue_handler = None
+
+
+# 进程退出时写完队列中的日志
+atexit.register(stop_logging)
@@ -0,0 +1,110 @@
+"""
+事件循环延迟监控 - 定期 sleep 固定间隔，实际醒来时间超出的部分即为事件循环被阻塞的时长。
+可选的看门狗线程在事件循环仍被阻塞时抓取事件循环线程的调用栈，定位同步阻塞调用
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from .metrics import metrics
+
+logger = logging.getLogger("LoopMonitor")
+
+loop_lag_seconds = metrics.histogram(
+    "event_loop_lag_seconds", "事件循环调度延迟（定时器实际触发时间与预期的差）",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+loop_lag_last = metrics.gauge("event_loop_lag_last_seconds", "最近一次测得的事件循环延迟")
+loop_blocked = metrics.counter("event_loop_blocked_total", "看门狗检测到事件循环阻塞超过阈值的次数")
+
+
+class LoopLagMonitor:
+    """在事件循环中运行的延迟采样任务，可选附带看门狗线程"""
+
+    def __init__(self, interval: float = 0.5, warn_threshold: float = 0.5,
+                 block_threshold: Optional[float] = None):
+        """
+        Args:
+            interval: 采样间隔（秒）
+            warn_threshold: 延迟超过该秒数时输出警告日志
+            block_threshold: 事件循环阻塞超过该秒数时由看门狗线程记录调用栈，为空时不启动看门狗
+        """
+        # 启用看门狗时采样间隔不大于阻塞阈值，否则采样任务睡眠期间开始的阻塞可能在预计醒来前就结束而漏报
+        self.interval = min(interval, block_threshold) if block_threshold else interval
+        self.warn_threshold = warn_threshold
+        self.block_threshold = block_threshold
+        self._task: Optional[asyncio.Task] = None
+        # 采样任务预计醒来的时刻（time.monotonic），看门狗线程据此判断事件循环是否卡住
+        self._deadline: Optional[float] = None
+        self._stalled = False  # 本次阻塞已报告过，恢复前不重复抓栈
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._loop_thread_id = threading.get_ident()
+            self._task = asyncio.create_task(self._run())
+        if self.block_threshold and self._watchdog is None:
+            self._stop_event.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+            logger.info(f"事件循环看门狗已启动，阻塞阈值 {self.block_threshold * 1000:.0f} ms")
+
+    async def stop(self):
+        if self._watchdog:
+            self._stop_event.set()
+            self._watchdog.join(timeout=1.0)
+            self._watchdog = None
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            self._deadline = expected
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - expected)
+            loop_lag_seconds.observe(lag)
+            loop_lag_last.set(lag)
+            if self._stalled:
+                self._stalled = False
+                logger.warning(f"事件循环已恢复，本次阻塞约 {lag * 1000:.0f} ms")
+            elif lag >= self.warn_threshold:
+                logger.warning(f"事件循环被阻塞约 {lag * 1000:.0f} ms")
+
+    def _watch(self):
+        """看门狗线程：采样任务超过预计醒来时刻 block_threshold 仍未运行时，抓取事件循环线程的调用栈"""
+        check_interval = max(self.block_threshold / 2, 0.01)
+        while not self._stop_event.wait(check_interval):
+            deadline = self._deadline
+            if deadline is None or self._stalled:
+                continue
+            blocked = time.monotonic() - deadline
+            if blocked < self.block_threshold:
+                continue
+            self._stalled = True
+            loop_blocked.inc()
+            try:
+                self._report_stack(blocked)
+            except Exception as e:
+                logger.error(f"抓取事件循环调用栈失败: {e}")
+
+    def _report_stack(self, blocked: float):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame else "（无法获取调用栈）\n"
+        task = asyncio.current_task(self._loop)
+        task_desc = f"{task.get_name()} {task.get_coro()!r}" if task else "无（非协程回调）"
+        logger.warning(f"事件循环已阻塞 {blocked * 1000:.0f} ms，当前任务: {task_desc}\n"
+                       f"事件循环线程调用栈:\n{stack.rstrip()}")
@@ -0,0 +1,259 @@
+"""
+轻量级进程内指标：计数器、仪表和直方图
+"""
+
+import bisect
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# 默认直方图分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[Tuple[Tuple[str, ...], float]]:
+        with self._lock:
+            return list(self._values.items())
+
+
+class Gauge(_Metric):
+    """可增可减的仪表，也可以绑定一个取值函数"""
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn: Callable[[], float], **labels):
+        """采集时调用 fn 取值"""
+        with self._lock:
+            self._functions[self._key(labels)] = fn
+
+    def get(self, **labels) -> float:
+        key = self._key(labels)
+        fn = self._functions.get(key)
+        return float(fn()) if fn else self._values.get(key, 0.0)
+
+    def samples(self) -> List[Tuple[Tuple[str, ...], float]]:
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, fn in functions.items():
+            try:
+                values[key] = float(fn())
+            except Exception:
+                continue
+        return list(values.items())
+
+
+class Histogram(_Metric):
+    """分桶直方图"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [各桶计数..., +Inf计数], 总和
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+
+    def count(self, **labels) -> int:
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """按桶上界粗略估计分位数，没有样本时返回 None"""
+        counts = self._counts.get(self._key(labels))
+        if not counts:
+            return None
+        total = sum(counts)
+        rank = q * total
+        seen = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def samples(self) -> List[Tuple[Tuple[str, ...], List[int], float]]:
+        with self._lock:
+            return [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+
+
+class MetricsRegistry:
+    """指标注册表，同名指标只创建一次"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, help_text: str, labelnames: Iterable[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"指标 {name} 已注册为 {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def collect(self) -> List[_Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render_text(self) -> str:
+        """按 Prometheus 文本格式（0.0.4）输出全部指标"""
+        lines = []
+        for metric in sorted(self.collect(), key=lambda m: m.name):
+            lines.append(f"# HELP {metric.name} {_escape_help(metric.help)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if isinstance(metric, Histogram):
+                for key, counts, total in metric.samples():
+                    cumulative = 0
+                    for bound, n in zip(metric.buckets + (float("inf"),), counts):
+                        cumulative += n
+                        labels = _format_labels(metric.labelnames + ("le",), key + (_format_value(bound),))
+                        lines.append(f"{metric.name}_bucket{labels} {cumulative}")
+                    labels = _format_labels(metric.labelnames, key)
+                    lines.append(f"{metric.name}_sum{labels} {_format_value(total)}")
+                    lines.append(f"{metric.name}_count{labels} {cumulative}")
+            else:
+                for key, value in metric.samples():
+                    lines.append(f"{metric.name}{_format_labels(metric.labelnames, key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def merge_text(sources: Dict[str, str], label: str = "worker") -> str:
+    """
+    合并多个进程输出的文本格式指标：每个指标族只保留一组 HELP/TYPE，
+    样本加上 label="来源名" 区分进程（如 sum by 去掉该标签即为全部进程的合计）
+
+    Args:
+        sources: 来源名 -> render_text() 的输出
+        label: 标记来源的标签名
+    """
+    families: Dict[str, Dict[str, Any]] = {}
+    for source, text in sources.items():
+        family = None
+        injected = f'{label}="{_escape_label(source)}"'
+        for line in text.splitlines():
+            if not line:
+                continue
+            if line.startswith("# "):
+                parts = line.split(" ", 3)
+                if len(parts) < 3 or parts[1] not in ("HELP", "TYPE"):
+                    continue
+                family = families.setdefault(parts[2], {"HELP": None, "TYPE": None, "samples": []})
+                if family[parts[1]] is None:
+                    family[parts[1]] = line
+                continue
+            if family is None:
+                family = families.setdefault(line.split("{", 1)[0].split(" ", 1)[0],
+                                             {"HELP": None, "TYPE": None, "samples": []})
+            name_end = min(i for i in (line.find("{"), line.find(" ")) if i >= 0)
+            if line[name_end] == "{":
+                sample = f"{line[:name_end]}{{{injected},{line[name_end + 1:]}"
+            else:
+                sample = f"{line[:name_end]}{{{injected}}}{line[name_end:]}"
+            family["samples"].append(sample)
+
+    lines = []
+    for name in sorted(families):
+        family = families[name]
+        lines.extend(line for line in (family["HELP"], family["TYPE"]) if line)
+        lines.extend(family["samples"])
+    return "\n".join(lines) + "\n"
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if value == float("-inf"):
+        return "-Inf"
+    if value != value:
+        return "NaN"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        pairs.append(f'{name}="{_escape_label(value)}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+# 进程级默认注册表
+metrics = MetricsRegistry()
@@ -0,0 +1,56 @@
+"""
+启动耗时统计 - 按阶段记录服务启动各步骤的耗时，启动完成后输出类似 -X importtime 的分解表
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Awaitable, List, Optional, Tuple, TypeVar
+
+logger = logging.getLogger("Startup")
+
+T = TypeVar("T")
+
+
+class StartupProfile:
+    """记录每个阶段的开始时刻（相对进程启动计时起点）和耗时；阶段之间可以并发"""
+
+    def __init__(self):
+        self._t0 = time.perf_counter()
+        self.phases: List[Tuple[str, float, float, Optional[str]]] = []  # (名称, 开始ms, 耗时ms, 错误)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000.0
+
+    @contextmanager
+    def phase(self, name: str):
+        """同步或异步代码块都可用：with profile.phase("import"): ..."""
+        start = self.elapsed_ms()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self.phases.append((name, start, self.elapsed_ms() - start, error))
+
+    async def run(self, name: str, coro: Awaitable[T]) -> Optional[T]:
+        """执行一个后台预热步骤并计时；失败只记录日志，不影响其他步骤"""
+        try:
+            with self.phase(name):
+                return await coro
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"启动阶段 {name} 失败: {e}")
+            return None
+
+    def report(self, title: str = "启动耗时"):
+        """输出各阶段耗时，按开始时刻排序"""
+        lines = [f"{title}（总计 {self.elapsed_ms():.1f} ms）:", f"  {'开始ms':>9} | {'耗时ms':>9} | 阶段"]
+        for name, start, duration, error in sorted(self.phases, key=lambda p: p[1]):
+            suffix = f"  [失败: {error}]" if error else ""
+            lines.append(f"  {start:9.1f} | {duration:9.1f} | {name}{suffix}")
+        logger.info("\n".join(lines))
@@ -0,0 +1,239 @@
+"""
+多进程模式 - 主进程启动 N 个工作进程，各自以 SO_REUSEPORT 监听同一端口，由内核在进程间分配连接。
+每个工作进程有独立的事件循环、数据库连接池和HTTP客户端；主进程只负责：
+- 工作进程异常退出后重启（连续崩溃时退避）；
+- 收到 SIGHUP 时逐个滚动重启：新进程就绪后旧进程才退出，端口始终有进程在监听；
+- 管理端口汇总各工作进程的指标。
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import signal
+import time
+from typing import Callable, Dict, List, Optional
+
+from .metrics import metrics, merge_text
+from .http_clients import http_clients
+
+logger = logging.getLogger("Supervisor")
+
+worker_restarts = metrics.counter("supervisor_worker_restarts_total", "工作进程重启次数", ["reason"])
+workers_running = metrics.gauge("supervisor_workers", "工作进程数", ["state"])
+
+# 崩溃重启的退避（秒）：启动后很快又退出时等待时间翻倍
+RESTART_BACKOFF_MIN = 1.0
+RESTART_BACKOFF_MAX = 30.0
+# 运行超过该秒数后再退出不算连续崩溃
+CRASH_WINDOW = 30.0
+
+
+class WorkerHandle:
+    """传给工作进程的句柄：序号、槽位、就绪事件和管理端口（进程间共享）"""
+
+    def __init__(self, ctx, worker_id: int, slot: int):
+        self.worker_id = worker_id  # 每次启动递增
+        self.slot = slot  # 重启后不变，用作指标和日志中的 worker 标签
+        self.ready = ctx.Event()
+        self.admin_port = ctx.Value("i", 0)
+
+    def set_admin_port(self, port: int):
+        self.admin_port.value = port
+
+    def set_ready(self):
+        self.ready.set()
+
+
+def _worker_entry(target: Callable[[WorkerHandle], None], handle: WorkerHandle):
+    # 终端的 Ctrl-C 会发给整个进程组，由主进程统一协调退出
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    target(handle)
+
+
+class _Worker:
+    def __init__(self, process, handle: WorkerHandle):
+        self.process = process
+        self.handle = handle
+        self.started = time.monotonic()
+
+
+class Supervisor:
+    """工作进程管理器"""
+
+    def __init__(self, target: Callable[[WorkerHandle], None], workers: int,
+                 ready_timeout: float = 120.0, stop_timeout: float = 45.0,
+                 admin_host: Optional[str] = None, admin_port: Optional[int] = None):
+        """
+        Args:
+            target: 工作进程入口（模块级函数），参数为 WorkerHandle，需在就绪后调用 handle.set_ready()
+            workers: 工作进程数
+            ready_timeout: 等待新工作进程就绪的最长秒数
+            stop_timeout: 等待工作进程优雅退出的最长秒数，超时后强制结束
+            admin_host / admin_port: 汇总指标的管理端地址，port 为空时不启动
+        """
+        self.target = target
+        self.workers = workers
+        self.ready_timeout = ready_timeout
+        self.stop_timeout = stop_timeout
+        self.admin_host = admin_host
+        self.admin_port = admin_port
+        # spawn：子进程从头导入，不继承主进程的事件循环和日志线程
+        self._ctx = multiprocessing.get_context("spawn")
+        self._slots: List[Optional[_Worker]] = [None] * workers
+        self._backoff: List[float] = [0.0] * workers
+        self._next_id = 0
+        self._restarting = False
+        self._stopping = False
+
+        workers_running.set_function(lambda: sum(1 for w in self._slots if w and w.process.is_alive()),
+                                     state="alive")
+        workers_running.set_function(lambda: sum(1 for w in self._slots if w and w.handle.ready.is_set()),
+                                     state="ready")
+
+    async def run(self):
+        """启动全部工作进程并监控，直到收到 SIGTERM / SIGINT"""
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.ensure_future(self.rolling_restart()))
+
+        admin_server = None
+        try:
+            for slot in range(self.workers):
+                self._slots[slot] = self._spawn(slot)
+            logger.info("已启动 %d 个工作进程，发送 SIGHUP 滚动重启", self.workers)
+            if self.admin_port:
+                from ..network.admin_server import AdminServer
+                http_clients.configure("workers", limit=self.workers * 2, timeout=5.0, connect_timeout=1.0)
+                admin_server = AdminServer(self.admin_host, self.admin_port, ready=self.is_ready,
+                                           metrics_source=self.collect_metrics, stages_source=self.collect_stages)
+                await admin_server.start()
+
+            while not stop.is_set():
+                try:
+                    await asyncio.wait_for(stop.wait(), 1.0)
+                except asyncio.TimeoutError:
+                    await self._reap()
+        finally:
+            self._stopping = True
+            logger.info("正在停止全部工作进程")
+            await asyncio.gather(*(self._stop(w) for w in self._slots if w))
+            if admin_server:
+                await admin_server.stop()
+            await http_clients.close_all()
+
+    def is_ready(self) -> bool:
+        """至少一个工作进程就绪即可接收设备"""
+        return any(w and w.handle.ready.is_set() for w in self._slots)
+
+    async def rolling_restart(self):
+        """逐个替换工作进程：新进程就绪后旧进程才开始优雅退出；新进程未能就绪时保留旧进程并中止"""
+        if self._restarting or self._stopping:
+            logger.warning("滚动重启已在进行或正在退出，忽略")
+            return
+        self._restarting = True
+        logger.info("开始滚动重启 %d 个工作进程", self.workers)
+        try:
+            for slot, old in enumerate(self._slots):
+                new = self._spawn(slot)
+                if not await self._wait_ready(new):
+                    logger.error("新工作进程 %d 未能在 %.0f 秒内就绪，中止滚动重启",
+                                 new.handle.worker_id, self.ready_timeout)
+                    await self._stop(new)
+                    return
+                self._slots[slot] = new
+                worker_restarts.inc(reason="rolling")
+                if old:
+                    await self._stop(old)
+            logger.info("滚动重启完成")
+        finally:
+            self._restarting = False
+
+    async def collect_metrics(self) -> str:
+        """抓取各工作进程的指标并加上 worker（槽位）标签合并，主进程自身的指标标记为 supervisor"""
+        sources = {"supervisor": metrics.render_text()}
+        live = self._live()
+        results = await asyncio.gather(*(self._fetch(w, "/metrics") for w in live))
+        for worker, text in zip(live, results):
+            if text is not None:
+                sources[str(worker.handle.slot)] = text
+        return merge_text(sources, label="worker")
+
+    async def collect_stages(self) -> Dict[str, dict]:
+        """各工作进程的轮次阶段耗时分位数，按槽位分组"""
+        live = self._live()
+        results = await asyncio.gather(*(self._fetch(w, "/stages") for w in live))
+        return {str(w.handle.slot): json.loads(text) for w, text in zip(live, results) if text}
+
+    def _live(self) -> List[_Worker]:
+        return [w for w in self._slots if w and w.handle.admin_port.value]
+
+    async def _fetch(self, worker: _Worker, path: str) -> Optional[str]:
+        url = f"http://127.0.0.1:{worker.handle.admin_port.value}{path}"
+        try:
+            async with http_clients.aiohttp_session("workers").get(url) as response:
+                if response.status == 200:
+                    return await response.text()
+                logger.warning("抓取工作进程 %d 指标失败: %d", worker.handle.worker_id, response.status)
+        except Exception as e:
+            logger.warning("抓取工作进程 %d 指标异常: %s", worker.handle.worker_id, e)
+        return None
+
+    def _spawn(self, slot: int) -> _Worker:
+        handle = WorkerHandle(self._ctx, self._next_id, slot)
+        self._next_id += 1
+        process = self._ctx.Process(target=_worker_entry, args=(self.target, handle),
+                                    name=f"worker-{handle.worker_id}", daemon=False)
+        process.start()
+        logger.info("工作进程 %d 已启动，pid %d", handle.worker_id, process.pid)
+        return _Worker(process, handle)
+
+    async def _wait_ready(self, worker: _Worker) -> bool:
+        deadline = time.monotonic() + self.ready_timeout
+        while time.monotonic() < deadline:
+            if worker.handle.ready.is_set():
+                return True
+            if not worker.process.is_alive():
+                return False
+            await asyncio.sleep(0.2)
+        return False
+
+    async def _stop(self, worker: _Worker):
+        """SIGTERM 让工作进程优雅退出，超时后强制结束"""
+        process = worker.process
+        if process.is_alive():
+            process.terminate()
+            await asyncio.to_thread(process.join, self.stop_timeout)
+            if process.is_alive():
+                logger.warning("工作进程 %d 未在 %.0f 秒内退出，强制结束", worker.handle.worker_id, self.stop_timeout)
+                process.kill()
+                await asyncio.to_thread(process.join)
+        logger.info("工作进程 %d 已退出，退出码 %s", worker.handle.worker_id, process.exitcode)
+
+    async def _reap(self):
+        """重启异常退出的工作进程；滚动重启期间由 rolling_restart 负责替换"""
+        if self._stopping:
+            return
+        for slot, worker in enumerate(self._slots):
+            if worker is None or worker.process.is_alive():
+                continue
+            uptime = time.monotonic() - worker.started
+            if uptime < CRASH_WINDOW:
+                self._backoff[slot] = min(max(self._backoff[slot] * 2, RESTART_BACKOFF_MIN), RESTART_BACKOFF_MAX)
+            else:
+                self._backoff[slot] = 0.0
+            logger.error("工作进程 %d 异常退出（退出码 %s，运行 %.0f 秒），%.0f 秒后重启",
+                         worker.handle.worker_id, worker.process.exitcode, uptime, self._backoff[slot])
+            # 先占住槽位，退避期间不重复处理
+            self._slots[slot] = None
+            asyncio.ensure_future(self._restart_slot(slot, self._backoff[slot]))
+
+    async def _restart_slot(self, slot: int, delay: float):
+        if delay:
+            await asyncio.sleep(delay)
+        if self._stopping or self._slots[slot] is not None:
+            return
+        self._slots[slot] = self._spawn(slot)
+        worker_restarts.inc(reason="crash")
@@ -0,0 +1,71 @@
+"""
+流式文本分句工具 - 将LLM逐token输出切分成适合TTS合成的句子片段
+"""
+
+from typing import List
+
+# 句末标点：遇到即切分
+STRONG_BREAKS = frozenset("。！？!?；;\n…")
+# 句中停顿：片段足够长时才切分，以尽早送出首段音频
+SOFT_BREAKS = frozenset("，,、：:")
+# 紧跟在标点后、应归入前一片段的闭合符号
+CLOSING_CHARS = frozenset("\"'”’）)」』】》")
+
+
+class SentenceSegmenter:
+    """按标点边界增量切分文本"""
+
+    def __init__(self, min_chars: int = 4, soft_break_chars: int = 12, max_chars: int = 80):
+        """
+        Args:
+            min_chars: 片段最少字符数，过短的片段会与后续文本合并
+            soft_break_chars: 片段长度达到该值后，逗号等停顿标点也会触发切分
+            max_chars: 片段最大长度，超过后即使没有标点也强制切分
+        """
+        self.min_chars = min_chars
+        self.soft_break_chars = soft_break_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """追加一段文本，返回已经可以合成的完整片段"""
+        self._buffer += text
+        segments = []
+        start = 0
+        i = 0
+        length = len(self._buffer)
+        while i < length:
+            ch = self._buffer[i]
+            size = i + 1 - start
+            is_break = ch in STRONG_BREAKS or (ch == "." and self._is_sentence_dot(i))
+            if not is_break and ch in SOFT_BREAKS and size >= self.soft_break_chars:
+                is_break = True
+            if not is_break and size >= self.max_chars:
+                is_break = True
+            if is_break:
+                # 把紧随其后的闭合引号/括号和重复标点一起带走
+                end = i + 1
+                while end < length and (self._buffer[end] in CLOSING_CHARS or self._buffer[end] in STRONG_BREAKS):
+                    end += 1
+                segment = self._buffer[start:end].strip()
+                if len(segment) >= self.min_chars:
+                    segments.append(segment)
+                    start = end
+                i = end
+                continue
+            i += 1
+        self._buffer = self._buffer[start:]
+        return segments
+
+    def flush(self) -> str:
+        """返回缓冲区中剩余的文本并清空"""
+        rest = self._buffer.strip()
+        self._buffer = ""
+        return rest
+
+    def _is_sentence_dot(self, index: int) -> bool:
+        """英文句号：后面是空白时才算句末，避免切开小数和缩写"""
+        nxt = index + 1
+        if nxt >= len(self._buffer):
+            return False
+        return self._buffer[nxt].isspace()
@@ -0,0 +1,148 @@
+"""
+对话轮次追踪 - 每段发言一个trace，记录ASR、工作流、LLM、TTS、发送各阶段的耗时，
+结束时输出一行结构化日志，并把各阶段耗时写入直方图（可查询 p50/p95/p99）
+"""
+
+import contextvars
+import json
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from .metrics import metrics
+
+logger = logging.getLogger("TurnTrace")
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 30.0)
+
+turn_stage_seconds = metrics.histogram(
+    "turn_stage_seconds", "对话轮次各阶段耗时", ["stage"], buckets=STAGE_BUCKETS)
+turn_total_seconds = metrics.histogram(
+    "turn_total_seconds", "对话轮次从发言结束到处理完成的总耗时", ["status"], buckets=STAGE_BUCKETS)
+
+# 轮次结束状态
+STATUS_OK = "ok"
+STATUS_CANCELLED = "cancelled"
+STATUS_DROPPED = "dropped"
+STATUS_BUSY = "busy"
+STATUS_ERROR = "error"
+
+# 每完成多少个trace输出一次各阶段分位数汇总，0 表示不输出
+SUMMARY_EVERY = 100
+
+_current: contextvars.ContextVar[Optional["TurnTrace"]] = contextvars.ContextVar("turn_trace", default=None)
+_finished = 0
+
+
+class TurnTrace:
+    """一段发言的追踪记录；span 的开始时刻相对于 trace 开始（发言结束）"""
+
+    def __init__(self, session: str = ""):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.session = session
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.finished = False
+
+    def offset(self) -> float:
+        return time.perf_counter() - self.started
+
+    def record(self, name: str, duration: float, start: Optional[float] = None, **attrs):
+        """记录一个已结束的阶段；start 为相对 trace 开始的秒数，默认按现在倒推"""
+        if start is None:
+            start = self.offset() - duration
+        span = {"name": name, "start_ms": round(start * 1000, 1), "duration_ms": round(duration * 1000, 1)}
+        if attrs:
+            span.update(attrs)
+        self.spans.append(span)
+        turn_stage_seconds.observe(duration, stage=name)
+
+    def mark(self, name: str, **attrs):
+        """记录从 trace 开始到现在的时间点（如首个音频发出）"""
+        self.record(name, self.offset(), start=0.0, **attrs)
+
+    def finish(self, status: str = STATUS_OK):
+        """结束追踪：输出结构化日志并记录总耗时，重复调用无效"""
+        global _finished
+        if self.finished:
+            return
+        self.finished = True
+        total = self.offset()
+        turn_total_seconds.observe(total, status=status)
+        logger.info(json.dumps({
+            "trace_id": self.trace_id,
+            "session": self.session,
+            "status": status,
+            "total_ms": round(total * 1000, 1),
+            "spans": self.spans,
+        }, ensure_ascii=False))
+        _finished += 1
+        if SUMMARY_EVERY and _finished % SUMMARY_EVERY == 0:
+            log_summary()
+
+
+def start_trace(session: str = "") -> TurnTrace:
+    """开始一段发言的追踪（不设为当前trace，处理任务中用 activate 设置）"""
+    return TurnTrace(session)
+
+
+def activate(trace: Optional[TurnTrace]) -> contextvars.Token:
+    """把 trace 设为当前上下文的trace，之后创建的子任务自动继承"""
+    return _current.set(trace)
+
+
+def deactivate(token: contextvars.Token):
+    _current.reset(token)
+
+
+def current() -> Optional[TurnTrace]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """记录代码块的耗时到当前trace；没有当前trace时什么都不做"""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = trace.offset()
+    try:
+        yield
+    finally:
+        trace.record(name, trace.offset() - start, start=start, **attrs)
+
+
+def record(name: str, duration: float, **attrs):
+    """向当前trace记录一个已结束的阶段"""
+    trace = _current.get()
+    if trace is not None:
+        trace.record(name, duration, **attrs)
+
+
+def mark(name: str, **attrs):
+    """向当前trace记录从trace开始到现在的时间点"""
+    trace = _current.get()
+    if trace is not None:
+        trace.mark(name, **attrs)
+
+
+def stage_summary(quantiles=(0.5, 0.95, 0.99)) -> Dict[str, Dict[str, Optional[float]]]:
+    """各阶段耗时的分位数（秒，按直方图分桶上界估计）和样本数"""
+    summary = {}
+    for key, counts, _ in turn_stage_seconds.samples():
+        stage = key[0]
+        entry = {f"p{int(q * 100)}": turn_stage_seconds.quantile(q, stage=stage) for q in quantiles}
+        entry["count"] = sum(counts)
+        summary[stage] = entry
+    return summary
+
+
+def log_summary():
+    """输出各阶段的 p50/p95/p99"""
+    lines = ["对话轮次各阶段耗时（秒）:"]
+    for stage, entry in sorted(stage_summary().items()):
+        lines.append(f"  {stage:<24} p50 {entry['p50']}  p95 {entry['p95']}  p99 {entry['p99']}  n={entry['count']}")
+    logger.info("\n".join(lines))
@@ -0,0 +1,178 @@
+"""
+工作流执行器 - 线性图（入口 → ... → 结束）直接按顺序调用节点，
+只有包含条件分支的图才编译为 LangGraph，避免每轮对话的图调度开销
+"""
+
+import logging
+from contextlib import aclosing
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..utils import tracing
+
+logger = logging.getLogger("WorkflowExecutor")
+
+# 与 langgraph.graph.END 的取值一致
+END = "__end__"
+
+Node = Callable[[Any], Awaitable[Any]]
+# 节点的流式版本：逐段产出回复文本，结束时把完整回复写回状态
+StreamNode = Callable[[Any], AsyncIterator[str]]
+
+
+class WorkflowBuilder:
+    """
+    与 StateGraph 相同的建图接口（add_node / set_entry_point / add_edge / add_conditional_edges），
+    compile() 时根据图的形状选择执行方式。节点接收状态对象并返回（修改后的）状态对象。
+    终点节点（边指向 END）可以同时注册流式版本，astream() 执行到它时逐段产出文本。
+    """
+
+    def __init__(self, state_type: type):
+        self.state_type = state_type
+        self.nodes: Dict[str, Node] = {}
+        self.stream_nodes: Dict[str, StreamNode] = {}
+        self.edges: Dict[str, str] = {}
+        self.conditional_edges: Dict[str, Tuple[Callable, Optional[Dict[Any, str]]]] = {}
+        self.entry_point: Optional[str] = None
+
+    def add_node(self, name: str, node: Node, stream: Optional[StreamNode] = None):
+        self.nodes[name] = node
+        if stream is not None:
+            self.stream_nodes[name] = stream
+
+    def set_entry_point(self, name: str):
+        self.entry_point = name
+
+    def add_edge(self, source: str, target: str):
+        self.edges[source] = target
+
+    def add_conditional_edges(self, source: str, path: Callable, path_map: Optional[Dict[Any, str]] = None):
+        self.conditional_edges[source] = (path, path_map)
+
+    def is_linear(self) -> bool:
+        return not self.conditional_edges
+
+    def compile(self, use_langgraph: Optional[bool] = None):
+        """
+        Args:
+            use_langgraph: 为空时自动选择；True 时强制编译为 LangGraph（用于对比测试）
+        """
+        if use_langgraph is None:
+            use_langgraph = not self.is_linear()
+        if use_langgraph:
+            return LangGraphExecutor(self)
+        return LinearExecutor(self)
+
+
+class LinearExecutor:
+    """按边的顺序直接 await 各节点，编译时确定执行顺序；每个节点记录一个 workflow.<节点名> 阶段"""
+
+    def __init__(self, builder: WorkflowBuilder):
+        self.state_type = builder.state_type
+        self.order: List[Tuple[str, Node]] = []
+        seen = set()
+        name = builder.entry_point
+        while name != END:
+            if name not in builder.nodes:
+                raise ValueError(f"工作流节点不存在: {name}")
+            if name in seen:
+                raise ValueError(f"线性工作流出现环: {name}")
+            seen.add(name)
+            self.order.append((name, builder.nodes[name]))
+            name = builder.edges.get(name, END)
+        self.stream_node = builder.stream_nodes.get(self.order[-1][0]) if self.order else None
+
+    async def ainvoke(self, state):
+        for name, node in self.order:
+            with tracing.span(f"workflow.{name}"):
+                state = await node(state)
+        return state
+
+    async def astream(self, state) -> AsyncGenerator[str, None]:
+        """与 ainvoke 相同的执行顺序，终点节点换成其流式版本，逐段产出回复文本"""
+        steps = self.order[:-1] if self.stream_node else self.order
+        for name, node in steps:
+            with tracing.span(f"workflow.{name}"):
+                state = await node(state)
+        if self.stream_node:
+            async for delta in _stream_node(self.order[-1][0], self.stream_node, state):
+                yield delta
+        elif getattr(state, "bot_text", None):
+            yield state.bot_text
+
+
+class LangGraphExecutor:
+    """
+    含条件分支的图交给 LangGraph，只在创建时编译一次。
+    astream() 使用另一份编译结果：有流式版本的终点节点换成只记录到达位置的节点，
+    图执行完后再在图外逐段产出该节点的流式输出。
+    """
+
+    def __init__(self, builder: WorkflowBuilder):
+        self.state_type = builder.state_type
+        self.stream_nodes = {name: stream for name, stream in builder.stream_nodes.items()
+                             if builder.edges.get(name) == END}
+        self.app = self._compile(builder, builder.nodes)
+        if self.stream_nodes:
+            nodes = dict(builder.nodes)
+            for name in self.stream_nodes:
+                nodes[name] = _mark_reached(name)
+            self.stream_app = self._compile(builder, nodes)
+        else:
+            self.stream_app = self.app
+
+    @staticmethod
+    def _compile(builder: WorkflowBuilder, nodes: Dict[str, Node]):
+        # 只有用到时才导入 langgraph
+        from langgraph.graph import StateGraph, END as LANGGRAPH_END
+
+        def target(name: str) -> str:
+            return LANGGRAPH_END if name == END else name
+
+        graph = StateGraph(builder.state_type)
+        for name, node in nodes.items():
+            graph.add_node(name, node)
+        graph.set_entry_point(builder.entry_point)
+        for source, dest in builder.edges.items():
+            graph.add_edge(source, target(dest))
+        for source, (path, path_map) in builder.conditional_edges.items():
+            if path_map is not None:
+                path_map = {key: target(dest) for key, dest in path_map.items()}
+            graph.add_conditional_edges(source, path, path_map)
+        return graph.compile()
+
+    async def ainvoke(self, state):
+        with tracing.span("workflow.graph"):
+            result = await self.app.ainvoke(state)
+        return self._to_state(result)
+
+    async def astream(self, state) -> AsyncGenerator[str, None]:
+        with tracing.span("workflow.graph"):
+            state = self._to_state(await self.stream_app.ainvoke(state))
+        name = getattr(state, "current_node", None)
+        if name in self.stream_nodes:
+            async for delta in _stream_node(name, self.stream_nodes[name], state):
+                yield delta
+        elif getattr(state, "bot_text", None):
+            yield state.bot_text
+
+    def _to_state(self, result):
+        # LangGraph 返回字典，转换回状态对象
+        if isinstance(result, dict):
+            return self.state_type(**result)
+        return result
+
+
+def _mark_reached(name: str) -> Node:
+    """代替流式终点节点：只记录图执行到了这里"""
+    async def node(state):
+        state.current_node = name
+        return state
+    return node
+
+
+async def _stream_node(name: str, stream: StreamNode, state) -> AsyncGenerator[str, None]:
+    # 调用方提前关闭（如本轮被取消）时立即关闭节点的生成器，释放上游的流式请求
+    with tracing.span(f"workflow.{name}"):
+        async with aclosing(stream(state)) as deltas:
+            async for delta in deltas:
+                yield delta
@@ -1,41 +1,57 @@
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-from langgraph.graph import StateGraph, END
-from workflow.nodes.chat_node import chat_node
-from workflow.nodes.entry_node import entry_node
-from workflow.state import WorkflowState
+from contextlib import aclosing
+from typing import AsyncGenerator, Optional
+from .executor import WorkflowBuilder, END
+from .nodes.chat_node import chat_node, chat_node_stream, llm_client
+from .nodes.entry_node import entry_node
+from .state import WorkflowState
 
 # 创建简化的工作流图
-workflow = StateGraph(WorkflowState)
+workflow = WorkflowBuilder(WorkflowState)
 
 # 添加节点
 workflow.add_node("entry", entry_node)
-workflow.add_node("chat", chat_node)
+workflow.add_node("chat", chat_node, stream=chat_node_stream)
 
 # 设置入口点和简单流程
 workflow.set_entry_point("entry")
 workflow.add_edge("entry", "chat")
 workflow.add_edge("chat", END)
 
-# 编译工作流
+# 编译工作流：线性图直接顺序调用节点，有条件分支时才使用 LangGraph
 app = workflow.compile()
 
-async def run_workflow(user_text: str, session_id: str = None, device_info: dict = None) -> WorkflowState:
+async def run_workflow(user_text: str, session_id: str = None, device_info: dict = None,
+                       history: Optional[list] = None, memory_summary: Optional[str] = None) -> WorkflowState:
     """运行工作流"""
     # 初始化状态
     state = WorkflowState(
         user_text=user_text,
         session_id=session_id,
-        device_info=device_info
+        device_info=device_info,
+        history=history,
+        memory_summary=memory_summary
     )
     
     # 运行工作流
-    result_dict = await app.ainvoke(state)
-    
-    # 如果结果是字典，转换为WorkflowState对象
-    if isinstance(result_dict, dict):
-        return WorkflowState(**result_dict)
+    return await app.ainvoke(state)
+
+
+async def run_workflow_stream(user_text: str, session_id: str = None, device_info: dict = None,
+                              history: Optional[list] = None, memory_summary: Optional[str] = None) -> AsyncGenerator[str, None]:
+    """流式运行工作流：与 run_workflow 执行同一张图，终点的聊天节点逐段产出回复文本"""
+    state = WorkflowState(
+        user_text=user_text,
+        session_id=session_id,
+        device_info=device_info,
+        history=history,
+        memory_summary=memory_summary
+    )
     
-    return result_dict
\ No newline at end of file
+    async with aclosing(app.astream(state)) as deltas:
+        async for delta in deltas:
+            yield delta
+
+
+def end_session(session_id: str):
+    """会话结束时释放该会话在LLM客户端中的状态（复用的context）"""
+    llm_client.reset_context(session_id)
@@ -1,34 +1,72 @@
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-
-from workflow.state import WorkflowState
-from llm.ollama_client import OllamaClient
-from llm.prompts import SYSTEM_PROMPT
+from ..state import WorkflowState
+from ...llm.ollama_client import OllamaClient
+from ...llm.prompts import SYSTEM_PROMPT, MEMORY_PROMPT, LLM_UNAVAILABLE_REPLY
+from ...utils.backend_scheduler import BackendBusyError
+from contextlib import aclosing
+from typing import AsyncGenerator
 import logging
 
 logger = logging.getLogger(__name__)
 
+# 进程内共享的LLM客户端，底层连接由 http_clients 复用
+llm_client = OllamaClient()
+
+def _build_messages(state: WorkflowState) -> list:
+    """近期历史 + 本轮用户输入"""
+    return list(state.history or []) + [{"role": "user", "content": state.user_text}]
+
+def _llm_kwargs(state: WorkflowState) -> dict:
+    """会话ID用于复用Ollama的context，设备档案决定生成参数"""
+    profile = (state.device_info or {}).get("profile")
+    return {"session_id": state.session_id, "profile": profile}
+
+def _build_system_prompt(state: WorkflowState) -> str:
+    """有历史摘要时附加到系统提示词后面"""
+    if state.memory_summary:
+        return f"{SYSTEM_PROMPT}\n\n{MEMORY_PROMPT.format(summary=state.memory_summary)}"
+    return SYSTEM_PROMPT
+
 async def chat_node(state: WorkflowState) -> WorkflowState:
     """聊天节点 - 处理用户输入并生成回复"""
-    llm_client = OllamaClient()
-    
     try:
         # 调用LLM生成回复
-        response = await llm_client.generate(
-            prompt=state.user_text,
-            system_prompt=SYSTEM_PROMPT
+        response = await llm_client.chat(
+            _build_messages(state),
+            system_prompt=_build_system_prompt(state),
+            **_llm_kwargs(state)
         )
         
         # 更新状态
         state.bot_text = response
         state.current_node = "chat"
         
-        logger.info(f"生成回复: {response[:100]}...")
+        logger.debug("生成回复: %.100s", response)
         
+    except BackendBusyError:
+        # 排队已满，交给上层播放繁忙提示
+        raise
     except Exception as e:
-        logger.error(f"聊天节点处理失败: {e}")
-        state.bot_text = "抱歉，我现在无法正常回复。"
+        logger.error("聊天节点处理失败: %s", e)
+        state.bot_text = LLM_UNAVAILABLE_REPLY
         state.current_node = "chat"
     
-    return state
\ No newline at end of file
+    return state
+
+
+async def chat_node_stream(state: WorkflowState) -> AsyncGenerator[str, None]:
+    """聊天节点（流式）- 逐段产出回复文本，结束后把完整回复写回状态"""
+    parts = []
+    
+    try:
+        # 提前关闭时同步关闭LLM的流式请求
+        async with aclosing(llm_client.chat_stream(
+            _build_messages(state),
+            system_prompt=_build_system_prompt(state),
+            **_llm_kwargs(state)
+        )) as deltas:
+            async for delta in deltas:
+                parts.append(delta)
+                yield delta
+    finally:
+        state.bot_text = "".join(parts)
+        state.current_node = "chat"
@@ -1,8 +1,4 @@
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-
-from workflow.state import WorkflowState
+from ..state import WorkflowState
 
 async def entry_node(state: WorkflowState) -> WorkflowState:
     """入口节点 - 初始化状态"""
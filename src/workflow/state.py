@@ -1,7 +1,7 @@
 from dataclasses import dataclass
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
-@dataclass
+@dataclass(slots=True)
 class WorkflowState:
     """工作流状态 - 简化版本"""
     user_text: str = ""                    # 用户输入文本
@@ -10,4 +10,6 @@ class WorkflowState:
     session_id: Optional[str] = None       # 会话ID
     device_info: Optional[Dict[str, Any]] = None  # 设备信息
     current_node: str = "entry"            # 当前节点
-    metadata: Optional[Dict[str, Any]] = None  # 元数据
\ No newline at end of file
+    metadata: Optional[Dict[str, Any]] = None  # 元数据
+    history: Optional[List[Dict[str, str]]] = None  # 近期对话历史 [{"role", "content"}]
+    memory_summary: Optional[str] = None   # 更早对话的摘要
\ No newline at end of file
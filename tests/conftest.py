@@ -0,0 +1,7 @@
+import os
+import sys
+
+# 与 src/main.py 相同：把项目根目录加入 sys.path，测试中使用 from src.xxx 导入
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
@@ -0,0 +1,152 @@
+import asyncio
+
+from src.processors.asr_batcher import ASRBatcher
+
+
+class FakeRecognizer:
+    """按上传顺序返回预设文本，记录每次批量请求"""
+
+    def __init__(self, texts, response=None):
+        self.texts = list(texts)
+        self.response = response
+        self.batches = []
+
+    async def recognize_audio_batch(self, items, language="auto"):
+        self.batches.append([key for key, _ in items])
+        texts = {key: text for (key, _), text in zip(items, self.texts) if text is not None}
+        response = self.response
+        if response is None:
+            response = {"result": [{"key": key, "text": text} for key, text in texts.items()]}
+        return texts, response
+
+
+def test_silent_session_does_not_receive_other_transcripts():
+    async def run():
+        recognizer = FakeRecognizer(["", "我的银行卡密码是123456"])
+        batcher = ASRBatcher(recognizer, window_ms=20)
+        return await asyncio.gather(
+            batcher.recognize_audio(b"a", key="devA.wav"),
+            batcher.recognize_audio(b"b", key="devB.wav"),
+        ), recognizer
+
+    (text_a, text_b), recognizer = asyncio.run(run())
+    assert len(recognizer.batches) == 1
+    assert text_a == ""
+    assert text_b == "我的银行卡密码是123456"
+
+
+def test_missing_result_returns_empty_text():
+    async def run():
+        recognizer = FakeRecognizer([None, "你好"])
+        batcher = ASRBatcher(recognizer, window_ms=20)
+        return await asyncio.gather(
+            batcher.recognize_audio(b"a", key="devA.wav"),
+            batcher.recognize_audio(b"b", key="devB.wav"),
+        )
+
+    assert asyncio.run(run()) == ["", "你好"]
+
+
+def test_failed_request_returns_empty_text():
+    async def run():
+        batcher = ASRBatcher(FakeRecognizer([None], response="错误: 500, boom"), window_ms=1)
+        return await batcher.recognize_audio(b"a", key="devA.wav")
+
+    assert asyncio.run(run()) == ""
+
+
+def test_full_batch_is_queued_under_first_callers_owner():
+    from src.utils import backend_scheduler as scheduler_module
+
+    seen = {}
+
+    class OwnerRecorder(FakeRecognizer):
+        async def recognize_audio_batch(self, items, language="auto"):
+            seen["owner"] = scheduler_module._owner.get()
+            return await super().recognize_audio_batch(items, language)
+
+    async def caller(batcher, owner):
+        scheduler_module.backend_scheduler.set_owner(owner)
+        return await batcher.recognize_audio(b"x", key=f"{owner}.wav")
+
+    async def run():
+        # 满批时由第二个调用方触发发送
+        batcher = ASRBatcher(OwnerRecorder(["一", "二"]), window_ms=1000, max_batch=2)
+        return await asyncio.gather(
+            asyncio.create_task(caller(batcher, "devA")),
+            asyncio.create_task(caller(batcher, "devB")),
+        )
+
+    assert asyncio.run(run()) == ["一", "二"]
+    assert seen["owner"] == "devA"
+
+
+def test_batch_request_keeps_first_callers_owner_but_not_trace():
+    from src.utils import backend_scheduler as scheduler_module
+    from src.utils import tracing
+
+    seen = {}
+
+    class OwnerRecorder(FakeRecognizer):
+        async def recognize_audio_batch(self, items, language="auto"):
+            seen["owner"] = scheduler_module._owner.get()
+            seen["trace"] = tracing.current()
+            return await super().recognize_audio_batch(items, language)
+
+    async def caller(batcher, owner):
+        scheduler_module.backend_scheduler.set_owner(owner)
+        tracing.activate(tracing.start_trace(owner))
+        return await batcher.recognize_audio(b"x", key=f"{owner}.wav")
+
+    async def run():
+        batcher = ASRBatcher(OwnerRecorder(["一", "二"]), window_ms=20)
+        return await asyncio.gather(
+            asyncio.create_task(caller(batcher, "devA")),
+            asyncio.create_task(caller(batcher, "devB")),
+        )
+
+    assert asyncio.run(run()) == ["一", "二"]
+    assert seen["owner"] == "devA"
+    assert seen["trace"] is None
+
+
+class HangingRecognizer:
+    """请求一直不返回，直到被取消"""
+
+    def __init__(self):
+        self.started = asyncio.Event()
+
+    async def recognize_audio_batch(self, items, language="auto"):
+        self.started.set()
+        await asyncio.Event().wait()
+
+
+def test_close_cancels_inflight_batch_and_callers():
+    async def run():
+        recognizer = HangingRecognizer()
+        batcher = ASRBatcher(recognizer, window_ms=1)
+        callers = [asyncio.create_task(batcher.recognize_audio(b"a", key=key)) for key in ("devA.wav", "devB.wav")]
+        await recognizer.started.wait()
+        await batcher.close()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        return results, batcher
+
+    results, batcher = asyncio.run(run())
+    assert all(isinstance(result, asyncio.CancelledError) for result in results)
+    assert not batcher._inflight
+
+
+def test_close_cancels_pending_window():
+    async def run():
+        recognizer = FakeRecognizer(["你好"])
+        batcher = ASRBatcher(recognizer, window_ms=1000)
+        caller = asyncio.create_task(batcher.recognize_audio(b"a", key="devA.wav"))
+        await asyncio.sleep(0)
+        await batcher.close()
+        result = await asyncio.gather(caller, return_exceptions=True)
+        return result[0], recognizer, batcher
+
+    result, recognizer, batcher = asyncio.run(run())
+    assert isinstance(result, asyncio.CancelledError)
+    assert recognizer.batches == []
+    assert not batcher._timers and not batcher._pending
@@ -0,0 +1,53 @@
+import asyncio
+
+from src.processors.asr_processor import AsyncSpeechRecognizer
+from src.utils.http_clients import http_clients
+
+
+def _recognizer(response):
+    recognizer = AsyncSpeechRecognizer(server_url="http://127.0.0.1:1/asr", backend="asr_test")
+
+    async def send_request(audio_path, language):
+        return response
+
+    async def post_files(items, language):
+        return response
+
+    recognizer._send_request = send_request
+    recognizer._post_files = post_files
+    return recognizer
+
+
+def test_empty_recognition_returns_empty_text():
+    recognizer = _recognizer({"result": [{"key": "a.wav", "text": ""}]})
+    assert asyncio.run(recognizer.recognize("a.wav")) == ""
+
+
+def test_no_result_returns_empty_text():
+    recognizer = _recognizer({"result": []})
+    assert asyncio.run(recognizer.recognize("a.wav")) == ""
+
+
+def test_empty_in_memory_recognition_returns_empty_text():
+    recognizer = _recognizer({"result": [{"key": "a.wav", "text": ""}]})
+    assert asyncio.run(recognizer.recognize_audio(b"wav", key="a.wav")) == ""
+
+
+def test_recognized_text_is_returned():
+    recognizer = _recognizer({"result": [{"key": "a.wav", "text": "你好"}]})
+    assert asyncio.run(recognizer.recognize("a.wav")) == "你好"
+
+
+def test_unreachable_server_returns_empty_text(tmp_path):
+    path = tmp_path / "a.wav"
+    path.write_bytes(b"wav")
+
+    async def run():
+        http_clients.configure("asr_test", timeout=2.0, connect_timeout=1.0)
+        recognizer = AsyncSpeechRecognizer(server_url="http://127.0.0.1:1/asr", backend="asr_test")
+        try:
+            return await recognizer.recognize(str(path))
+        finally:
+            await recognizer.close()
+
+    assert asyncio.run(run()) == ""
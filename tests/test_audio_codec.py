@@ -0,0 +1,45 @@
+from src.processors import audio_codec
+from src.processors.audio_codec import (
+    CODEC_OPUS, CODEC_PCM, PCMEncoder, create_codec, describe, negotiate_codec, supported_codecs,
+)
+
+
+def test_negotiate_follows_device_preference():
+    assert negotiate_codec(["opus", "pcm"], ["pcm", "opus"]) == CODEC_OPUS
+    assert negotiate_codec(["pcm", "opus"], ["opus", "pcm"]) == CODEC_PCM
+
+
+def test_negotiate_accepts_single_string_and_case():
+    assert negotiate_codec("OPUS", ["opus", "pcm"]) == CODEC_OPUS
+
+
+def test_negotiate_falls_back_to_pcm():
+    # 旧设备不声明编码；声明的编码服务端都不支持
+    assert negotiate_codec(None, ["opus", "pcm"]) == CODEC_PCM
+    assert negotiate_codec([], ["opus", "pcm"]) == CODEC_PCM
+    assert negotiate_codec(["aac", "opus"], ["pcm"]) == CODEC_PCM
+
+
+def test_supported_codecs_drops_unavailable_opus(monkeypatch):
+    monkeypatch.setattr(audio_codec, "opuslib", None)
+    assert supported_codecs(["opus", "pcm"], 16000) == [CODEC_PCM]
+
+
+def test_supported_codecs_checks_sample_rate_and_dedupes(monkeypatch):
+    monkeypatch.setattr(audio_codec, "opuslib", object())
+    assert supported_codecs(["opus", "pcm", "opus", "aac"], 16000) == [CODEC_OPUS, CODEC_PCM]
+    assert supported_codecs(["opus", "pcm"], 22050) == [CODEC_PCM]
+
+
+def test_create_codec_falls_back_to_pcm_without_opus(monkeypatch):
+    monkeypatch.setattr(audio_codec, "opuslib", None)
+    encoder, decoder = create_codec(CODEC_OPUS, 16000, 2)
+    assert (encoder.codec, decoder.codec) == (CODEC_PCM, CODEC_PCM)
+    assert describe(encoder, 16000, 2, 1) == {"codec": "pcm", "sample_rate": 16000,
+                                              "sample_width": 2, "channels": 1}
+
+
+def test_pcm_encoder_passes_views_through():
+    view = memoryview(b'\x01\x00' * 160)
+    assert PCMEncoder().encode(view)[0] is view
+    assert PCMEncoder().encode(view[:0]) == []
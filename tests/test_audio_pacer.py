@@ -0,0 +1,85 @@
+import asyncio
+
+from src.network.audio_pacer import AudioPacer, PlaybackConfig
+
+BYTES_PER_SECOND = 32000  # 16kHz int16 单声道
+
+
+async def _send(pacer, seconds):
+    chunk = pacer.chunk_bytes
+    for _ in range(int(seconds * BYTES_PER_SECOND) // chunk):
+        await pacer.wait(chunk)
+        pacer.sent_bytes(chunk)
+
+
+def test_prebuffer_is_sent_immediately():
+    async def run():
+        pacer = AudioPacer(16000, 2, config=PlaybackConfig(prebuffer_ms=500, max_buffer_ms=None))
+        pacer.start()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await _send(pacer, 0.5)
+        return loop.time() - start
+
+    assert asyncio.run(run()) < 0.05
+
+
+def test_sends_at_realtime_factor():
+    async def run():
+        config = PlaybackConfig(realtime_factor=5.0, prebuffer_ms=0, max_buffer_ms=None)
+        pacer = AudioPacer(16000, 2, config=config)
+        pacer.start()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await _send(pacer, 1.0)
+        return loop.time() - start
+
+    # 最后一帧在 0.9s 音频处，按 5 倍速约 0.18s 后发出
+    assert 0.15 < asyncio.run(run()) < 0.4
+
+
+def test_pauses_above_high_watermark_until_report():
+    async def run():
+        config = PlaybackConfig(prebuffer_ms=0, max_buffer_ms=None, high_watermark=0.8)
+        pacer = AudioPacer(16000, 2, config=config)
+        pacer.start()
+        pacer.update(buffered_ms=1000, capacity_ms=1000)
+
+        task = asyncio.ensure_future(pacer.wait(pacer.chunk_bytes))
+        await asyncio.sleep(0.05)
+        assert not task.done()
+
+        # 设备报告缓冲已播完，立即恢复发送
+        loop = asyncio.get_running_loop()
+        resumed = loop.time()
+        pacer.update(buffered_ms=0)
+        await asyncio.wait_for(task, 1.0)
+        return loop.time() - resumed
+
+    assert asyncio.run(run()) < 0.05
+
+
+def test_no_flow_control_without_capacity():
+    async def run():
+        pacer = AudioPacer(16000, 2, config=PlaybackConfig(prebuffer_ms=0, max_buffer_ms=None))
+        pacer.start()
+        pacer.update(buffered_ms=60000)
+        await asyncio.wait_for(pacer.wait(pacer.chunk_bytes), 0.05)
+
+    asyncio.run(run())
+
+
+def test_estimated_buffer_drains_with_time():
+    async def run():
+        pacer = AudioPacer(16000, 2, config=PlaybackConfig(max_buffer_ms=None))
+        pacer.start()
+        assert pacer.estimated_buffer_ms() is None
+        pacer.update(buffered_ms=100)
+        pacer.sent_bytes(BYTES_PER_SECOND // 10)  # 之后又发送了 100ms
+        first = pacer.estimated_buffer_ms()
+        await asyncio.sleep(0.05)
+        return first, pacer.estimated_buffer_ms()
+
+    first, later = asyncio.run(run())
+    assert 190 < first <= 200
+    assert later < first - 40
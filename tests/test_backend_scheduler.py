@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from src.utils.backend_scheduler import BackendBusyError, BackendScheduler, backend_shed
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_sheds_when_queue_full():
+    async def run():
+        scheduler = BackendScheduler()
+        scheduler.configure("shed_test", concurrency=1, max_queue=1)
+        shed = backend_shed.get(backend="shed_test")
+
+        await scheduler.acquire("shed_test")
+        waiter = asyncio.ensure_future(scheduler.acquire("shed_test"))
+        await _settle()
+        assert scheduler.queue_depth("shed_test") == 1
+
+        with pytest.raises(BackendBusyError):
+            await scheduler.acquire("shed_test")
+        assert backend_shed.get(backend="shed_test") == shed + 1
+
+        scheduler.release("shed_test")
+        await waiter
+        assert scheduler.queue_depth("shed_test") == 0
+        scheduler.release("shed_test")
+
+    asyncio.run(run())
+
+
+def test_round_robin_between_owners():
+    async def run():
+        scheduler = BackendScheduler()
+        scheduler.configure("fair_test", concurrency=1)
+        order = []
+
+        async def request(owner, label):
+            scheduler.set_owner(owner)
+            async with scheduler.slot("fair_test"):
+                order.append(label)
+
+        await scheduler.acquire("fair_test")
+        tasks = []
+        for owner, label in [("A", "a1"), ("A", "a2"), ("A", "a3"), ("B", "b1")]:
+            tasks.append(asyncio.ensure_future(request(owner, label)))
+            await _settle()
+        scheduler.release("fair_test")
+        await asyncio.gather(*tasks)
+        return order
+
+    # A 连续排了三个请求，B 的请求不必等 A 全部完成
+    assert asyncio.run(run()) == ["a1", "b1", "a2", "a3"]
+
+
+def test_cancelled_waiter_leaves_queue():
+    async def run():
+        scheduler = BackendScheduler()
+        scheduler.configure("cancel_test", concurrency=1, max_queue=1)
+        await scheduler.acquire("cancel_test")
+        waiter = asyncio.ensure_future(scheduler.acquire("cancel_test"))
+        await _settle()
+        waiter.cancel()
+        await _settle()
+        assert scheduler.queue_depth("cancel_test") == 0
+
+        # 排队位置已释放，新的请求可以排队
+        second = asyncio.ensure_future(scheduler.acquire("cancel_test"))
+        await _settle()
+        scheduler.release("cancel_test")
+        await second
+        scheduler.release("cancel_test")
+
+    asyncio.run(run())
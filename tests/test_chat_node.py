@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from src.llm.prompts import LLM_UNAVAILABLE_REPLY
+from src.utils.backend_scheduler import BackendBusyError
+from src.workflow.nodes import chat_node
+from src.workflow.state import WorkflowState
+
+
+def _fail_with(monkeypatch, error):
+    async def chat(*args, **kwargs):
+        raise error
+
+    monkeypatch.setattr(chat_node.llm_client, "chat", chat)
+
+
+def test_busy_backend_propagates(monkeypatch):
+    _fail_with(monkeypatch, BackendBusyError("ollama"))
+    with pytest.raises(BackendBusyError):
+        asyncio.run(chat_node.chat_node(WorkflowState(user_text="你好")))
+
+
+def test_other_errors_fall_back_to_apology(monkeypatch):
+    _fail_with(monkeypatch, RuntimeError("boom"))
+    state = asyncio.run(chat_node.chat_node(WorkflowState(user_text="你好")))
+    assert state.bot_text == LLM_UNAVAILABLE_REPLY
+
+
+def test_closing_stream_closes_llm_stream(monkeypatch):
+    closed = []
+
+    async def chat_stream(*args, **kwargs):
+        try:
+            yield "你"
+            yield "好"
+        finally:
+            closed.append(True)
+
+    monkeypatch.setattr(chat_node.llm_client, "chat_stream", chat_stream)
+    state = WorkflowState(user_text="你好")
+
+    async def first_then_close():
+        stream = chat_node.chat_node_stream(state)
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    assert asyncio.run(first_then_close()) == "你"
+    assert closed == [True]
+    assert state.bot_text == "你"
@@ -0,0 +1,103 @@
+import asyncio
+
+from src.database.device_registry import DeviceRegistry
+
+
+class FakeDB:
+    """已知设备保存在 devices 中，记录每次查询和upsert"""
+
+    def __init__(self, devices=None):
+        self.devices = dict(devices or {})
+        self.queries = []
+        self.upserts = []
+        self.fail_upsert = False
+
+    async def get_devices(self, macs):
+        self.queries.append(list(macs))
+        return {mac: dict(self.devices[mac]) for mac in macs if mac in self.devices}
+
+    async def upsert_device_logins(self, items):
+        if self.fail_upsert:
+            raise RuntimeError("db down")
+        self.upserts.append([mac for mac, _ in items])
+        for mac, _ in items:
+            self.devices.setdefault(mac, {"mac_addr": mac, "memory": None})
+
+
+def test_concurrent_misses_share_one_query_and_new_devices_are_upserted_together():
+    async def run():
+        db = FakeDB({"AA": {"mac_addr": "AA", "memory": "m"}})
+        registry = DeviceRegistry(db, batch_window=0.01)
+        devices = await asyncio.gather(*(registry.register(mac) for mac in ("AA", "BB", "CC", "BB")))
+        return db, devices
+
+    db, devices = asyncio.run(run())
+    assert len(db.queries) == 1 and sorted(db.queries[0]) == ["AA", "BB", "CC"]
+    assert len(db.upserts) == 1 and sorted(db.upserts[0]) == ["BB", "CC"]
+    assert [d["mac_addr"] for d in devices] == ["AA", "BB", "CC", "BB"]
+    assert devices[0]["memory"] == "m"
+
+
+def test_cached_device_skips_database_until_ttl_expires():
+    async def run():
+        db = FakeDB({"AA": {"mac_addr": "AA", "memory": None}})
+        registry = DeviceRegistry(db, ttl=60, batch_window=0)
+        await registry.register("AA")
+        await registry.register("AA")
+        cached_queries = len(db.queries)
+        # 模拟缓存过期
+        expires_at, device = registry._cache["AA"]
+        registry._cache["AA"] = (expires_at - 61, device)
+        await registry.register("AA")
+        return db, cached_queries
+
+    db, cached_queries = asyncio.run(run())
+    assert cached_queries == 1
+    assert len(db.queries) == 2
+
+
+def test_logins_are_merged_and_flushed_in_batches():
+    async def run():
+        db = FakeDB({mac: {"mac_addr": mac, "memory": None} for mac in ("AA", "BB", "CC")})
+        registry = DeviceRegistry(db, batch_window=0, batch_size=2)
+        for mac in ("AA", "BB", "CC", "AA"):
+            await registry.register(mac)
+        before = list(db.upserts)
+        await registry.flush()
+        return db, before
+
+    db, before = asyncio.run(run())
+    assert before == []
+    assert sorted(len(batch) for batch in db.upserts) == [1, 2]
+    assert sorted(mac for batch in db.upserts for mac in batch) == ["AA", "BB", "CC"]
+
+
+def test_failed_login_flush_is_retried():
+    async def run():
+        db = FakeDB({"AA": {"mac_addr": "AA", "memory": None}})
+        registry = DeviceRegistry(db, batch_window=0)
+        await registry.register("AA")
+        db.fail_upsert = True
+        await registry.flush()
+        db.fail_upsert = False
+        await registry.flush()
+        return db
+
+    assert asyncio.run(run()).upserts == [["AA"]]
+
+
+def test_update_cached_and_invalidate():
+    async def run():
+        db = FakeDB({"AA": {"mac_addr": "AA", "memory": None}})
+        registry = DeviceRegistry(db, batch_window=0)
+        await registry.register("AA")
+        registry.update_cached("AA", memory="new")
+        cached = await registry.register("AA")
+        registry.invalidate("AA")
+        reloaded = await registry.register("AA")
+        return db, cached, reloaded
+
+    db, cached, reloaded = asyncio.run(run())
+    assert cached["memory"] == "new"
+    assert reloaded["memory"] is None
+    assert len(db.queries) == 2
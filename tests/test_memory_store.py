@@ -0,0 +1,106 @@
+import asyncio
+
+from src.database.memory_store import ConversationMemory, MemoryStore
+
+
+class FakeDB:
+    """记录每次批量写回；fail 为真时写回失败"""
+
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+
+    async def save_memories(self, items):
+        if self.fail:
+            raise RuntimeError("db down")
+        self.batches.append(list(items))
+
+
+async def _until(predicate):
+    while not predicate():
+        await asyncio.sleep(0.005)
+
+
+def _saved(db):
+    return {mac: ConversationMemory.load(stored) for batch in db.batches for mac, stored in batch}
+
+
+def test_record_turn_only_touches_memory_until_flush():
+    async def run():
+        db = FakeDB()
+        store = MemoryStore(db)
+        store.record_turn("AA", "你好", "你好呀")
+        store.record_turn("AA", "几点了", "三点")
+        before = list(db.batches)
+        await store.flush()
+        await store.flush()
+        return db, before
+
+    db, before = asyncio.run(run())
+    assert before == []
+    # 同一设备的多轮合并成一次写回，没有新变更时不再写
+    assert len(db.batches) == 1 and len(db.batches[0]) == 1
+    assert [m["content"] for m in _saved(db)["AA"].messages()] == ["你好", "你好呀", "几点了", "三点"]
+
+
+def test_flush_splits_into_batches():
+    async def run():
+        db = FakeDB()
+        store = MemoryStore(db, batch_size=2)
+        for mac in ("AA", "BB", "CC"):
+            store.record_turn(mac, "你好", "你好呀")
+        await store.flush()
+        return db
+
+    db = asyncio.run(run())
+    assert sorted(len(batch) for batch in db.batches) == [1, 2]
+    assert set(_saved(db)) == {"AA", "BB", "CC"}
+
+
+def test_failed_flush_is_retried():
+    async def run():
+        db = FakeDB()
+        store = MemoryStore(db)
+        store.record_turn("AA", "你好", "你好呀")
+        db.fail = True
+        await store.flush()
+        failed = list(db.batches)
+        db.fail = False
+        await store.flush()
+        return db, failed
+
+    db, failed = asyncio.run(run())
+    assert failed == []
+    assert set(_saved(db)) == {"AA"}
+
+
+def test_released_device_is_evicted_after_write_back():
+    async def run():
+        db = FakeDB()
+        store = MemoryStore(db)
+        store.record_turn("AA", "你好", "你好呀")
+        store.release("AA")
+        cached_before = "AA" in store._memories
+        await store.flush()
+        return db, store, cached_before
+
+    db, store, cached_before = asyncio.run(run())
+    assert cached_before
+    assert "AA" not in store._memories
+    assert set(_saved(db)) == {"AA"}
+
+
+def test_background_task_flushes_and_stop_writes_remaining():
+    async def run():
+        db = FakeDB()
+        store = MemoryStore(db, flush_interval=0.01)
+        await store.start()
+        store.record_turn("AA", "你好", "你好呀")
+        await asyncio.wait_for(_until(lambda: db.batches), 1.0)
+        store.record_turn("BB", "再见", "再见")
+        await store.stop()
+        return db, store
+
+    db, store = asyncio.run(run())
+    assert set(_saved(db)) == {"AA", "BB"}
+    assert store._task is None
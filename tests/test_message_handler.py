@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+from src.network.message_handler import MessageHandler
+from src.network.turn_worker import Turn, turns_cancelled, CANCEL_BARGE_IN, CANCEL_CLIENT
+from src.utils.tracing import STATUS_CANCELLED
+
+
+class FakeWebSocket:
+    remote_address = ("127.0.0.1", 0)
+
+    async def send(self, data):
+        pass
+
+
+class FakeTTS:
+    sample_rate = 16000
+    sample_width = 2
+    channels = 1
+
+
+class FakeTrace:
+    def __init__(self):
+        self.status = None
+
+    def finish(self, status):
+        self.status = status
+
+
+class FakeASRStream:
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+async def _connect_with_reply_in_flight():
+    """连接一个会话，并让一轮回复停在处理中"""
+    handler = MessageHandler(None, None, None, tts_processor=FakeTTS())
+    started, finished = asyncio.Event(), []
+
+    async def process_turn(session, turn):
+        started.set()
+        await asyncio.Event().wait()
+        finished.append(turn)
+
+    handler._process_turn = process_turn
+    websocket = FakeWebSocket()
+    await handler.on_connect(websocket)
+    session = handler.sessions[websocket]
+    turn = Turn(audio=bytearray(b"\x00\x00"), trace=FakeTrace())
+    await session.turn_worker.submit(turn)
+    await started.wait()
+    return handler, websocket, session, turn, finished
+
+
+async def _settle(session):
+    while session.turn_worker.busy:
+        await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+
+def test_client_cancel_stops_current_reply():
+    before = turns_cancelled.get(reason=CANCEL_CLIENT, stage="in_flight")
+
+    async def run():
+        handler, websocket, session, turn, finished = await _connect_with_reply_in_flight()
+        await handler.handle_message(websocket, json.dumps({"method": "mcp/audio/cancel"}))
+        await _settle(session)
+        alive = not session.turn_worker._task.done()
+        await handler.on_disconnect(websocket)
+        return turn, finished, alive
+
+    turn, finished, alive = asyncio.run(run())
+    assert turn.trace.status == STATUS_CANCELLED
+    assert finished == []
+    assert alive
+    assert turns_cancelled.get(reason=CANCEL_CLIENT, stage="in_flight") == before + 1
+
+
+def test_start_stream_barges_in_and_clears_leftover_audio():
+    before = turns_cancelled.get(reason=CANCEL_BARGE_IN, stage="in_flight")
+
+    async def run():
+        handler, websocket, session, turn, finished = await _connect_with_reply_in_flight()
+        session.audio_buffer.extend(b"\x01\x00" * 160)
+        asr_stream = session.asr_stream = FakeASRStream()
+        await handler.handle_message(websocket, json.dumps({"method": "mcp/audio/start_stream"}))
+        await _settle(session)
+        buffered = len(session.audio_buffer)
+        await handler.on_disconnect(websocket)
+        return turn, finished, asr_stream, buffered, session
+
+    turn, finished, asr_stream, buffered, session = asyncio.run(run())
+    assert turn.trace.status == STATUS_CANCELLED
+    assert finished == []
+    assert asr_stream.cancelled
+    assert session.asr_stream is None
+    assert buffered == 0
+    assert turns_cancelled.get(reason=CANCEL_BARGE_IN, stage="in_flight") == before + 1
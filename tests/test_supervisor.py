@@ -0,0 +1,165 @@
+import asyncio
+import threading
+import time
+
+from src.utils import supervisor as supervisor_module
+from src.utils.supervisor import Supervisor, _Worker, RESTART_BACKOFF_MIN, RESTART_BACKOFF_MAX, CRASH_WINDOW
+
+
+class FakeProcess:
+    def __init__(self, alive=True, exitcode=None):
+        self.alive = alive
+        self.exitcode = exitcode
+        self.terminated = False
+
+    def is_alive(self):
+        return self.alive
+
+    def terminate(self):
+        self.terminated = True
+        self.alive = False
+        self.exitcode = 0
+
+    def join(self, timeout=None):
+        pass
+
+    def kill(self):
+        self.alive = False
+
+
+class FakeHandle:
+    def __init__(self, worker_id, slot, ready=False):
+        self.worker_id = worker_id
+        self.slot = slot
+        self.ready = threading.Event()
+        if ready:
+            self.ready.set()
+
+
+def _worker(worker_id, slot, alive=True, ready=True, uptime=0.0):
+    worker = _Worker(FakeProcess(alive, None if alive else 1), FakeHandle(worker_id, slot, ready))
+    worker.started = time.monotonic() - uptime
+    return worker
+
+
+def _supervisor(workers=1, **kwargs):
+    return Supervisor(lambda handle: None, workers, **kwargs)
+
+
+def test_repeated_crashes_back_off_exponentially_up_to_max():
+    async def run():
+        supervisor = _supervisor()
+        delays = []
+
+        async def restart_slot(slot, delay):
+            delays.append(delay)
+
+        supervisor._restart_slot = restart_slot
+        for i in range(8):
+            supervisor._slots[0] = _worker(i, 0, alive=False)
+            await supervisor._reap()
+            await asyncio.sleep(0)
+            assert supervisor._slots[0] is None
+        return delays
+
+    delays = asyncio.run(run())
+    assert delays[:3] == [RESTART_BACKOFF_MIN, RESTART_BACKOFF_MIN * 2, RESTART_BACKOFF_MIN * 4]
+    assert delays[-1] == RESTART_BACKOFF_MAX
+    assert all(a <= b for a, b in zip(delays, delays[1:]))
+
+
+def test_exit_after_long_uptime_resets_backoff():
+    async def run():
+        supervisor = _supervisor()
+        delays = []
+
+        async def restart_slot(slot, delay):
+            delays.append(delay)
+
+        supervisor._restart_slot = restart_slot
+        supervisor._backoff[0] = 8.0
+        supervisor._slots[0] = _worker(0, 0, alive=False, uptime=CRASH_WINDOW + 1)
+        await supervisor._reap()
+        await asyncio.sleep(0)
+        return delays
+
+    assert asyncio.run(run()) == [0.0]
+
+
+def test_reap_ignores_live_workers_and_stopping():
+    async def run():
+        supervisor = _supervisor(workers=2)
+        live = supervisor._slots[0] = _worker(0, 0)
+        dead = supervisor._slots[1] = _worker(1, 1, alive=False)
+        supervisor._stopping = True
+        await supervisor._reap()
+        return supervisor, live, dead
+
+    supervisor, live, dead = asyncio.run(run())
+    assert supervisor._slots == [live, dead]
+
+
+def test_restart_slot_spawns_into_empty_slot():
+    before = supervisor_module.worker_restarts.get(reason="crash")
+
+    async def run():
+        supervisor = _supervisor()
+        supervisor._spawn = lambda slot: _worker(7, slot)
+        await supervisor._restart_slot(0, 0)
+        return supervisor
+
+    supervisor = asyncio.run(run())
+    assert supervisor._slots[0].handle.worker_id == 7
+    assert supervisor_module.worker_restarts.get(reason="crash") == before + 1
+
+
+def test_rolling_restart_replaces_workers_in_order():
+    async def run():
+        supervisor = _supervisor(workers=2)
+        old = [_worker(0, 0), _worker(1, 1)]
+        supervisor._slots = list(old)
+        supervisor._spawn = lambda slot: _worker(10 + slot, slot)
+        await supervisor.rolling_restart()
+        return supervisor, old
+
+    supervisor, old = asyncio.run(run())
+    assert [w.handle.worker_id for w in supervisor._slots] == [10, 11]
+    assert all(w.process.terminated for w in old)
+    assert not supervisor._restarting
+
+
+def test_rolling_restart_aborts_and_keeps_old_worker_when_new_one_fails():
+    async def run():
+        supervisor = _supervisor(workers=2, ready_timeout=1.0)
+        old = [_worker(0, 0), _worker(1, 1)]
+        supervisor._slots = list(old)
+        spawned = []
+
+        def spawn(slot):
+            # 第二个槽位的新进程启动后立即退出
+            worker = _worker(10 + slot, slot, alive=slot == 0, ready=slot == 0)
+            spawned.append(worker)
+            return worker
+
+        supervisor._spawn = spawn
+        await supervisor.rolling_restart()
+        return supervisor, old, spawned
+
+    supervisor, old, spawned = asyncio.run(run())
+    assert supervisor._slots == [spawned[0], old[1]]
+    assert old[0].process.terminated
+    assert not old[1].process.terminated
+    assert not supervisor._restarting
+
+
+def test_rolling_restart_is_ignored_while_stopping():
+    async def run():
+        supervisor = _supervisor()
+        supervisor._slots[0] = original = _worker(0, 0)
+        supervisor._stopping = True
+        supervisor._spawn = lambda slot: _worker(10, slot)
+        await supervisor.rolling_restart()
+        return supervisor, original
+
+    supervisor, original = asyncio.run(run())
+    assert supervisor._slots[0] is original
@@ -0,0 +1,52 @@
+from src.utils.text_segmenter import SentenceSegmenter
+
+
+def test_strong_break_splits_and_keeps_rest():
+    segmenter = SentenceSegmenter()
+    assert segmenter.feed("你好啊。今天") == ["你好啊。"]
+    assert segmenter.flush() == "今天"
+
+
+def test_incremental_tokens():
+    segmenter = SentenceSegmenter()
+    segments = []
+    for token in ["今天", "天气", "很好", "！我们", "出去吧"]:
+        segments += segmenter.feed(token)
+    assert segments == ["今天天气很好！"]
+    assert segmenter.flush() == "我们出去吧"
+
+
+def test_short_segment_merges_with_next():
+    segmenter = SentenceSegmenter(min_chars=4)
+    assert segmenter.feed("好。") == []
+    assert segmenter.feed("今天天气很好。") == ["好。今天天气很好。"]
+
+
+def test_soft_break_only_after_enough_chars():
+    segmenter = SentenceSegmenter(soft_break_chars=12)
+    assert segmenter.feed("你好，世界") == []
+    assert segmenter.feed("，今天的天气真的非常不错，") == ["你好，世界，今天的天气真的非常不错，"]
+
+
+def test_max_chars_forces_split_without_punctuation():
+    segmenter = SentenceSegmenter(max_chars=10)
+    assert segmenter.feed("啊" * 25) == ["啊" * 10, "啊" * 10]
+    assert segmenter.flush() == "啊" * 5
+
+
+def test_decimal_point_is_not_a_break():
+    segmenter = SentenceSegmenter()
+    assert segmenter.feed("价格是3.5元。") == ["价格是3.5元。"]
+    assert segmenter.feed("It costs 3.5 dollars. Next") == ["It costs 3.5 dollars."]
+
+
+def test_trailing_dot_waits_for_next_char():
+    segmenter = SentenceSegmenter()
+    assert segmenter.feed("Hello world.") == []
+    assert segmenter.feed(" Bye") == ["Hello world."]
+
+
+def test_closing_quote_and_repeated_marks_stay_with_segment():
+    segmenter = SentenceSegmenter()
+    assert segmenter.feed("他说“真的吗？！”然后") == ["他说“真的吗？！”"]
+    assert segmenter.flush() == "然后"
@@ -0,0 +1,66 @@
+import asyncio
+import os
+
+from src.processors.tts_cache import TTSCache
+
+AUDIO = b'\x01\x02' * 800
+
+
+def test_memory_hit():
+    async def run():
+        cache = TTSCache()
+        key = cache.make_key("你好", None, 16000)
+        assert await cache.get(key) is None
+        await cache.put(key, AUDIO)
+        assert await cache.get(key) == AUDIO
+
+    asyncio.run(run())
+
+
+def test_disk_entries_survive_restart(tmp_path):
+    async def run():
+        first = TTSCache(disk_dir=str(tmp_path))
+        key = first.make_key("你好", None, 16000)
+        await first.put(key, AUDIO)
+
+        # 新实例在 load() 之前不读磁盘
+        second = TTSCache(disk_dir=str(tmp_path))
+        assert second.stats()["disk_entries"] == 0
+        await second.load()
+        assert second.stats()["disk_entries"] == 1
+        assert await second.get(key) == AUDIO
+        assert second.stats()["memory_entries"] == 1
+
+    asyncio.run(run())
+
+
+def test_missing_file_drops_index_entry(tmp_path):
+    async def run():
+        cache = TTSCache(max_bytes=0, disk_dir=str(tmp_path))
+        key = cache.make_key("你好", None, 16000)
+        await cache.put(key, AUDIO)
+        os.remove(os.path.join(str(tmp_path), f"{key}.pcm"))
+
+        assert await cache.get(key) is None
+        assert cache.stats()["disk_entries"] == 0
+        assert cache.stats()["disk_bytes"] == 0
+
+    asyncio.run(run())
+
+
+def test_load_evicts_oldest_over_budget(tmp_path):
+    async def run():
+        writer = TTSCache(disk_dir=str(tmp_path))
+        keys = [writer.make_key(f"短语{i}", None, 16000) for i in range(3)]
+        for i, key in enumerate(keys):
+            await writer.put(key, AUDIO)
+            path = os.path.join(str(tmp_path), f"{key}.pcm")
+            os.utime(path, (1000 + i, 1000 + i))
+
+        cache = TTSCache(disk_dir=str(tmp_path), disk_max_bytes=2 * len(AUDIO))
+        await cache.load()
+        assert cache.stats()["disk_entries"] == 2
+        assert not os.path.exists(os.path.join(str(tmp_path), f"{keys[0]}.pcm"))
+        assert await cache.get(keys[2]) == AUDIO
+
+    asyncio.run(run())
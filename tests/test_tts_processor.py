@@ -0,0 +1,52 @@
+import asyncio
+
+import httpx
+
+from src.processors import tts_processor
+from src.processors.tts_processor import TTSProcessor
+from src.utils.backend_scheduler import backend_errors, backend_fallbacks
+from src.utils.http_clients import http_clients
+
+SILENCE = b'\x00' * 3200
+
+
+def _unreachable() -> TTSProcessor:
+    # 端口1上没有服务，连接立即被拒绝
+    http_clients.configure("tts_test", timeout=2.0, connect_timeout=1.0)
+    return TTSProcessor(api_url="127.0.0.1:1", backend="tts_test")
+
+
+async def _close():
+    await http_clients.close("tts_test")
+
+
+def test_text_to_speech_returns_silence_when_backend_down():
+    async def run():
+        tts = _unreachable()
+        errors = backend_errors.get(backend="tts_test", kind="exception")
+        fallbacks = backend_fallbacks.get(backend="tts_test", fallback="silence")
+        try:
+            assert await tts.text_to_speech("你好") == SILENCE
+        finally:
+            await _close()
+        assert backend_errors.get(backend="tts_test", kind="exception") == errors + 1
+        assert backend_fallbacks.get(backend="tts_test", fallback="silence") == fallbacks + 1
+
+    asyncio.run(run())
+
+
+def test_generator_yields_silence_when_backend_down():
+    async def run():
+        tts = _unreachable()
+        try:
+            return [chunk async for chunk in tts.text_to_speech_generator("你好")]
+        finally:
+            await _close()
+
+    assert asyncio.run(run()) == [SILENCE]
+
+
+def test_error_kind_classifies_timeouts():
+    assert tts_processor._error_kind(httpx.ReadTimeout("slow")) == "timeout"
+    assert tts_processor._error_kind(asyncio.TimeoutError()) == "timeout"
+    assert tts_processor._error_kind(httpx.ConnectError("refused")) == "exception"
@@ -0,0 +1,196 @@
+import asyncio
+
+import pytest
+
+from src.network.turn_worker import (
+    TurnWorker, Turn, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST, OVERFLOW_BLOCK, CANCEL_BARGE_IN
+)
+from src.utils.tracing import STATUS_CANCELLED, STATUS_DROPPED, STATUS_ERROR
+
+
+class FakeTrace:
+    def __init__(self):
+        self.status = None
+
+    def finish(self, status):
+        self.status = status
+
+
+class FakeASRStream:
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+def _turn(label):
+    turn = Turn(audio=bytearray(label.encode()), asr_stream=FakeASRStream(), trace=FakeTrace())
+    turn.label = label
+    return turn
+
+
+class Recorder:
+    """按顺序记录处理过的轮次；release 置位前每轮都挂起"""
+
+    def __init__(self):
+        self.started = []
+        self.done = []
+        self.release = asyncio.Event()
+
+    async def process(self, turn):
+        self.started.append(turn.label)
+        await self.release.wait()
+        self.done.append(turn.label)
+
+
+async def _wait_started(recorder, count):
+    while len(recorder.started) < count:
+        await asyncio.sleep(0)
+
+
+def test_unknown_overflow_policy_is_rejected():
+    with pytest.raises(ValueError):
+        TurnWorker(Recorder().process, overflow="spill")
+
+
+def test_drop_oldest_keeps_latest_turns():
+    async def run():
+        recorder = Recorder()
+        worker = TurnWorker(recorder.process, maxsize=2, overflow=OVERFLOW_DROP_OLDEST)
+        worker.start()
+        first, a, b, c = (_turn(label) for label in ("first", "a", "b", "c"))
+        await worker.submit(first)
+        await _wait_started(recorder, 1)
+        accepted = [await worker.submit(turn) for turn in (a, b, c)]
+        recorder.release.set()
+        while len(recorder.done) < 3:
+            await asyncio.sleep(0)
+        await worker.stop()
+        return recorder, accepted, a
+
+    recorder, accepted, dropped = asyncio.run(run())
+    assert accepted == [True, True, True]
+    assert recorder.done == ["first", "b", "c"]
+    assert dropped.trace.status == STATUS_DROPPED
+    assert dropped.asr_stream is None
+
+
+def test_drop_newest_rejects_new_turn():
+    async def run():
+        recorder = Recorder()
+        worker = TurnWorker(recorder.process, maxsize=1, overflow=OVERFLOW_DROP_NEWEST)
+        worker.start()
+        first, a, b = (_turn(label) for label in ("first", "a", "b"))
+        await worker.submit(first)
+        await _wait_started(recorder, 1)
+        accepted = [await worker.submit(turn) for turn in (a, b)]
+        recorder.release.set()
+        while len(recorder.done) < 2:
+            await asyncio.sleep(0)
+        await worker.stop()
+        return recorder, accepted, b
+
+    recorder, accepted, rejected = asyncio.run(run())
+    assert accepted == [True, False]
+    assert recorder.done == ["first", "a"]
+    assert rejected.trace.status == STATUS_DROPPED
+
+
+def test_block_waits_for_free_slot():
+    async def run():
+        recorder = Recorder()
+        worker = TurnWorker(recorder.process, maxsize=1, overflow=OVERFLOW_BLOCK)
+        worker.start()
+        await worker.submit(_turn("first"))
+        await _wait_started(recorder, 1)
+        await worker.submit(_turn("a"))
+        blocked = asyncio.create_task(worker.submit(_turn("b")))
+        await asyncio.sleep(0.01)
+        was_blocked = not blocked.done()
+        recorder.release.set()
+        accepted = await blocked
+        while len(recorder.done) < 3:
+            await asyncio.sleep(0)
+        await worker.stop()
+        return recorder, was_blocked, accepted
+
+    recorder, was_blocked, accepted = asyncio.run(run())
+    assert was_blocked
+    assert accepted
+    assert recorder.done == ["first", "a", "b"]
+
+
+def test_cancel_stops_current_and_queued_turns_but_keeps_worker():
+    async def run():
+        recorder = Recorder()
+        worker = TurnWorker(recorder.process, maxsize=2)
+        worker.start()
+        current, queued = _turn("current"), _turn("queued")
+        await worker.submit(current)
+        await _wait_started(recorder, 1)
+        await worker.submit(queued)
+        cancelled = worker.cancel(CANCEL_BARGE_IN)
+        while worker.busy:
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        # 取消后仍能处理新的发言
+        recorder.release.set()
+        await worker.submit(_turn("next"))
+        while len(recorder.done) < 1:
+            await asyncio.sleep(0)
+        await worker.stop()
+        return recorder, cancelled, current, queued
+
+    recorder, cancelled, current, queued = asyncio.run(run())
+    assert cancelled == 2
+    assert current.trace.status == STATUS_CANCELLED
+    assert queued.trace.status == STATUS_CANCELLED
+    assert queued.asr_stream is None
+    assert recorder.done == ["next"]
+
+
+def test_failed_turn_is_discarded_and_worker_continues():
+    async def run():
+        done = []
+
+        async def process(turn):
+            if turn.label == "bad":
+                raise RuntimeError("boom")
+            done.append(turn.label)
+
+        worker = TurnWorker(process, maxsize=2)
+        worker.start()
+        bad = _turn("bad")
+        await worker.submit(bad)
+        await worker.submit(_turn("good"))
+        while not done:
+            await asyncio.sleep(0)
+        await worker.stop()
+        return done, bad
+
+    done, bad = asyncio.run(run())
+    assert done == ["good"]
+    assert bad.trace.status == STATUS_ERROR
+
+
+def test_stop_cancels_everything_and_ends_task():
+    async def run():
+        recorder = Recorder()
+        worker = TurnWorker(recorder.process, maxsize=2)
+        worker.start()
+        current, queued = _turn("current"), _turn("queued")
+        await worker.submit(current)
+        await _wait_started(recorder, 1)
+        await worker.submit(queued)
+        task = worker._task
+        await worker.stop()
+        return worker, task, current, queued
+
+    worker, task, current, queued = asyncio.run(run())
+    assert task.done()
+    assert worker._task is None
+    assert not worker.busy
+    assert worker.pending == 0
+    assert current.trace.status == STATUS_CANCELLED
+    assert queued.trace.status == STATUS_CANCELLED
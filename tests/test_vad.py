@@ -0,0 +1,80 @@
+import numpy as np
+
+from src.processors.vad import VAD_ENDPOINT, EnergyVAD, VoiceActivityDetector
+
+FRAME_BYTES = 640  # 20ms, 16kHz int16
+SILENCE = b'\x00' * FRAME_BYTES
+SPEECH = np.full(FRAME_BYTES // 2, 1000, dtype=np.int16).tobytes()
+
+
+class NonZeroClassifier:
+    """非全零的帧即为语音，让测试只检验状态机"""
+
+    def classify(self, frames):
+        return np.any(frames != 0, axis=1)
+
+
+def _stream():
+    # 开始 3 帧，挂起 35 帧，预留 10 帧，尾部 7 帧，最短发言 10 帧
+    return VoiceActivityDetector(NonZeroClassifier).create_stream()
+
+
+def test_endpoint_after_hangover_keeps_pre_roll_and_tail():
+    stream = _stream()
+    speech, event = stream.process(SILENCE * 20 + SPEECH * 20 + SILENCE * 40)
+
+    assert event == VAD_ENDPOINT
+    # 预留 10 帧（含触发开始的 3 帧语音）+ 其余 17 帧语音 + 尾部 7 帧静音
+    assert len(speech) == (10 + 17 + 7) * FRAME_BYTES
+    assert speech.startswith(SILENCE * 7 + SPEECH * 20 + SILENCE * 7)
+    # 断句后剩余的帧留到下一次调用
+    assert stream.process(b'') == (b'', None)
+
+
+def test_no_endpoint_before_hangover():
+    stream = _stream()
+    speech, event = stream.process(SPEECH * 20 + SILENCE * 34)
+
+    assert event is None
+    assert len(speech) == 20 * FRAME_BYTES
+    assert stream.in_speech
+
+
+def test_short_blip_is_dropped():
+    stream = _stream()
+    speech, event = stream.process(SPEECH * 5 + SILENCE * 40)
+
+    assert (speech, event) == (b'', None)
+    assert not stream.in_speech
+
+
+def test_split_chunks_match_single_chunk():
+    audio = SILENCE * 20 + SPEECH * 20 + SILENCE * 40
+    whole, _ = _stream().process(audio)
+
+    stream = _stream()
+    parts = []
+    for i in range(0, len(audio), 100):
+        speech, event = stream.process(audio[i:i + 100])
+        parts.append(speech)
+        if event:
+            break
+    assert event == VAD_ENDPOINT
+    assert b''.join(parts) == whole
+
+
+def test_flush_returns_tail_and_resets():
+    stream = _stream()
+    stream.process(SPEECH * 20 + SILENCE * 10)
+
+    assert stream.flush() == SILENCE * 7
+    assert not stream.in_speech
+    assert stream.flush() == b''
+
+
+def test_energy_vad_separates_tone_from_silence():
+    t = np.arange(320) / 16000
+    tone = (3000 * np.sin(2 * np.pi * 300 * t)).astype(np.int16)
+    frames = np.stack([np.zeros(320, dtype=np.int16), tone])
+
+    assert EnergyVAD().classify(frames).tolist() == [False, True]
@@ -0,0 +1,79 @@
+import asyncio
+
+from src.workflow.executor import WorkflowBuilder, END
+from src.workflow.state import WorkflowState
+
+
+def _build(calls, closed=None):
+    async def entry(state):
+        calls.append("entry")
+        return state
+
+    async def prepare(state):
+        calls.append("prepare")
+        state.memory_summary = "摘要"
+        return state
+
+    async def chat(state):
+        calls.append("chat")
+        state.bot_text = "完整回复"
+        return state
+
+    async def chat_stream(state):
+        calls.append("chat_stream")
+        try:
+            for delta in ("你", "好", "呀"):
+                yield f"{delta}{state.memory_summary}"
+        finally:
+            if closed is not None:
+                closed.append(True)
+
+    workflow = WorkflowBuilder(WorkflowState)
+    workflow.add_node("entry", entry)
+    workflow.add_node("prepare", prepare)
+    workflow.add_node("chat", chat, stream=chat_stream)
+    workflow.set_entry_point("entry")
+    workflow.add_edge("entry", "prepare")
+    workflow.add_edge("prepare", "chat")
+    workflow.add_edge("chat", END)
+    return workflow.compile(use_langgraph=False)
+
+
+async def _collect(agen):
+    return [delta async for delta in agen]
+
+
+def test_astream_runs_graph_nodes_then_streams_terminal():
+    calls = []
+    app = _build(calls)
+    deltas = asyncio.run(_collect(app.astream(WorkflowState(user_text="hi"))))
+    assert calls == ["entry", "prepare", "chat_stream"]
+    assert deltas == ["你摘要", "好摘要", "呀摘要"]
+
+
+def test_astream_without_stream_node_yields_final_reply():
+    async def chat(state):
+        state.bot_text = "完整回复"
+        return state
+
+    workflow = WorkflowBuilder(WorkflowState)
+    workflow.add_node("chat", chat)
+    workflow.set_entry_point("chat")
+    workflow.add_edge("chat", END)
+    app = workflow.compile(use_langgraph=False)
+    deltas = asyncio.run(_collect(app.astream(WorkflowState(user_text="hi"))))
+    assert deltas == ["完整回复"]
+
+
+def test_closing_stream_closes_terminal_node():
+    calls, closed = [], []
+    app = _build(calls, closed)
+
+    async def first_then_close():
+        stream = app.astream(WorkflowState(user_text="hi"))
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    assert asyncio.run(first_then_close()) == "你摘要"
+    assert closed == [True]